@@ -0,0 +1,117 @@
+"""
+Handler latency under concurrent DB write pressure.
+
+Simulates handlers that each save a reminder and read it back, while a
+background thread keeps the database busy with fsync-heavy writes. Handlers
+either call db.py directly (blocking the event loop, the old behaviour) or go
+through async_db. Reports handler p50/p99 and event-loop stall p99.
+
+    python benchmarks/bench_async_db.py [--handlers 2000] [--concurrency 50]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bot"))
+
+import db  # noqa: E402
+import async_db  # noqa: E402
+
+ARGS = (4242, "load", "2030-01-01T09:00:00", "UTC", "normal", None, "none")
+PRESSURE_ARGS = (4242, "load", *db.normalize_datetime(ARGS[2]), *ARGS[3:])
+
+
+def _pressure(stop: threading.Event) -> None:
+    """Hammer the DB with small fully-synced transactions from another connection."""
+    conn = db.get_conn()
+    conn.execute("PRAGMA synchronous=FULL")
+    while not stop.is_set():
+        conn.execute(
+            "INSERT INTO reminders (chat_id, title, datetime_utc, datetime_ts, timezone, priority, category, repeat) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            PRESSURE_ARGS,
+        )
+        conn.commit()
+        time.sleep(0.0005)  # leave gaps so other writers are not starved
+    conn.close()
+
+
+async def _handler_sync() -> None:
+    rid = db.add_reminder(*ARGS)
+    db.get_reminder(rid)
+
+
+async def _handler_async() -> None:
+    rid = await async_db.add_reminder(*ARGS)
+    await async_db.get_reminder(rid)
+
+
+def _pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+async def _run(handler, total: int, concurrency: int):
+    latencies = []
+    stalls = []
+    done = asyncio.Event()
+
+    async def probe():
+        # a 1 ms ticker: anything beyond 1 ms is time the loop was blocked
+        while not done.is_set():
+            t0 = time.perf_counter()
+            await asyncio.sleep(0.001)
+            stalls.append(time.perf_counter() - t0 - 0.001)
+
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with sem:
+            t0 = time.perf_counter()
+            await handler()
+            latencies.append(time.perf_counter() - t0)
+
+    probe_task = asyncio.create_task(probe())
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await probe_task
+    return latencies, stalls, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--handlers", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "load.db")
+        db.init_db()
+
+        stop = threading.Event()
+        pressure = threading.Thread(target=_pressure, args=(stop,), daemon=True)
+        pressure.start()
+
+        for label, handler in (("sync db.py", _handler_sync), ("async_db", _handler_async)):
+            lat, stalls, elapsed = asyncio.run(_run(handler, args.handlers, args.concurrency))
+            print(
+                f"{label:<11} handlers/sec={args.handlers / elapsed:>9,.0f}  "
+                f"p50={_pct(lat, 0.50):7.2f}ms  p99={_pct(lat, 0.99):7.2f}ms  "
+                f"loop stall p99={_pct(stalls, 0.99):7.2f}ms  max={max(stalls) * 1000:7.2f}ms"
+                f"  (median stall {statistics.median(stalls) * 1000:.2f}ms)"
+            )
+
+        stop.set()
+        pressure.join()
+        async_db.shutdown()
+
+
+if __name__ == "__main__":
+    main()
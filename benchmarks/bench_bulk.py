@@ -0,0 +1,108 @@
+"""
+Bulk import/export throughput and memory (bot/bulk.py CLI).
+
+Writes N synthetic reminders to a CSV and a JSONL file, imports each into a
+fresh database with `python bulk.py import`, exports them again with
+`python bulk.py export`, and reports rows/s and the child's peak RSS (flat
+memory shows the streaming works; it includes up to DB_MMAP_SIZE of mapped
+database pages, so run with DB_MMAP_SIZE=0 to see the heap alone). For comparison, --baseline rows go
+through db.add_reminder one at a time, the only path there was before.
+
+    python benchmarks/bench_bulk.py [--rows 1000000] [--baseline 5000]
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bot")
+sys.path.insert(0, BOT_DIR)
+
+FIELDS = ("chat_id", "title", "datetime", "timezone", "priority", "category", "repeat")
+ZONES = ("UTC", "Europe/Berlin", "America/Toronto", "Asia/Tokyo")
+REPEATS = ("once", "once", "once", "daily", "weekly", "FREQ=MONTHLY;INTERVAL=3")
+
+
+def records(n: int):
+    start = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0) + datetime.timedelta(days=1)
+    for i in range(n):
+        yield {
+            "chat_id": 1000 + i % 20000,
+            "title": f"Imported reminder {i}",
+            "datetime": (start + datetime.timedelta(minutes=i % 500_000)).isoformat(),
+            "timezone": ZONES[i % len(ZONES)],
+            "priority": ("low", "normal", "urgent")[i % 3],
+            "category": "import" if i % 2 else "",
+            "repeat": REPEATS[i % len(REPEATS)],
+        }
+
+
+def write_inputs(tmp: str, n: int) -> dict:
+    paths = {"csv": os.path.join(tmp, "in.csv"), "jsonl": os.path.join(tmp, "in.jsonl")}
+    with open(paths["csv"], "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, FIELDS)
+        writer.writeheader()
+        writer.writerows(records(n))
+    with open(paths["jsonl"], "w", encoding="utf-8") as f:
+        for r in records(n):
+            f.write(json.dumps(r) + "\n")
+    return paths
+
+
+def run_cli(db_path: str, *args: str):
+    """Run bulk.py; returns (seconds, peak RSS MB of the child)."""
+    env = dict(os.environ, DB_PATH=db_path)
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "bulk.py", *args], cwd=BOT_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    _, status, usage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - t0
+    err = proc.stderr.read().decode()
+    proc.stderr.close()
+    if os.waitstatus_to_exitcode(status) != 0:
+        raise RuntimeError(f"bulk.py {' '.join(args)} failed:\n{err}")
+    return elapsed, usage.ru_maxrss / 1024
+
+
+def baseline(tmp: str, n: int) -> float:
+    """Rows/s through add_reminder (one call, one transaction per row)."""
+    import db
+
+    db.DB_PATH = os.path.join(tmp, "baseline.db")
+    db.init_db()
+    t0 = time.perf_counter()
+    for r in records(n):
+        db.add_reminder(r["chat_id"], r["title"], r["datetime"], r["timezone"], r["priority"],
+                        r["category"] or None, "none")
+    elapsed = time.perf_counter() - t0
+    db.close_all()
+    return n / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--baseline", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_inputs(tmp, args.rows)
+        print(f"{args.rows:,} reminders")
+        if args.baseline:
+            print(f"  add_reminder per row          {baseline(tmp, args.baseline):10,.0f} rows/s  ({args.baseline:,} rows)")
+        for fmt, path in paths.items():
+            db_path = os.path.join(tmp, f"{fmt}.db")
+            seconds, rss = run_cli(db_path, "import", path)
+            print(f"  import {fmt:<5}                  {args.rows / seconds:10,.0f} rows/s  {seconds:7.2f}s  peak RSS {rss:6.1f} MB")
+            out = os.path.join(tmp, f"out.{fmt}")
+            seconds, rss = run_cli(db_path, "export", out)
+            print(f"  export {fmt:<5}                  {args.rows / seconds:10,.0f} rows/s  {seconds:7.2f}s  peak RSS {rss:6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
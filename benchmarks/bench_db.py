@@ -0,0 +1,104 @@
+"""
+Micro-benchmark for bot/db.py: connect-per-call (the old behaviour) vs the
+pooled writer/reader connections.
+
+    python benchmarks/bench_db.py [--ops 5000]
+"""
+import argparse
+import datetime
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bot"))
+
+import db  # noqa: E402
+
+
+def _row_args(i: int):
+    when = datetime.datetime(2030, 1, 1) + datetime.timedelta(minutes=i)
+    return (1000 + i % 50, f"bench {i}", when.isoformat(), "UTC", "normal", None, "none")
+
+
+# ---------- Old behaviour: new connection per operation ----------
+
+def old_add(path, args):
+    conn = sqlite3.connect(path)
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO reminders (chat_id, title, datetime_utc, timezone, priority, category, repeat, status) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, 'pending')",
+        args,
+    )
+    rid = cur.lastrowid
+    conn.commit()
+    conn.close()
+    return rid
+
+
+def old_get(path, rid):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    row = conn.execute("SELECT * FROM reminders WHERE id = ?", (rid,)).fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+
+def old_set_status(path, rid, status):
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE reminders SET status = ? WHERE id = ?", (status, rid))
+    conn.commit()
+    conn.close()
+
+
+def _timed(label, fn, n):
+    start = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<22} {n / elapsed:>12,.0f} ops/sec")
+
+
+def run_old(path, n):
+    print("connect-per-call (rollback journal, synchronous=FULL):")
+    ids = []
+    _timed("add_reminder", lambda i: ids.append(old_add(path, _row_args(i))), n)
+    _timed("get_reminder", lambda i: old_get(path, ids[i]), n)
+    _timed("update_status", lambda i: old_set_status(path, ids[i], "done"), n)
+
+
+def run_pooled(path, n):
+    print(f"pooled (WAL, synchronous={db.DB_SYNCHRONOUS}):")
+    db.close_all()
+    db.DB_PATH = path
+    db.init_db()
+    ids = []
+    _timed("add_reminder", lambda i: ids.append(db.add_reminder(*_row_args(i))), n)
+    _timed("get_reminder", lambda i: db.get_reminder(ids[i]), n)
+    _timed("update_status", lambda i: db.update_reminder_status(ids[i], "done"), n)
+    db.close_all()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ops", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        old_path = os.path.join(tmp, "old.db")
+        conn = sqlite3.connect(old_path)
+        conn.execute(
+            "CREATE TABLE reminders (id INTEGER PRIMARY KEY AUTOINCREMENT, chat_id INTEGER NOT NULL, "
+            "title TEXT NOT NULL, datetime_utc TEXT NOT NULL, timezone TEXT, priority TEXT NOT NULL, "
+            "category TEXT, repeat TEXT NOT NULL DEFAULT 'none', status TEXT NOT NULL DEFAULT 'pending')"
+        )
+        conn.close()
+
+        run_old(old_path, args.ops)
+        run_pooled(os.path.join(tmp, "pooled.db"), args.ops)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Burst delivery benchmark against a stub Bot that enforces flood limits.
+
+A burst of reminders all falls due at t=0. "inline" fires every send at once
+(the old send_reminder_job behaviour); "queue" goes through DeliveryQueue.
+The stub answers with RetryAfter whenever the global or per-chat limit is
+exceeded, like Telegram does, and the inline mode loses those messages.
+
+Real limits (30 msg/s) would make 50k sends take half an hour, so limits and
+bucket rates are scaled together by --global-rate.
+
+    python benchmarks/bench_delivery.py [--reminders 50000] [--chats 20000] [--global-rate 5000]
+"""
+import argparse
+import asyncio
+import collections
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bot"))
+
+from telegram.error import RetryAfter  # noqa: E402
+
+from delivery import DeliveryQueue  # noqa: E402
+
+
+class StubBot:
+    """Accepts send_message calls, enforcing sliding one-second global/per-chat limits."""
+
+    def __init__(self, global_limit: int, chat_limit: int, latency: float) -> None:
+        self.global_limit = global_limit
+        self.chat_limit = chat_limit
+        self.latency = latency
+        self._window = collections.deque()
+        self._chat_windows = collections.defaultdict(collections.deque)
+        self.accepted = 0
+        self.rejected = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await asyncio.sleep(self.latency)
+        now = time.monotonic()
+        window = self._window
+        while window and now - window[0] > 1:
+            window.popleft()
+        chat_window = self._chat_windows[chat_id]
+        while chat_window and now - chat_window[0] > 1:
+            chat_window.popleft()
+        if len(window) >= self.global_limit or len(chat_window) >= self.chat_limit:
+            self.rejected += 1
+            raise RetryAfter(1)
+        window.append(now)
+        chat_window.append(now)
+        self.accepted += 1
+        return object()
+
+
+def _pct(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def _workload(n, chats, seed=7):
+    rnd = random.Random(seed)
+    prios = ["low"] * 2 + ["normal"] * 7 + ["urgent"]
+    return [(rnd.randrange(chats), rnd.choice(prios)) for _ in range(n)]
+
+
+async def run_inline(work, bot):
+    t0 = time.monotonic()
+
+    async def one(chat_id):
+        try:
+            await bot.send_message(chat_id=chat_id, text="reminder")
+        except RetryAfter:
+            pass
+
+    await asyncio.gather(*(one(c) for c, _ in work))
+    return time.monotonic() - t0
+
+
+async def run_queue(work, bot, global_rate):
+    queue = DeliveryQueue(bot, workers=64, global_rate=global_rate, chat_rate=0.9, chat_burst=1)
+    await queue.start()
+    lateness = collections.defaultdict(list)
+    t0 = time.monotonic()
+
+    async def one(chat_id, prio):
+        await queue.send(chat_id, "reminder", priority=prio)
+        lateness[prio].append(time.monotonic() - t0)
+
+    await asyncio.gather(*(one(c, p) for c, p in work))
+    elapsed = time.monotonic() - t0
+    await queue.stop()
+    return elapsed, lateness, queue
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reminders", type=int, default=50000)
+    parser.add_argument("--chats", type=int, default=20000)
+    parser.add_argument("--global-rate", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.002)
+    args = parser.parse_args()
+
+    work = _workload(args.reminders, args.chats)
+
+    bot = StubBot(args.global_rate, 1, args.latency)
+    elapsed = asyncio.run(run_inline(work, bot))
+    print(
+        f"inline: {elapsed:6.2f}s  delivered={bot.accepted}  "
+        f"lost to 429={bot.rejected} ({bot.rejected / len(work):.1%})"
+    )
+
+    bot = StubBot(args.global_rate, 1, args.latency)
+    # leave ~10% headroom under the server limit, as you would in production
+    elapsed, lateness, queue = asyncio.run(run_queue(work, bot, args.global_rate * 0.9))
+    print(
+        f"queue:  {elapsed:6.2f}s  delivered={queue.sent}  throughput={queue.sent / elapsed:,.0f} msg/s  "
+        f"429 retries={queue.retried}  failed={queue.failed}"
+    )
+    for prio in ("urgent", "normal", "low"):
+        lat = lateness[prio]
+        print(
+            f"  {prio:<7} n={len(lat):>6}  lateness p50={_pct(lat, .5):6.2f}s  "
+            f"p99={_pct(lat, .99):6.2f}s  max={max(lat):6.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Digest coalescing: many reminders of the same chats falling due together.
+
+Seeds --reminders reminders over --chats chats, all due in the same second
+(a quarter of them urgent), and runs bot/bot.py against FakeBotAPI twice
+with the real per-chat and global rate limits:
+
+- "separate": DIGEST_MAX_ITEMS=1, one message per reminder as before
+  (without the second message urgent ones used to get),
+- "digest": the defaults, one message per chat and tick.
+
+Reports messages sent and when the last reminder arrived. Checks that every
+reminder went out exactly once and, in digest mode, in one message per chat.
+
+    python benchmarks/bench_digest.py [--reminders 600] [--chats 60]
+"""
+import argparse
+import collections
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, "..", "bot"))
+
+from digest import DIGEST_MAX_ITEMS  # noqa: E402
+from run_suite import REMINDER_ID, _Bot, _seed, _wait_for_reminders  # noqa: E402
+
+
+def run(tmp: str, mode: str, n: int, chats: int, lead: float = 15.0) -> dict:
+    db_path = os.path.join(tmp, f"{mode}.db")
+    due_ts = int(time.time() + lead)
+    _seed(db_path, ((50_000 + i % chats, f"due {i}", due_ts) for i in range(n)))
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE reminders SET priority = 'urgent' WHERE id % 4 = 0")
+    bot = _Bot(db_path, {"DIGEST_MAX_ITEMS": "1"} if mode == "separate" else None)
+    try:
+        ok = _wait_for_reminders(bot.api, n, timeout=lead + 600)
+        messages = [c for c in list(bot.api.sent) if c["method"] == "sendMessage" and REMINDER_ID.search(c.get("text", ""))]
+        ids = collections.Counter(rid for c in messages for rid in REMINDER_ID.findall(c["text"]))
+        per_chat = collections.Counter(int(c["chat_id"]) for c in messages)
+        last = max(c["at"] for c in messages) if messages else due_ts
+        return {
+            "completed": ok,
+            "messages": len(messages),
+            "reminders": len(ids),
+            "duplicates": sum(count - 1 for count in ids.values()),
+            "max_messages_per_chat": max(per_chat.values()) if per_chat else 0,
+            "last_seconds": round(last - due_ts, 2),
+        }
+    finally:
+        bot.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reminders", type=int, default=600)
+    parser.add_argument("--chats", type=int, default=60)
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {mode: run(tmp, mode, args.reminders, args.chats) for mode in ("separate", "digest")}
+    print(f"{args.reminders} reminders due at once in {args.chats} chats")
+    for mode, res in results.items():
+        print(
+            f"  {mode:9s} {res['messages']:6d} messages, last reminder {res['last_seconds']:7.2f}s after due, "
+            f"max {res['max_messages_per_chat']} per chat"
+        )
+        if not res["completed"] or res["reminders"] != args.reminders or res["duplicates"]:
+            failures.append(f"{mode}: {res}")
+    per_chat = -(-args.reminders // args.chats)  # ceil
+    expected = args.chats * -(-per_chat // DIGEST_MAX_ITEMS)
+    if results["digest"]["messages"] > expected:
+        failures.append(f"digest sent {results['digest']['messages']} messages, expected at most {expected}")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    print("digest checks " + ("FAILED" if failures else "OK"))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+format_for_user throughput: the old per-call implementation vs timeutils.
+
+    python benchmarks/bench_format.py [--calls 200000]
+"""
+import argparse
+import datetime
+import logging
+import os
+import sys
+import time
+from zoneinfo import ZoneInfo
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bot"))
+
+import timeutils  # noqa: E402
+
+logging.disable(logging.WARNING)
+
+ZONES = ["America/Toronto", "Europe/Berlin", "Asia/Tokyo", "UTC", None, "Not/AZone"]
+
+
+def old_format_for_user(reminder: dict) -> str:
+    """bot.format_for_user before timeutils (ZoneInfo + label dicts per call)."""
+    utc_dt = datetime.datetime.fromisoformat(reminder["datetime_utc"])
+    utc_dt = utc_dt.replace(tzinfo=datetime.timezone.utc)
+    tz_name = reminder.get("timezone")
+    if tz_name:
+        try:
+            tz = ZoneInfo(tz_name)
+            local_dt = utc_dt.astimezone(tz)
+        except Exception:
+            logging.getLogger(__name__).warning("Failed to convert to user timezone %s, using UTC", tz_name)
+            local_dt = utc_dt
+    else:
+        local_dt = utc_dt
+    time_str = local_dt.strftime("%Y-%m-%d %H:%M")
+    repeat = reminder.get("repeat", "none")
+    repeat_label = {"none": "one-time", "daily": "every day", "weekly": "every week"}.get(repeat, repeat)
+    priority = reminder.get("priority", "normal")
+    priority_label = {"low": "low", "normal": "normal", "urgent": "urgent"}.get(priority, priority)
+    cat = reminder.get("category") or "No category"
+    return (
+        f"*{reminder['title']}*\n"
+        f"🕒 {time_str}\n"
+        f"🔁 {repeat_label}\n"
+        f"⚙️ Priority: {priority_label}\n"
+        f"🏷 Category: {cat}"
+    )
+
+
+def _reminders(n: int):
+    base = datetime.datetime(2030, 1, 1, tzinfo=datetime.timezone.utc)
+    return [
+        {
+            "id": i,
+            "version": 0,
+            "title": f"Reminder {i}",
+            "datetime_utc": (base + datetime.timedelta(minutes=i)).isoformat(),
+            "timezone": ZONES[i % len(ZONES)],
+            "priority": ("low", "normal", "urgent")[i % 3],
+            "category": None if i % 4 else "Work",
+            "repeat": ("none", "daily", "weekly")[i % 3],
+        }
+        for i in range(n)
+    ]
+
+
+def _bench(label, fn, items, calls):
+    n = len(items)
+    start = time.perf_counter()
+    for i in range(calls):
+        fn(items[i % n])
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<40} {calls / elapsed:>12,.0f} calls/sec")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--distinct", type=int, default=1000, help="distinct reminders (hot set size)")
+    args = parser.parse_args()
+
+    items = _reminders(args.distinct)
+    uncached = [{**r, "version": None} for r in items]
+
+    print(f"{args.calls:,} calls over {args.distinct:,} reminders:")
+    _bench("old (ZoneInfo + dicts per call)", old_format_for_user, items, args.calls)
+    _bench("timeutils, zone cache only", timeutils.format_for_user, uncached, args.calls)
+    _bench("timeutils, zone + render cache", timeutils.format_for_user, items, args.calls)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Group commit of the per-reminder writes, under a burst of due reminders.
+
+Seeds --reminders pending reminders and fires them all at once through
+async_db, --concurrency at a time, the way dispatch does: claim the
+delivery, then close the occurrence (every third one is a daily repeat and
+moves on to tomorrow instead). Runs the burst once per DB_WRITE_DURABILITY
+mode and reports writes/s, transactions and the p50/p99 latency of a fire.
+
+Checks, per mode, that every reminder ended up closed or moved on with one
+ledger record, and that a reminder read straight after a status change or
+snooze shows it (read-your-writes, also with durability=async).
+
+    python benchmarks/bench_group_commit.py [--reminders 5000] [--concurrency 200] [--synchronous FULL]
+"""
+import argparse
+import asyncio
+import datetime
+import functools
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bot"))
+
+MODES = ("sync", "group", "async")
+
+
+def _iso(ts: int) -> str:
+    return datetime.datetime.fromtimestamp(ts, datetime.timezone.utc).isoformat()
+
+
+def seed(db, n: int, due_ts: int) -> list:
+    with db.writer() as conn:
+        conn.executemany(
+            "INSERT INTO reminders (chat_id, title, datetime_utc, datetime_ts, timezone, priority, category, "
+            "repeat, status) VALUES (?, ?, ?, ?, 'Europe/Berlin', 'normal', NULL, ?, 'pending')",
+            ((1000 + i % 500, f"Reminder {i}", _iso(due_ts), due_ts, "daily" if i % 3 == 0 else "none") for i in range(n)),
+        )
+        return conn.execute("SELECT id, repeat FROM reminders ORDER BY id").fetchall()
+
+
+async def fire(async_db, reminder_id: int, repeat: str, due_ts: int, latencies: list) -> None:
+    t0 = time.perf_counter()
+    if await async_db.claim_delivery(reminder_id, due_ts):
+        if repeat == "daily":
+            await async_db.advance_recurrences([(_iso(due_ts + 86400), 1, None, reminder_id, due_ts)])
+        else:
+            await async_db.finish_reminder(reminder_id, due_ts)
+    latencies.append(time.perf_counter() - t0)
+
+
+async def burst(async_db, rows: list, due_ts: int, concurrency: int) -> dict:
+    latencies: list = []
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(reminder_id: int, repeat: str) -> None:
+        async with gate:
+            await fire(async_db, reminder_id, repeat, due_ts, latencies)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(reminder_id, repeat) for reminder_id, repeat in rows))
+    await async_db.flush()
+    seconds = time.perf_counter() - t0
+    latencies.sort()
+    return {
+        "seconds": seconds,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+
+async def read_your_writes(async_db, reminder_id: int) -> bool:
+    await async_db.update_reminder_status(reminder_id, "cancelled")
+    cancelled = (await async_db.get_reminder(reminder_id))["status"] == "cancelled"
+    await async_db.update_reminder_status(reminder_id, "done")
+    await async_db.snooze_reminder(reminder_id, 2_000_000_000)
+    moved = (await async_db.get_reminder(reminder_id))["notify_at"] == 2_000_000_000
+    return cancelled and moved
+
+
+async def run_mode(tmp: str, mode: str, args) -> dict:
+    import async_db
+    import db
+    from groupcommit import GroupCommitter
+
+    db.DB_PATH = os.path.join(tmp, f"{mode}.db")
+    db.init_db()
+    due_ts = int(time.time())
+    rows = seed(db, args.reminders, due_ts)
+    async_db.writes = GroupCommitter(functools.partial(async_db._run, async_db._write_executor, db.apply_writes), mode)
+
+    result = await burst(async_db, rows, due_ts, args.concurrency)
+    result["commits"] = async_db.writes.commits
+    with db.reader() as conn:
+        result["closed"] = conn.execute(
+            "SELECT COUNT(*) FROM reminders WHERE status = 'done' OR datetime_ts = ?", (due_ts + 86400,)
+        ).fetchone()[0]
+        result["ledger"] = conn.execute("SELECT COUNT(*) FROM deliveries").fetchone()[0]
+    result["read_your_writes"] = await read_your_writes(async_db, rows[-1][0])
+    db.close_all()
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reminders", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--synchronous", default="NORMAL", help="PRAGMA synchronous for the run (FULL fsyncs each commit)")
+    args = parser.parse_args()
+    os.environ["DB_SYNCHRONOUS"] = args.synchronous
+
+    failures = []
+    writes = args.reminders * 2
+    print(f"{args.reminders} reminders fired at once, {args.concurrency} at a time, synchronous={args.synchronous}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in MODES:
+            res = asyncio.run(run_mode(tmp, mode, args))
+            transactions = res["commits"] or writes
+            print(
+                f"  {mode:6s} {writes / res['seconds']:9,.0f} writes/s in {transactions:6d} transactions, "
+                f"fire p50 {res['p50_ms']:6.2f} ms p99 {res['p99_ms']:7.2f} ms"
+            )
+            if res["closed"] != args.reminders or res["ledger"] != args.reminders:
+                failures.append(f"{mode}: {res['closed']} closed, {res['ledger']} ledger records")
+            if not res["read_your_writes"]:
+                failures.append(f"{mode}: a read did not see the write before it")
+    import async_db
+
+    async_db.shutdown()
+    for failure in failures:
+        print(f"FAIL {failure}")
+    print("group commit checks " + ("FAILED" if failures else "OK"))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+Polling vs webhook ingestion throughput, fully local.
+
+Starts FakeBotAPI, runs bot/bot.py in a subprocess pointed at it, and pushes
+N synthetic /reminders updates from many chats, either through getUpdates
+(BOT_MODE=polling) or by POSTing them to the bot's webhook endpoint
+(BOT_MODE=webhook). Throughput is measured until the bot has answered every
+update with sendMessage.
+
+    python benchmarks/bench_ingest.py [--updates 2000] [--chats 200] [--concurrent-updates 64]
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_bot_api import FakeBotAPI, message_update  # noqa: E402
+
+BOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bot")
+SECRET = "bench-secret"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_bot(api: FakeBotAPI, mode: str, db_path: str, concurrent: int, webhook_port: int, extra_env=None):
+    env = dict(
+        os.environ,
+        BOT_TOKEN="123456:bench",
+        WEB_APP_URL="https://example.invalid/app",
+        DB_PATH=db_path,
+        BOT_API_URL=api.base_url,
+        BOT_MODE=mode,
+        CONCURRENT_UPDATES=str(concurrent),
+        WEBHOOK_URL=f"http://127.0.0.1:{webhook_port}",
+        WEBHOOK_LISTEN="127.0.0.1",
+        WEBHOOK_PORT=str(webhook_port),
+        WEBHOOK_SECRET=SECRET,
+        **(extra_env or {}),
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "bot.py"],
+        cwd=BOT_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    ready_call = "getUpdates" if mode == "polling" else "setWebhook"
+    if not api.wait_for_calls(ready_call, 1, timeout=30):
+        proc.kill()
+        raise RuntimeError(f"bot did not reach {ready_call}")
+    if mode == "webhook":
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", webhook_port), timeout=0.2).close()
+                break
+            except OSError:
+                time.sleep(0.05)
+    return proc
+
+
+def post_updates(port: int, updates, workers: int = 32) -> None:
+    url = f"http://127.0.0.1:{port}/telegram"
+
+    def post(update):
+        req = urllib.request.Request(
+            url,
+            data=json.dumps(update).encode(),
+            headers={"Content-Type": "application/json", "X-Telegram-Bot-Api-Secret-Token": SECRET},
+        )
+        urllib.request.urlopen(req, timeout=30).read()
+
+    with ThreadPoolExecutor(workers) as pool:
+        list(pool.map(post, updates))
+
+
+def run(mode: str, n: int, chats: int, concurrent: int) -> dict:
+    api = FakeBotAPI().start()
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        proc = start_bot(api, mode, os.path.join(tmp, "ingest.db"), concurrent, port)
+        try:
+            updates = [message_update(api, 10_000 + i % chats, "/reminders") for i in range(n)]
+            baseline = api.calls.get("sendMessage", 0)
+            t0 = time.perf_counter()
+            if mode == "polling":
+                api.push_updates(updates)
+            else:
+                post_updates(port, updates)
+            ok = api.wait_for_calls("sendMessage", baseline + n, timeout=300)
+            elapsed = time.perf_counter() - t0
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+            api.stop()
+    return {"mode": mode, "updates": n, "completed": ok, "seconds": elapsed, "updates_per_sec": n / elapsed}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--concurrent-updates", type=int, default=64)
+    parser.add_argument("--modes", default="polling,webhook")
+    args = parser.parse_args()
+
+    for mode in args.modes.split(","):
+        res = run(mode, args.updates, args.chats, args.concurrent_updates)
+        print(
+            f"{mode:<8} {res['updates']} updates in {res['seconds']:6.2f}s  "
+            f"-> {res['updates_per_sec']:8,.0f} updates/s{'' if res['completed'] else '  (TIMED OUT)'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
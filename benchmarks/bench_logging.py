@@ -0,0 +1,145 @@
+"""
+Per-update logging overhead in each logging mode.
+
+Replays the log calls one Mini App submission makes (webapp_data_handler,
+the dispatcher hand-off, PTB's httpx request line and, where enabled, the
+debug_update dump) N times, writing to a temporary log file. Each mode runs
+in its own process:
+
+- old:     logging.basicConfig at INFO, synchronous file writes, the debug
+           dump registered and the raw payload logged at INFO (before logconfig),
+- default: logconfig defaults (queue listener, payload at DEBUG, httpx at WARNING),
+- debug:   LOG_DEBUG_UPDATES=1 and webapp/dispatch at DEBUG,
+- sampled: 1 in 100 per-update records kept,
+- quiet:   per-update categories at WARNING,
+- json:    defaults with LOG_FORMAT=json.
+
+"caller" is the time spent on the handler's thread (what an update pays);
+"drained" includes the listener thread finishing every write.
+
+    python benchmarks/bench_logging.py [--updates 20000]
+"""
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bot")
+sys.path.insert(0, BOT_DIR)
+
+CATEGORIES = ("updates", "webapp", "dispatch")
+MODES = {
+    "old": {},
+    "default": {},
+    "debug": {"LOG_DEBUG_UPDATES": "1", "LOG_LEVELS": "webapp=DEBUG,dispatch=DEBUG"},
+    "sampled": {"LOG_SAMPLE": ",".join(f"{c}=0.01" for c in CATEGORIES)},
+    "quiet": {"LOG_LEVELS": ",".join(f"{c}=WARNING" for c in CATEGORIES)},
+    "json": {"LOG_FORMAT": "json"},
+}
+
+
+def child(mode: str, n: int, path: str) -> dict:
+    os.environ.update(MODES[mode], LOG_FILE=path)
+    import logging
+
+    from telegram import WebAppData
+
+    old = mode == "old"
+    if old:
+        logging.basicConfig(
+            filename=path,
+            format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
+            level=logging.INFO,
+        )
+        listener = None
+        debug_dump = True
+    else:
+        import logconfig
+
+        listener = logconfig.setup_logging()
+        debug_dump = logconfig.LOG_DEBUG_UPDATES
+
+    updates_log = logging.getLogger("updates")
+    webapp_log = logging.getLogger("webapp")
+    dispatch_log = logging.getLogger("dispatch")
+    httpx_log = logging.getLogger("httpx")
+    # before logconfig these were all INFO on one logger
+    detail = webapp_log.info if old else webapp_log.debug
+    scheduled = dispatch_log.info if old else dispatch_log.debug
+
+    event = datetime.datetime(2030, 1, 1, 9, 0, tzinfo=datetime.timezone.utc)
+    payload = {
+        "title": "Dentist", "datetime": event.isoformat(), "repeat": "weekly", "repeat_interval": 1,
+        "category": "health", "note": "bring the forms " * 8, "remind_before_minutes": 15,
+        "timezone": "Europe/Berlin", "priority": "normal",
+    }
+    raw = json.dumps(payload)
+    web_app_data = WebAppData(data=raw, button_text="Open NAiss REM")
+
+    t0 = time.perf_counter()
+    for i in range(n):
+        chat_id = 10_000 + i
+        if debug_dump:
+            updates_log.info("DEBUG update: chat_id=%s text=%r web_app_data=%r", chat_id, None, web_app_data)
+        detail("Received web_app_data from chat_id=%s: %s", chat_id, raw)
+        detail(
+            "Parsed payload: chat_id=%s title=%r datetime=%s tz=%s repeat_web=%s repeat_db=%s lead=%s",
+            chat_id, payload["title"], payload["datetime"], payload["timezone"], "weekly", "weekly", 15,
+        )
+        detail(
+            "Computed UTC times for chat_id=%s: event=%s notify=%s delay_seconds=%.2f",
+            chat_id, event, event - datetime.timedelta(minutes=15), 86400.0,
+        )
+        webapp_log.info(
+            "Saved reminder id=%s for chat_id=%s at %s (UTC). Repeat=%s Lead=%s",
+            i, chat_id, event.isoformat(), "weekly", 15,
+        )
+        scheduled("Scheduled reminder id=%s (chat_id=%s) in %.2f seconds (in_window=%s)", i, chat_id, 86400.0, False)
+        httpx_log.info('HTTP Request: %s %s "%s %d %s"', "POST", "https://api.telegram.org/bot.../sendMessage",
+                       "HTTP/1.1", 200, "OK")
+    caller = time.perf_counter() - t0
+    if listener:
+        listener.stop()
+    else:
+        logging.shutdown()
+    drained = time.perf_counter() - t0
+    return {
+        "caller_us": caller / n * 1e6,
+        "drained_us": drained / n * 1e6,
+        "lines": sum(1 for _ in open(path, encoding="utf-8")) / n,
+        "bytes": os.path.getsize(path) / n,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=20000)
+    parser.add_argument("--child", choices=list(MODES))
+    parser.add_argument("--log")
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child, args.updates, args.log)))
+        return
+
+    print(f"{args.updates:,} Mini App updates, per update:")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in MODES:
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", mode, "--updates", str(args.updates),
+                 "--log", os.path.join(tmp, f"{mode}.log")],
+                capture_output=True, text=True, check=True,
+            )
+            res = json.loads(out.stdout.strip().splitlines()[-1])
+            print(
+                f"  {mode:<8} caller {res['caller_us']:7.1f} µs   drained {res['drained_us']:7.1f} µs   "
+                f"{res['lines']:5.2f} lines  {res['bytes']:6.0f} bytes"
+            )
+
+
+if __name__ == "__main__":
+    main()
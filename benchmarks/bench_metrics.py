@@ -0,0 +1,102 @@
+"""
+Cost of recording metrics, and a scrape of the endpoint.
+
+Times counter.inc(), histogram.observe() and the timed() decorator (sync
+and async) against an undecorated call, in ns per sample, then fetches
+/metrics from a local server and checks the output parses. Fails if any
+sample costs a microsecond or more.
+
+    python benchmarks/bench_metrics.py [--samples 1000000]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bot"))
+
+import metrics  # noqa: E402
+
+LIMIT_NS = 1000
+
+
+def _per_call_ns(fn, n: int) -> float:
+    start = time.perf_counter_ns()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter_ns() - start) / n
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samples", type=int, default=1_000_000)
+    args = parser.parse_args()
+    n = args.samples
+
+    hits = metrics.counter("bench_hits_total", "Benchmark counter.")
+    seconds = metrics.histogram("bench_seconds", "Benchmark histogram.", label="function")
+    hist = seconds.labels("direct")
+
+    def plain():
+        return None
+
+    timed_plain = metrics.timed(seconds)(plain)
+
+    async def plain_async():
+        return None
+
+    timed_async = metrics.timed(seconds, "plain_async")(plain_async)
+
+    async def drive(fn, count):
+        for _ in range(count):
+            await fn()
+
+    def async_ns(fn) -> float:
+        start = time.perf_counter_ns()
+        asyncio.run(drive(fn, n))
+        return (time.perf_counter_ns() - start) / n
+
+    baseline = _per_call_ns(plain, n)
+    baseline_async = async_ns(plain_async)
+    results = {
+        "counter.inc": _per_call_ns(hits.inc, n),
+        "histogram.observe": _per_call_ns(lambda: hist.observe(0.003), n) - baseline,
+        "timed (sync)": _per_call_ns(timed_plain, n) - baseline,
+        "timed (async)": async_ns(timed_async) - baseline_async,
+    }
+
+    failures = 0
+    print(f"{n:,} samples each")
+    for name, ns in results.items():
+        ok = ns < LIMIT_NS
+        failures += not ok
+        print(f"  {name:<18} {ns:7.0f} ns/sample  {'OK' if ok else 'FAIL'}")
+
+    server = metrics.start_http_server(port=_free_port(), host="127.0.0.1")
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        start = time.perf_counter()
+        body = urllib.request.urlopen(url, timeout=5).read().decode()
+        elapsed = (time.perf_counter() - start) * 1000
+    finally:
+        server.shutdown()
+    samples = [line for line in body.splitlines() if line and not line.startswith("#")]
+    parsed = all(len(line.rsplit(" ", 1)) == 2 and float(line.rsplit(" ", 1)[1]) >= 0 for line in samples)
+    expected = f'bench_seconds_count{{function="direct"}} {n}'
+    ok = parsed and expected in body and f"bench_hits_total {n}" in body
+    failures += not ok
+    print(f"  scrape: {len(samples)} samples, {len(body):,} bytes in {elapsed:.1f} ms  {'OK' if ok else 'FAIL'}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""
+Reminder cache on the dispatch and button paths.
+
+Seeds --reminders pending reminders, then for each one runs what the bot
+does through async_db: the send (get_reminder, ledger claim,
+finish or move a daily repeat on, read it again to reschedule) followed by
+a button press (get_reminder, then snooze with a re-read, or mark done).
+Runs once with the cache off and once on, and reports database reads of
+single reminders, the cache hit ratio, the average get_reminder time and
+the memory a cached reminder takes against the plain dict row.
+
+Checks that with the cache on the button press reads nothing from the
+database, and that every cached reminder equals its row in the database
+after the run.
+
+    python benchmarks/bench_reminder_cache.py [--reminders 3000]
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bot"))
+
+import async_db  # noqa: E402
+import db  # noqa: E402
+from reminder_cache import FIELDS, ReminderCache  # noqa: E402
+
+reads = 0
+get_seconds = 0.0
+_db_get_reminder = db.get_reminder
+
+
+def counting_get_reminder(reminder_id):
+    global reads
+    reads += 1
+    return _db_get_reminder(reminder_id)
+
+
+async def get(reminder_id: int) -> dict:
+    global get_seconds
+    t0 = time.perf_counter()
+    reminder = await async_db.get_reminder(reminder_id)
+    get_seconds += time.perf_counter() - t0
+    return reminder
+
+
+def _iso(ts: int) -> str:
+    return datetime.datetime.fromtimestamp(ts, datetime.timezone.utc).isoformat()
+
+
+def seed(n: int, due_ts: int) -> list:
+    with db.writer() as conn:
+        conn.executemany(
+            "INSERT INTO reminders (chat_id, title, datetime_utc, datetime_ts, timezone, priority, category, "
+            "repeat, status) VALUES (?, ?, ?, ?, 'Europe/Berlin', 'normal', 'work', ?, 'pending')",
+            ((1000 + i, f"Reminder {i}", _iso(due_ts), due_ts, "daily" if i % 3 == 0 else "none") for i in range(n)),
+        )
+        return [row[0] for row in conn.execute("SELECT id FROM reminders ORDER BY id")]
+
+
+async def send(reminder_id: int) -> None:
+    reminder = await get(reminder_id)
+    due_ts = reminder["notify_at"]
+    await async_db.claim_delivery(reminder_id, due_ts)
+    if reminder["repeat"] == "daily":
+        await async_db.advance_recurrences([(_iso(due_ts + 86400), 1, None, reminder_id, due_ts)])
+        await get(reminder_id)
+    else:
+        await async_db.finish_reminder(reminder_id, due_ts)
+
+
+async def press(reminder_id: int, snooze: bool) -> None:
+    reminder = await get(reminder_id)
+    if snooze:
+        await async_db.snooze_reminder(reminder_id, reminder["notify_at"] + 600)
+        await get(reminder_id)
+    else:
+        await async_db.update_reminder_status(reminder_id, "done")
+
+
+async def run(tmp: str, enabled: bool, n: int) -> dict:
+    global reads, get_seconds
+    db.DB_PATH = os.path.join(tmp, f"cache-{enabled}.db")
+    db.init_db()
+    ids = seed(n, int(time.time()))
+    cache = async_db.reminder_cache = ReminderCache(max_size=n if enabled else 0)
+    async_db.writes._on_failure = cache.invalidate
+
+    reads, get_seconds = 0, 0.0
+    for reminder_id in ids:
+        await send(reminder_id)
+    send_reads = reads
+    for i, reminder_id in enumerate(ids):
+        await press(reminder_id, snooze=i % 2 == 0)
+    press_reads = reads - send_reads
+    hits, lookups = cache.hits, cache.hits + cache.misses
+
+    await async_db.flush()
+    stale = 0
+    for reminder_id in ids:
+        cached = cache.get(reminder_id)
+        row = _db_get_reminder(reminder_id)
+        if cached is not None and cached != {field: row[field] for field in FIELDS}:
+            stale += 1
+    db.close_all()
+    return {
+        "send_reads": send_reads,
+        "press_reads": press_reads,
+        "hit_ratio": hits / lookups if lookups else 0.0,
+        "get_us": get_seconds / lookups * 1e6 if lookups else 0.0,
+        "stale": stale,
+    }
+
+
+def record_bytes(n: int = 2000) -> tuple:
+    """Average bytes per reminder: as a sqlite dict row, and as a cached record."""
+    row = {field: None for field in FIELDS}
+    row.update(id=1, chat_id=1000, title="Reminder title", datetime_utc=_iso(0), datetime_ts=0, version=0)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    rows = [dict(row, id=i, title=f"Reminder {i}", claimed_by=None, lease_expires=None, sync_seq=i) for i in range(n)]
+    as_dicts = tracemalloc.take_snapshot().compare_to(before, "filename")
+    cache = ReminderCache(max_size=n)
+    mid = tracemalloc.take_snapshot()
+    for r in rows:
+        cache.loaded(r["id"], r, cache.begin_load(r["id"]))
+    cached = tracemalloc.take_snapshot().compare_to(mid, "filename")
+    tracemalloc.stop()
+    return sum(s.size_diff for s in as_dicts) / n, sum(s.size_diff for s in cached) / n
+
+
+async def main_async(args) -> int:
+    db.get_reminder = counting_get_reminder
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        off = await run(tmp, False, args.reminders)
+        on = await run(tmp, True, args.reminders)
+    async_db.shutdown()
+
+    print(f"{args.reminders} reminders sent, then one button press each")
+    for name, res in (("no cache", off), ("cache", on)):
+        print(
+            f"  {name:9s} db reads: send {res['send_reads']:6d}, press {res['press_reads']:6d}; "
+            f"hit ratio {res['hit_ratio']:5.1%}, get_reminder {res['get_us']:6.1f} us avg"
+        )
+    dict_bytes, record_size = record_bytes()
+    print(f"  memory per reminder: dict row {dict_bytes:.0f} B, cached record {record_size:.0f} B (incl. index)")
+
+    if on["press_reads"]:
+        failures.append(f"button presses read the database {on['press_reads']} times")
+    if on["stale"]:
+        failures.append(f"{on['stale']} cached reminders differ from the database")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    print("reminder cache checks " + ("FAILED" if failures else "OK"))
+    return 1 if failures else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reminders", type=int, default=3000)
+    return asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""
+Retention run over a database that has accumulated years of closed reminders.
+
+Seeds --closed done/cancelled rows spread over the past two years (each with a
+delivery record) and --pending future ones, then runs one retention pass
+while a writer keeps finishing reminders through async_db, like dispatch in
+a busy minute. Reports rows/s archived, the database size before and after,
+the longest a dispatch write waited, and checks that:
+
+- every pending row is untouched and every old closed one was archived,
+- archived rows keep their lead (remind_before_minutes),
+- recent closed rows and their ledger records stay,
+- a Mini App client that synced before the removed rows is sent a full
+  listing (reset) and one that synced after is not.
+
+Exits non-zero on a failed check.
+
+    python benchmarks/bench_retention.py [--closed 200000] [--pending 20000]
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bot"))
+
+import async_db  # noqa: E402
+import db  # noqa: E402
+import retention  # noqa: E402
+
+DAY = 86400
+
+
+def _iso(ts: int) -> str:
+    return datetime.datetime.fromtimestamp(ts, datetime.timezone.utc).isoformat()
+
+
+def seed(closed: int, pending: int, now: int) -> None:
+    with db.writer() as conn:
+        conn.executemany(
+            "INSERT INTO reminders (chat_id, title, datetime_utc, datetime_ts, timezone, priority, category, "
+            "repeat, note, status, lead_minutes) "
+            "VALUES (?, ?, ?, ?, 'Europe/Berlin', 'normal', 'work', 'none', ?, ?, ?)",
+            (
+                (1000 + i % 5000, f"Closed reminder {i} with a reasonably long title", _iso(ts), ts,
+                 "a note" if i % 3 == 0 else None, "done" if i % 4 else "cancelled", 15 if i % 5 == 0 else 0)
+                for i in range(closed)
+                for ts in [now - 2 * 365 * DAY + i * (2 * 365 * DAY) // closed]
+            ),
+        )
+        conn.execute(
+            "INSERT INTO deliveries (reminder_id, due_ts, recorded_at) "
+            "SELECT id, datetime_ts, datetime_ts FROM reminders WHERE status = 'done'"
+        )
+        conn.executemany(
+            "INSERT INTO reminders (chat_id, title, datetime_utc, datetime_ts, timezone, priority, category, "
+            "repeat, status) VALUES (?, ?, ?, ?, 'Europe/Berlin', 'normal', NULL, 'daily', 'pending')",
+            (
+                (1000 + i % 5000, f"Pending reminder {i}", _iso(ts), ts)
+                for i in range(pending)
+                for ts in [now + 60 + i * 30]
+            ),
+        )
+
+
+def counts() -> dict:
+    with db.reader() as conn:
+        return {
+            "pending": conn.execute("SELECT COUNT(*) FROM reminders WHERE status = 'pending'").fetchone()[0],
+            "closed": conn.execute("SELECT COUNT(*) FROM reminders WHERE status != 'pending'").fetchone()[0],
+            "deliveries": conn.execute("SELECT COUNT(*) FROM deliveries").fetchone()[0],
+            "max_seq": conn.execute("SELECT seq FROM sync_clock").fetchone()[0],
+        }
+
+
+async def dispatch_load(stop: asyncio.Event, waits: list) -> None:
+    """Close one pending reminder at a time, as the dispatcher would."""
+    with db.reader() as conn:
+        rows = conn.execute(
+            "SELECT id, datetime_ts FROM reminders WHERE status = 'pending' ORDER BY datetime_ts LIMIT 5000"
+        ).fetchall()
+    for reminder_id, due_ts in rows:
+        if stop.is_set():
+            return
+        t0 = time.perf_counter()
+        await async_db.finish_reminder(reminder_id, due_ts)
+        waits.append(time.perf_counter() - t0)
+        await asyncio.sleep(0.005)
+
+
+async def run(args) -> int:
+    failures = []
+
+    def check(ok: bool, what: str) -> None:
+        if not ok:
+            failures.append(what)
+
+    now = int(time.time())
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "retention.db")
+        db.init_db()
+        with db.writer() as conn:
+            # an existing reminders.db predates incremental vacuum
+            conn.execute("PRAGMA auto_vacuum=NONE")
+            conn.execute("VACUUM")
+        seed(args.closed, args.pending, now)
+        before = counts()
+        old_client = before["max_seq"] // 2
+        # closed rows are spread evenly over two years; those older than the cutoff go
+        expected = int(args.closed * (2 * 365 - args.days) / (2 * 365))
+        with db.reader() as conn:
+            expected_leads = conn.execute(
+                "SELECT COUNT(*) FROM reminders WHERE status != 'pending' AND datetime_ts < ? AND lead_minutes = 15",
+                (int(now - args.days * DAY),),
+            ).fetchone()[0]
+        print(f"{before['pending']:,} pending, {before['closed']:,} closed, {before['deliveries']:,} ledger records")
+
+        stop = asyncio.Event()
+        waits: list = []
+        load = asyncio.create_task(dispatch_load(stop, waits))
+        report = await retention.Retention(days=args.days).run(now)
+        stop.set()
+        await load
+
+        after = counts()
+        archived_path = retention.archive_path(db.DB_PATH)
+        with sqlite3.connect(archived_path) as archive:
+            in_archive = archive.execute("SELECT COUNT(*) FROM reminders").fetchone()[0]
+            archived_leads = archive.execute("SELECT COUNT(*) FROM reminders WHERE lead_minutes = 15").fetchone()[0]
+        print(
+            f"archived {report.archived:,} rows in {report.seconds:.2f}s "
+            f"({report.archived / report.seconds:,.0f} rows/s), pruned {report.deliveries_pruned:,} ledger records"
+        )
+        print(
+            f"database {report.size_before / 2**20:.1f} -> {report.size_after / 2**20:.1f} MiB, "
+            f"archive {os.path.getsize(archived_path) / 2**20:.1f} MiB"
+        )
+        if waits:
+            waits.sort()
+            print(
+                f"dispatch writes during the run: {len(waits)}, p50 {waits[len(waits) // 2] * 1000:.1f} ms, "
+                f"max {waits[-1] * 1000:.1f} ms"
+            )
+
+        check(abs(report.archived - expected) <= 1, f"archived {report.archived}, expected about {expected}")
+        check(in_archive == report.archived, f"archive holds {in_archive} rows")
+        check(archived_leads == expected_leads, f"{archived_leads} archived rows kept their lead of {expected_leads}")
+        check(after["pending"] + len(waits) == before["pending"], "pending rows were lost")
+        check(after["closed"] == before["closed"] - report.archived + len(waits), "closed rows miscounted")
+        check(after["deliveries"] > 0, "recent ledger records were pruned")
+        check(report.size_after < report.size_before, "database did not shrink")
+        with db.reader() as conn:
+            check(conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2, "not converted to incremental vacuum")
+        floor = db.get_sync_floor()
+        check(old_client < floor <= after["max_seq"], f"sync floor {floor}")
+        check(report.size_before - report.size_after == report.reclaimed, "reclaimed misreported")
+
+        # a second run has nothing left to do
+        again = await retention.Retention(days=args.days).run(now)
+        check(again.archived == 0 and again.deliveries_pruned == 0, "second run found more work")
+        async_db.shutdown()
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    print("retention checks " + ("FAILED" if failures else "OK"))
+    return 1 if failures else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--closed", type=int, default=200000)
+    parser.add_argument("--pending", type=int, default=20000)
+    parser.add_argument("--days", type=float, default=30)
+    return asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+Startup cost with a large backlog of pending reminders.
+
+For each size, builds a database whose pending reminders are spread over the
+next year, then starts a fresh process in each mode and reports wall time
+and peak RSS:
+
+- old:  every pending row in one query + one APScheduler job per row
+        (what on_startup used to do),
+- eager: ReminderDispatcher.refill() streaming only the first window,
+- lazy: time until polling could start when the window loads in the background.
+
+    python benchmarks/bench_startup.py [--sizes 10000,100000,1000000]
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bot")
+sys.path.insert(0, BOT_DIR)
+
+YEAR_SECONDS = 365 * 24 * 3600
+
+
+def build(path: str, n: int) -> None:
+    import db
+
+    db.DB_PATH = path
+    db.init_db()
+    now = datetime.datetime.now(datetime.timezone.utc)
+    step = YEAR_SECONDS / n
+    with db.writer() as conn:
+        conn.executemany(
+            "INSERT INTO reminders (chat_id, title, datetime_utc, datetime_ts, timezone, priority, category, repeat) "
+            "VALUES (?, ?, ?, ?, 'UTC', 'normal', NULL, 'none')",
+            (
+                (i % 5000, f"reminder {i}", *db.normalize_datetime((now + datetime.timedelta(seconds=60 + i * step)).isoformat()))
+                for i in range(n)
+            ),
+        )
+    db.close_all()
+
+
+def child(mode: str, path: str) -> None:
+    os.environ["BOT_TOKEN"] = os.environ.get("BOT_TOKEN", "0:bench")
+    import db
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+    from scheduler import ReminderDispatcher
+
+    db.DB_PATH = path
+    t0 = time.perf_counter()
+    held = 0
+
+    if mode == "old":
+        async def run():
+            scheduler = AsyncIOScheduler()
+            scheduler.start(paused=True)
+            now = datetime.datetime.now(datetime.timezone.utc)
+            with db.reader() as conn:
+                rows = conn.execute(
+                    "SELECT * FROM reminders WHERE status = 'pending' AND notify_at >= ?", (int(time.time()),)
+                ).fetchall()
+            for r in rows:
+                when = datetime.datetime.fromisoformat(r["datetime_utc"])
+                if when > now:
+                    scheduler.add_job(print, "date", run_date=when, args=(r["id"],), id=f"reminder-{r['id']}")
+            return len(rows)
+
+        held = asyncio.run(run())
+    else:
+        async def noop(*args):
+            pass
+
+        async def run():
+            dispatcher = ReminderDispatcher(noop)
+            if mode == "lazy":
+                task = asyncio.create_task(dispatcher.refill())
+                ready = time.perf_counter() - t0  # polling would start here
+                await task
+                return ready
+            await dispatcher.refill()
+            return len(dispatcher)
+
+        result = asyncio.run(run())
+        if mode == "lazy":
+            print(json.dumps({"seconds": result, "held": 0, "rss_mb": 0}))
+            return
+        held = result
+
+    elapsed = time.perf_counter() - t0
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"seconds": elapsed, "held": held, "rss_mb": rss_mb}))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--child", choices=["old", "eager", "lazy"])
+    parser.add_argument("--db")
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.db)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in (int(s) for s in args.sizes.split(",")):
+            path = os.path.join(tmp, f"startup-{n}.db")
+            build(path, n)
+            print(f"{n:>9,} pending reminders")
+            for mode in ("old", "eager", "lazy"):
+                out = subprocess.run(
+                    [sys.executable, __file__, "--child", mode, "--db", path],
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                )
+                res = json.loads(out.stdout.strip().splitlines()[-1])
+                extra = "" if mode == "lazy" else f"  held={res['held']:>9,}  peak RSS={res['rss_mb']:7.1f} MB"
+                label = "until polling" if mode == "lazy" else "startup"
+                print(f"  {mode:<6} {label:<14} {res['seconds']:8.3f}s{extra}")
+
+
+if __name__ == "__main__":
+    main()
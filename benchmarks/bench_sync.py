@@ -0,0 +1,222 @@
+"""
+Mini App sync API: delta sync against full reloads, and a protocol check.
+
+Seeds a chat with N pending reminders (plus other chats), serves
+bot/sync_api.py on a local port and, over one keep-alive connection:
+
+- runs a first sync (since=0, what a full reload costs every time),
+  with and without gzip,
+- changes a few rows (edits through the API, fires through db.py) and
+  runs a delta sync from the version the first one returned,
+- polls an unchanged chat (304),
+
+reporting bytes on the wire and ms per request. It also checks that forged
+initData gets 401, another chat's reminder 404, a stale If-Match 412, a
+negative or unparseable Content-Length 400 and one over the cap 413, and
+that the dispatcher callback saw each write. Writes run on an event loop in
+a background thread, as the bot's loop runs them. Exits non-zero on a
+failed check.
+
+    python benchmarks/bench_sync.py [--reminders 5000]
+"""
+import argparse
+import asyncio
+import datetime
+import gzip
+import hashlib
+import hmac
+import http.client
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bot"))
+
+import db  # noqa: E402
+import sync_api  # noqa: E402
+
+TOKEN = "123456:bench-token"
+CHAT_ID = 4242
+
+
+def init_data(user_id: int, token: str = TOKEN) -> str:
+    """initData as Telegram would sign it for this bot."""
+    fields = {
+        "auth_date": str(int(time.time())),
+        "query_id": "AAH-bench",
+        "user": json.dumps({"id": user_id, "first_name": "Bench"}, separators=(",", ":")),
+    }
+    check = "\n".join(f"{k}={v}" for k, v in sorted(fields.items()))
+    secret = hmac.new(b"WebAppData", token.encode(), hashlib.sha256).digest()
+    fields["hash"] = hmac.new(secret, check.encode(), hashlib.sha256).hexdigest()
+    return urlencode(fields)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def seed(n: int) -> None:
+    start = int(time.time()) + 86400
+    rows = []
+    for i in range(n * 3):
+        chat_id = CHAT_ID if i % 3 == 0 else CHAT_ID + i % 3
+        ts = start + i * 60
+        iso = datetime.datetime.fromtimestamp(ts, datetime.timezone.utc).isoformat()
+        rows.append((chat_id, f"Reminder {i} with a reasonably long title", iso, ts, "Europe/Berlin",
+                     "normal", "work" if i % 2 else None, "none", None, 0, 0, ts))
+    db.insert_reminders(rows)
+
+
+def raw_status(port: int, content_length: str) -> int:
+    """Status of a POST that sends only headers, with the given Content-Length value."""
+    with socket.create_connection(("127.0.0.1", port), timeout=10) as sock:
+        sock.sendall(
+            f"POST /api/reminders HTTP/1.1\r\nHost: bench\r\nAuthorization: tma {init_data(CHAT_ID)}\r\n"
+            f"Content-Length: {content_length}\r\n\r\n".encode()
+        )
+        return int(sock.makefile("rb").readline().split()[1])
+
+
+class Client:
+    def __init__(self, port: int, user_id: int = CHAT_ID, use_gzip: bool = True) -> None:
+        self.conn = http.client.HTTPConnection("127.0.0.1", port)
+        self.auth = f"tma {init_data(user_id)}"
+        self.use_gzip = use_gzip
+
+    def request(self, method: str, path: str, body=None, headers=None):
+        """(status, bytes on the wire, decoded JSON or None, ms)."""
+        headers = {"Authorization": self.auth, **(headers or {})}
+        if self.use_gzip:
+            headers["Accept-Encoding"] = "gzip"
+        data = json.dumps(body).encode() if body is not None else None
+        if data:
+            headers["Content-Type"] = "application/json"
+        t0 = time.perf_counter()
+        self.conn.request(method, path, body=data, headers=headers)
+        res = self.conn.getresponse()
+        raw = res.read()
+        ms = (time.perf_counter() - t0) * 1000
+        if res.getheader("Content-Encoding") == "gzip":
+            raw_json = gzip.decompress(raw)
+        else:
+            raw_json = raw
+        return res.status, len(raw), json.loads(raw_json) if raw_json else None, ms
+
+    def sync(self, since: int):
+        """Every page from since; (version, rows, wire bytes, ms)."""
+        rows, wire, ms = [], 0, 0.0
+        while True:
+            status, size, page, took = self.request("GET", f"/api/reminders?since={since}")
+            wire += size
+            ms += took
+            if status == 304:
+                return since, rows, wire, ms
+            rows += page["reminders"]
+            since = page["version"]
+            if not page["more"]:
+                return since, rows, wire, ms
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reminders", type=int, default=5000)
+    args = parser.parse_args()
+
+    failures = []
+
+    def check(ok: bool, what: str) -> None:
+        if not ok:
+            failures.append(what)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "sync.db")
+        db.init_db()
+        seed(args.reminders)
+
+        changes = []
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, daemon=True).start()
+        server = sync_api.start_server(TOKEN, lambda *change: changes.append(change), loop, port=_free_port())
+        port = server.server_address[1]
+        client = Client(port)
+
+        version, rows, wire_gzip, ms_full = client.sync(0)
+        _, _, wire_plain, _ = Client(port, use_gzip=False).sync(0)
+        check(len(rows) == args.reminders, f"first sync returned {len(rows)} rows")
+        print(f"{args.reminders:,} reminders in the chat")
+        print(f"  full sync (reload)   {wire_plain / 1024:9.1f} KiB plain  {wire_gzip / 1024:7.1f} KiB gzip  "
+              f"{ms_full:7.1f} ms")
+
+        # a few edits from the app and a few reminders firing in the chat
+        when = (datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=3)).isoformat()
+        for row in rows[:5]:
+            status, _, edited, _ = client.request(
+                "PUT", f"/api/reminders/{row['id']}",
+                {**row, "title": row["title"] + " (edited)", "datetime": when},
+                {"If-Match": f'"{row["version"]}"'},
+            )
+            check(status == 200 and edited["title"].endswith("(edited)"), f"edit returned {status}")
+        for row in rows[5:10]:
+            fired = db.get_reminder(int(row["id"]))
+            db.finish_reminder(fired["id"], fired["notify_at"])
+
+        new_version, delta, wire_delta, ms_delta = client.sync(version)
+        closed = [r for r in delta if r["status"] != "pending"]
+        check(len(delta) == 10 and len(closed) == 5, f"delta returned {len(delta)} rows, {len(closed)} closed")
+        check(new_version > version, "delta did not advance the version")
+        print(f"  delta (10 changed)   {wire_delta / 1024:9.1f} KiB wire              {ms_delta:7.1f} ms")
+
+        polls = 200
+        t0 = time.perf_counter()
+        for _ in range(polls):
+            status, size, _, _ = client.request("GET", f"/api/reminders?since={new_version}")
+            check(status == 304, f"unchanged poll returned {status}")
+        print(f"  unchanged poll (304) {size:9d} B   wire              "
+              f"{(time.perf_counter() - t0) * 1000 / polls:7.2f} ms")
+
+        # protocol checks
+        status, _, _, _ = Client(port, user_id=CHAT_ID).request(
+            "GET", "/api/reminders", headers={"Authorization": f"tma {init_data(CHAT_ID, 'other:token')}"}
+        )
+        check(status == 401, f"forged initData got {status}")
+        intruder = Client(port, user_id=CHAT_ID + 1)
+        status, _, _, _ = intruder.request("DELETE", f"/api/reminders/{rows[20]['id']}")
+        check(status == 404, f"another chat's delete got {status}")
+        status, _, body, _ = client.request(
+            "DELETE", f"/api/reminders/{rows[0]['id']}", headers={"If-Match": f'"{rows[0]["version"]}"'}
+        )
+        check(status == 412 and body["reminder"]["title"].endswith("(edited)"), f"stale If-Match got {status}")
+        status, _, created, _ = client.request("POST", "/api/reminders", {
+            "title": "From the app", "datetime": when, "repeat": "weekly", "remind_before_minutes": 15,
+            "timezone": "Europe/Berlin", "note": "bring forms",
+        })
+        check(status == 201 and created["repeat"] == "weekly" and created["note"] == "bring forms",
+              f"create got {status}")
+        status, _, _, _ = client.request("DELETE", f"/api/reminders/{created['id']}",
+                                         headers={"If-Match": f'"{created["version"]}"'})
+        check(status == 200, f"delete got {status}")
+        check(len(changes) == 7 and changes[-1][2] is None, f"dispatcher saw {len(changes)} changes")
+        for value, expected in (("-1", 400), ("12abc", 400), (str(sync_api.MAX_BODY_BYTES + 1), 413)):
+            status = raw_status(port, value)
+            check(status == expected, f"Content-Length {value} got {status}")
+
+        server.shutdown()
+        loop.call_soon_threadsafe(loop.stop)
+        db.close_all()
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    print("protocol checks " + ("FAILED" if failures else "OK"))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+"""
+Leased multi-worker dispatch: exactly-once check and throughput scaling.
+
+For each worker count, starts FakeBotAPI and that many bot/bot.py processes
+(DISPATCH_MODE=leased, BOT_MODE=none) on one fresh database. It then inserts
+N one-time reminders that all fall due together, and waits until every one
+was sent. Reminder ids are read back from the sent texts; any reminder sent
+twice fails the run, and so does one never sent.
+
+The fake API answers sendMessage after --api-latency seconds, a round trip
+to Telegram, and each worker keeps its default DELIVERY_WORKERS (8) sends in
+flight, so one process tops out near 8 / latency messages per second and
+more workers send more in parallel. Rate limits are raised so that only
+that, claiming and the database are measured. Each worker serves metrics on
+its own port; the share of messages each one sent and the CPU seconds it
+used are reported. The workers, the fake API and SQLite share the machine's
+cores (printed first): once they are busy, more workers stop helping, and
+--api-latency 0 measures just that CPU ceiling.
+
+--kill-one SIGKILLs one worker partway through with short leases; the
+survivors must pick up its claims once they lapse. The delivery ledger is
+claimed right before each send, so nothing may be sent twice. A reminder may
+only be missing if the killed worker claimed it and died before Telegram
+answered (its ledger row is still unconfirmed); those are reported as lost
+in flight.
+
+    python benchmarks/bench_workers.py [--reminders 5000] [--workers 1,2,4,8] [--strategy steal|shard]
+        [--api-latency 0.05] [--kill-one]
+"""
+import argparse
+import collections
+import datetime
+import os
+import re
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BOT_DIR = os.path.join(HERE, "..", "bot")
+sys.path.insert(0, HERE)
+sys.path.insert(0, BOT_DIR)
+
+from fake_bot_api import FakeBotAPI  # noqa: E402
+from run_suite import _wait_for_reminders  # noqa: E402
+
+REMINDER_ID = re.compile(r"#(\d+)")
+
+
+def _insert_due(db_path: str, n: int, chats: int, due: datetime.datetime) -> None:
+    import db
+
+    db.DB_PATH = db_path
+    db.close_all()
+    db.init_db()
+    iso, ts = db.normalize_datetime(due.isoformat())
+    with db.writer() as conn:
+        conn.executemany(
+            "INSERT INTO reminders (chat_id, title, datetime_utc, datetime_ts, timezone, priority, category, repeat) "
+            "VALUES (?, ?, ?, ?, 'UTC', 'normal', NULL, 'none')",
+            ((10_000 + i % chats, f"reminder {i}", iso, ts) for i in range(n)),
+        )
+    db.close_all()
+
+
+def _free_ports(count: int) -> int:
+    """First of `count` consecutive ports that are free right now."""
+    while True:
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            base = probe.getsockname()[1]
+        if base + count > 65535:
+            continue
+        try:
+            for port in range(base, base + count):
+                with socket.socket() as probe:
+                    probe.bind(("127.0.0.1", port))
+            return base
+        except OSError:
+            continue
+
+
+def _sent_by(metrics_port: int) -> int:
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{metrics_port}/metrics", timeout=5) as resp:
+            for line in resp.read().decode().splitlines():
+                if line.startswith("delivery_sent_total "):
+                    return int(float(line.split()[1]))
+    except OSError:
+        pass
+    return 0
+
+
+def _cpu_seconds(pid: int) -> float:
+    """user + system CPU time of a live process (Linux)."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return 0.0
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _wait_until_closed(db_path: str, timeout: float) -> bool:
+    """Wait until no reminder is pending, i.e. every one was sent or found already claimed."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        conn = sqlite3.connect(db_path)
+        try:
+            pending = conn.execute("SELECT COUNT(*) FROM reminders WHERE status = 'pending'").fetchone()[0]
+        finally:
+            conn.close()
+        if not pending:
+            return True
+        time.sleep(0.2)
+    return False
+
+
+def _start_workers(api: FakeBotAPI, db_path: str, count: int, strategy: str, lease: int, metrics_port: int):
+    procs = []
+    for index in range(count):
+        env = dict(
+            os.environ,
+            BOT_TOKEN="123456:bench",
+            WEB_APP_URL="https://example.invalid/app",
+            DB_PATH=db_path,
+            BOT_API_URL=api.base_url,
+            BOT_MODE="none",
+            DISPATCH_MODE="leased",
+            DISPATCH_STRATEGY=strategy,
+            DISPATCH_WORKERS=str(count),
+            DISPATCH_WORKER_INDEX=str(index),
+            DISPATCH_WORKER_ID=f"bench-{index}",
+            DISPATCH_LEASE_SECONDS=str(lease),
+            DISPATCH_STEAL_AFTER=str(lease),
+            SCHEDULER_TICK_SECONDS="0.2",
+            METRICS_PORT=str(metrics_port),
+            DELIVERY_GLOBAL_RATE="100000",
+            DELIVERY_CHAT_RATE="1000",
+            DELIVERY_CHAT_BURST="1000",
+        )
+        procs.append(subprocess.Popen(
+            [sys.executable, "bot.py"], cwd=BOT_DIR, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        ))
+    if not api.wait_for_calls("getMe", count, timeout=60):
+        for p in procs:
+            p.kill()
+        raise RuntimeError("workers did not start")
+    return procs
+
+
+def run(count: int, n: int, chats: int, strategy: str, kill_one: bool, latency: float) -> dict:
+    api = FakeBotAPI(latency=latency).start()
+    lease = 3 if kill_one else 60
+    metrics_port = _free_ports(count)
+    shares, cpu = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "workers.db")
+        _insert_due(db_path, 0, chats, datetime.datetime.now(datetime.timezone.utc))
+        procs = _start_workers(api, db_path, count, strategy, lease, metrics_port)
+        try:
+            due = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=1)
+            _insert_due(db_path, n, chats, due)
+            wait = max(0.0, due.timestamp() - time.time())
+            time.sleep(wait)
+            t0 = time.perf_counter()
+            if kill_one and count > 1:
+                _wait_for_reminders(api, n // 3, timeout=120)
+                procs[0].send_signal(signal.SIGKILL)
+                # a claim lost in flight is closed without a message, so count closed rows
+                ok = _wait_until_closed(db_path, timeout=300)
+            else:
+                ok = _wait_for_reminders(api, n, timeout=300)
+            elapsed = time.perf_counter() - t0
+            time.sleep(1)  # let any duplicate sends land before counting
+            for index, p in enumerate(procs):
+                alive = p.poll() is None
+                shares.append(_sent_by(metrics_port + index) if alive else None)
+                cpu.append(_cpu_seconds(p.pid) if alive else None)
+        finally:
+            for p in procs:
+                if p.poll() is None:
+                    p.send_signal(signal.SIGTERM)
+            for p in procs:
+                try:
+                    p.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    p.kill()
+            api.stop()
+        conn = sqlite3.connect(db_path)
+        unconfirmed = {row[0] for row in conn.execute("SELECT reminder_id FROM deliveries WHERE sent = 0")}
+        conn.close()
+
+    # a digest message carries several reminders of one chat
+    counts = collections.Counter(
+        int(rid)
+        for call in api.sent
+        if call["method"] == "sendMessage"
+        for rid in REMINDER_ID.findall(call.get("text", ""))
+    )
+    # ids are assigned 1..n: the database was empty before the insert
+    missing = set(range(1, n + 1)) - set(counts)
+    return {
+        "workers": count,
+        "completed": ok,
+        "seconds": elapsed,
+        "per_sec": n / elapsed,
+        "missing": len(missing - unconfirmed),
+        "lost_in_flight": len(missing & unconfirmed),
+        "duplicates": sum(c - 1 for c in counts.values() if c > 1),
+        "shares": shares,
+        "cpu": cpu,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reminders", type=int, default=5000)
+    parser.add_argument("--chats", type=int, default=2000)
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--strategy", choices=("steal", "shard"), default="steal")
+    parser.add_argument("--api-latency", type=float, default=0.05, help="seconds the fake API takes per sendMessage")
+    parser.add_argument("--kill-one", action="store_true")
+    args = parser.parse_args()
+
+    failures = 0
+    print(f"{args.reminders:,} reminders due at once, strategy={args.strategy}, "
+          f"API latency {args.api_latency * 1000:.0f} ms, {os.cpu_count()} CPU core(s)"
+          f"{', one worker killed mid-run' if args.kill_one else ''}")
+    baseline = None
+    for count in (int(c) for c in args.workers.split(",")):
+        res = run(count, args.reminders, args.chats, args.strategy, args.kill_one, args.api_latency)
+        exact = res["completed"] and not res["missing"] and not res["duplicates"]
+        failures += not exact
+        baseline = baseline or res["per_sec"]
+        total = sum(s for s in res["shares"] if s) or 1
+        lost = f" lost_in_flight={res['lost_in_flight']}" if args.kill_one else ""
+        print(
+            f"  {count} worker(s): {res['seconds']:6.2f}s  {res['per_sec']:8,.0f} reminders/s "
+            f"(x{res['per_sec'] / baseline:4.2f})  missing={res['missing']} duplicates={res['duplicates']}"
+            f"{lost}  {'OK' if exact else 'FAIL'}"
+        )
+        # a killed worker shows as "-"
+        print(
+            "    sent share " + " ".join("   -" if s is None else f"{s / total:4.0%}" for s in res["shares"])
+            + "   CPU s " + " ".join("-" if c is None else f"{c:.1f}" for c in res["cpu"])
+        )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+Check that bad records in a bulk import are counted, not fatal.
+
+Imports a JSONL and a CSV file through bot/bulk.py into a fresh database.
+Each file holds valid reminders mixed with broken ones: unparseable JSON, a
+JSON array, an empty datetime, an unknown priority, a negative lead, a lead
+too large for a timedelta, a daily repeat whose lead reaches back before
+year 1, a datetime whose UTC time falls after year 9999, and a chat_id that
+does not fit in SQLite's INTEGER.
+Every broken record must be counted as invalid, with its line number and
+error kept, and every valid one must be in the database.
+
+Exits non-zero on the first failure.
+
+    python benchmarks/check_bulk_import.py
+"""
+import csv
+import datetime
+import io
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bot"))
+
+import bulk  # noqa: E402
+import db  # noqa: E402
+
+EVENT = (datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=2)).replace(microsecond=0).isoformat()
+
+# (record, name of the exception it must be reported with); None for a valid record
+CASES = [
+    ({"chat_id": 1, "title": "valid", "datetime": EVENT}, None),
+    ({"chat_id": 1, "title": "empty datetime", "datetime": ""}, "ValueError"),
+    ({"chat_id": 1, "datetime": EVENT, "priority": "someday"}, "ValueError"),
+    ({"chat_id": 1, "datetime": EVENT, "remind_before_minutes": -5}, "ValueError"),
+    ({"chat_id": 1, "datetime": EVENT, "remind_before_minutes": 10**12}, "OverflowError"),
+    ({"chat_id": 1, "datetime": "0001-01-01T00:10:00+00:00", "repeat": "daily", "remind_before_minutes": 20},
+     "OverflowError"),
+    ({"chat_id": 1, "datetime": "9999-12-31T23:59:00-05:00"}, "OverflowError"),
+    ({"chat_id": 10**30, "datetime": EVENT}, "OverflowError"),
+    ({"chat_id": 2, "title": "valid with lead", "datetime": EVENT, "remind_before_minutes": 30}, None),
+]
+# JSONL only: lines that are not a record at all
+JSONL_ONLY = [("{not json", "JSONDecodeError"), ("[1, 2]", "ValueError")]
+
+
+def jsonl_input() -> tuple:
+    lines = [json.dumps(record) for record, _ in CASES] + [line for line, _ in JSONL_ONLY]
+    expected = [error for _, error in CASES] + [error for _, error in JSONL_ONLY]
+    return ("\n".join(lines) + "\n").encode(), expected
+
+
+def csv_input() -> tuple:
+    out = io.StringIO()
+    writer = csv.DictWriter(out, bulk.FIELDS)
+    writer.writeheader()
+    for record, _ in CASES:
+        writer.writerow(record)
+    return out.getvalue().encode(), [error for _, error in CASES]
+
+
+def check(fmt: str, data: bytes, expected: list, tmp: str) -> list:
+    db.DB_PATH = os.path.join(tmp, f"{fmt}.db")
+    db.close_all()
+    db.init_db()
+    try:
+        stats = bulk.import_file(io.BytesIO(data), fmt)
+    except Exception as exc:  # the point of the check: nothing may escape
+        return [f"{fmt}: import raised {type(exc).__name__}: {exc}"]
+    finally:
+        db.close_all()
+
+    failures = []
+    bad = {number: error for number, error in enumerate(expected, 1) if error}
+    reported = {number: message.split(":", 1)[0] for number, message in stats.errors}
+    if stats.invalid != len(bad) or stats.imported != len(expected) - len(bad):
+        failures.append(f"{fmt}: {stats.summary()}")
+    for number, error in bad.items():
+        if number in reported and reported[number] != error:
+            failures.append(f"{fmt}: record {number} reported as {reported[number]}, expected {error}")
+
+    conn = sqlite3.connect(db.DB_PATH)
+    titles = sorted(row[0] for row in conn.execute("SELECT title FROM reminders"))
+    conn.close()
+    if titles != ["valid", "valid with lead"]:
+        failures.append(f"{fmt}: database holds {titles}")
+    if not failures:
+        print(f"  {fmt:<5} {stats.summary()}")
+    return failures
+
+
+def main() -> int:
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt, (data, expected) in (("jsonl", jsonl_input()), ("csv", csv_input())):
+            failures += check(fmt, data, expected, tmp)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    print("bulk import checks " + ("FAILED" if failures else "OK"))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
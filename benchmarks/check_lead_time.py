@@ -0,0 +1,182 @@
+"""
+End-to-end check of reminders sent ahead of their event (remind_before_minutes).
+
+Stores reminders before the bot starts, as a restart would find them: a
+one-shot and a daily repeat whose event is --lead minutes after their
+notification, one without a lead, and one inserted with plain SQL (the
+insert trigger fills in notify_at). Then starts bot/bot.py against
+FakeBotAPI and checks that:
+
+- each reminder goes out at notify_at, not at the event time;
+- the daily repeat moves on to tomorrow's event with notify_at still
+  --lead minutes before it;
+- a Mini App submission stores the lead it was given, and one with a
+  malformed repeat interval or an out-of-range lead gets an error reply;
+- a snooze of the sent one-shot moves notify_at only and reopens it;
+- a snooze of a reminder cancelled meanwhile (deleted in the Mini App)
+  leaves it cancelled and says so.
+
+Exits non-zero on the first failure.
+
+    python benchmarks/check_lead_time.py [--lead 1] [--delay 8]
+"""
+import argparse
+import datetime
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, "..", "bot"))
+
+import db  # noqa: E402
+from run_suite import REMINDER_ID, _Bot  # noqa: E402
+from fake_bot_api import callback_update, web_app_update  # noqa: E402
+
+UTC = datetime.timezone.utc
+CHAT = 40_000
+SLACK = 3.0
+
+
+def _iso(ts: int) -> str:
+    return datetime.datetime.fromtimestamp(ts, UTC).isoformat()
+
+
+def seed(db_path: str, notify_ts: int, lead: int) -> dict:
+    db.DB_PATH = db_path
+    db.close_all()
+    db.init_db()
+    event_ts = notify_ts + 60 * lead
+    ids = {
+        "once": db.add_reminder(CHAT, "Once", _iso(event_ts), "UTC", "normal", None, "none", lead_minutes=lead),
+        "daily": db.add_reminder(CHAT + 1, "Daily", _iso(event_ts), "UTC", "normal", None, "daily", lead_minutes=lead),
+        "no_lead": db.add_reminder(CHAT + 2, "No lead", _iso(notify_ts), "UTC", "normal", None, "none"),
+    }
+    with db.writer() as conn:
+        ids["raw"] = conn.execute(
+            "INSERT INTO reminders (chat_id, title, datetime_utc, datetime_ts, timezone, priority, category, repeat) "
+            "VALUES (?, 'Raw', ?, ?, 'UTC', 'normal', NULL, 'none')",
+            (CHAT + 3, _iso(notify_ts), notify_ts),
+        ).lastrowid
+    db.close_all()
+    return ids
+
+
+def row(db_path: str, reminder_id: int) -> dict:
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        return dict(conn.execute("SELECT * FROM reminders WHERE id = ?", (reminder_id,)).fetchone())
+    finally:
+        conn.close()
+
+
+def sent_at(api, reminder_id: int):
+    for call in list(api.sent):
+        if call["method"] == "sendMessage" and str(reminder_id) in REMINDER_ID.findall(call.get("text", "")):
+            return call["at"]
+    return None
+
+
+def wait_until(predicate, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.2)
+    return False
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lead", type=int, default=1, help="minutes between notification and event")
+    parser.add_argument("--delay", type=int, default=8, help="seconds from start until the notifications are due")
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "lead.db")
+        notify_ts = int(time.time()) + args.delay
+        ids = seed(db_path, notify_ts, args.lead)
+        bot = _Bot(db_path)
+        try:
+            wait_until(lambda: all(sent_at(bot.api, i) for i in ids.values()), args.delay + 30)
+            for name, reminder_id in ids.items():
+                at = sent_at(bot.api, reminder_id)
+                if at is None:
+                    failures.append(f"{name}: not sent")
+                elif abs(at - notify_ts) > SLACK:
+                    failures.append(f"{name}: sent {at - notify_ts:+.1f} s from its notify time")
+                else:
+                    print(f"  {name:8s} sent {at - notify_ts:+.2f} s from notify_at")
+
+            wait_until(lambda: row(db_path, ids["daily"])["datetime_ts"] != notify_ts + 60 * args.lead, 10)
+            daily = row(db_path, ids["daily"])
+            next_event = notify_ts + 60 * args.lead + 86_400
+            if (daily["datetime_ts"], daily["notify_at"]) != (next_event, next_event - 60 * args.lead):
+                failures.append(f"daily: moved to event {daily['datetime_ts']}, notify_at {daily['notify_at']}")
+
+            event = _iso(int(time.time()) + 86_400)
+            bot.api.push_updates([web_app_update(bot.api, CHAT + 4, {
+                "title": "From the app", "datetime": event, "repeat": "once", "timezone": "UTC",
+                "priority": "normal", "category": None, "remind_before_minutes": 15,
+            })])
+            if not bot.api.wait_for_calls("sendMessage", len(ids) + 1, timeout=15):
+                failures.append("Mini App submission was not answered")
+            else:
+                conn = sqlite3.connect(db_path)
+                stored = conn.execute(
+                    "SELECT lead_minutes, notify_at, datetime_ts FROM reminders WHERE chat_id = ?", (CHAT + 4,)
+                ).fetchone()
+                conn.close()
+                if stored is None or stored[0] != 15 or stored[1] != stored[2] - 900:
+                    failures.append(f"Mini App submission stored {stored}")
+
+            bad = {
+                "repeat_interval": ([2], "❌ Unsupported repeat rule."),
+                "remind_before_minutes": (10**12, "❌ Invalid reminder lead time."),
+            }
+            for i, (field, (value, expected)) in enumerate(bad.items()):
+                chat = CHAT + 10 + i
+                bot.api.push_updates([web_app_update(bot.api, chat, {
+                    "title": "Bad", "datetime": event, "repeat": "weekly", "timezone": "UTC", field: value,
+                })])
+                wait_until(lambda: any(str(c.get("chat_id")) == str(chat) for c in list(bot.api.sent)), 10)
+                replies = [c.get("text") for c in list(bot.api.sent) if str(c.get("chat_id")) == str(chat)]
+                if replies != [expected]:
+                    failures.append(f"Mini App {field}={value!r}: replied {replies}")
+
+            once = row(db_path, ids["once"])
+            pressed = time.time()
+            bot.api.push_updates([callback_update(bot.api, CHAT, f"snooze10:{ids['once']}")])
+            wait_until(lambda: row(db_path, ids["once"])["status"] == "pending", 10)
+            snoozed = row(db_path, ids["once"])
+            if snoozed["status"] != "pending" or snoozed["datetime_ts"] != once["datetime_ts"]:
+                failures.append(f"snooze: status {snoozed['status']}, event {snoozed['datetime_ts']}")
+            elif abs(snoozed["notify_at"] - (pressed + 600)) > SLACK:
+                failures.append(f"snooze: notify_at {snoozed['notify_at'] - pressed:+.0f} s from the press")
+
+            conn = sqlite3.connect(db_path)
+            with conn:
+                conn.execute("UPDATE reminders SET status = 'cancelled' WHERE id = ?", (ids["no_lead"],))
+            conn.close()
+            edits = bot.api.calls.get("editMessageText", 0)
+            bot.api.push_updates([callback_update(bot.api, CHAT + 2, f"snooze60:{ids['no_lead']}")])
+            bot.api.wait_for_calls("editMessageText", edits + 1, timeout=10)
+            reply = [c.get("text") for c in list(bot.api.sent) if c["method"] == "editMessageText"][-1:]
+            if row(db_path, ids["no_lead"])["status"] != "cancelled" or reply != ["This reminder was cancelled."]:
+                failures.append(f"snooze of a cancelled reminder: replied {reply}")
+        finally:
+            bot.close()
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    print("lead time checks " + ("FAILED" if failures else "OK"))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+End-to-end check of the delivery ledger: one occurrence, two attempts, one send.
+
+Stores a reminder due --delay seconds after the bot starts and lets
+bot/bot.py send it against FakeBotAPI. It then puts the row back to
+pending with the same notify_at, as a crash between the send and closing
+the occurrence would leave it, and starts a second bot process, whose
+recovery replays the occurrence. Checks that:
+
+- the first run sends it once and marks its ledger row sent;
+- the second run sends nothing, reports delivery_duplicates_suppressed_total
+  of 1 on its metrics endpoint, and closes the occurrence.
+
+Exits non-zero on the first failure.
+
+    python benchmarks/check_ledger.py [--delay 4]
+"""
+import argparse
+import datetime
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, "..", "bot"))
+
+import db  # noqa: E402
+from run_suite import REMINDER_ID, _Bot, _free_port  # noqa: E402
+
+CHAT = 50_000
+
+
+def seed(db_path: str, notify_ts: int) -> int:
+    db.DB_PATH = db_path
+    db.close_all()
+    db.init_db()
+    when = datetime.datetime.fromtimestamp(notify_ts, datetime.timezone.utc).isoformat()
+    reminder_id = db.add_reminder(CHAT, "Twice", when, "UTC", "normal", None, "none")
+    db.close_all()
+    return reminder_id
+
+
+def query(db_path: str, sql: str, *params):
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            return conn.execute(sql, params).fetchone()
+    finally:
+        conn.close()
+
+
+def sends(api, reminder_id: int) -> int:
+    return sum(
+        str(reminder_id) in REMINDER_ID.findall(call.get("text", ""))
+        for call in list(api.sent)
+        if call["method"] == "sendMessage"
+    )
+
+
+def suppressed(metrics_port: int) -> float:
+    with urllib.request.urlopen(f"http://127.0.0.1:{metrics_port}/metrics", timeout=5) as resp:
+        for line in resp.read().decode().splitlines():
+            if line.startswith("delivery_duplicates_suppressed_total "):
+                return float(line.split()[1])
+    return -1
+
+
+def wait_until(predicate, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.2)
+    return False
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--delay", type=int, default=4, help="seconds from start until the reminder is due")
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "ledger.db")
+        notify_ts = int(time.time()) + args.delay
+        reminder_id = seed(db_path, notify_ts)
+
+        def status() -> str:
+            return query(db_path, "SELECT status FROM reminders WHERE id = ?", reminder_id)[0]
+
+        first = _Bot(db_path)
+        try:
+            wait_until(lambda: status() != "pending", args.delay + 30)
+        finally:
+            first.close()
+        ledger = query(
+            db_path, "SELECT sent FROM deliveries WHERE reminder_id = ? AND due_ts = ?", reminder_id, notify_ts
+        )
+        if sends(first.api, reminder_id) != 1 or status() != "done":
+            failures.append(f"first run: sent {sends(first.api, reminder_id)} times, status {status()}")
+        elif ledger != (1,):
+            failures.append(f"first run: ledger row {ledger}")
+        else:
+            print("  first run   sent once, ledger row confirmed")
+
+        # the send happened, closing the occurrence did not
+        query(db_path, "UPDATE reminders SET status = 'pending' WHERE id = ?", reminder_id)
+        metrics_port = _free_port()
+        second = _Bot(db_path, {"METRICS_PORT": str(metrics_port)})
+        try:
+            wait_until(lambda: status() != "pending", 30)
+            count = suppressed(metrics_port)
+        finally:
+            second.close()
+        if sends(second.api, reminder_id) or count != 1 or status() != "done":
+            failures.append(
+                f"second run: sent {sends(second.api, reminder_id)} times, suppressed {count}, status {status()}"
+            )
+        else:
+            print(f"  second run  sent nothing, suppressed {count:.0f}, occurrence closed")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    print("ledger checks " + ("FAILED" if failures else "OK"))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
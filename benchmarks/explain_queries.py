@@ -0,0 +1,66 @@
+"""
+Check that the hot reminder queries are served by an index, not a table scan.
+
+Builds a throwaway database through db.init_db() (so the migrations run),
+fills it with rows, runs ANALYZE and prints EXPLAIN QUERY PLAN for each
+query. Exits non-zero if any of them falls back to a full scan.
+
+    python benchmarks/explain_queries.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bot"))
+
+import db  # noqa: E402
+
+NOW = 1893456000  # 2030-01-01T00:00:00Z
+
+QUERIES = {
+    "iter_overdue_reminders": (db._SQL_OVERDUE, (NOW,)),
+    "get_pending_batch": (db._SQL_PENDING_BATCH, (NOW, db.MAX_ID, NOW + 600, 1000)),
+    "get_reminder_page (after)": (db._SQL_CHAT_PAGE_AFTER, (1001, NOW, 42, None, None, "urgent", "urgent", 11)),
+    "get_reminder_page (before)": (db._SQL_CHAT_PAGE_BEFORE, (1001, NOW + 86400, 42, NOW, "Work", "Work", None, None, 11)),
+    "get_reminder_changes": (db._SQL_CHANGES, (1001, 15000, 1, 501)),
+    "claim_due_reminders": (db._SQL_CLAIM_DUE, ("w0", NOW + 60, NOW, NOW, 200)),
+}
+
+
+def _fill(n: int = 20000) -> None:
+    with db.writer() as conn:
+        conn.executemany(
+            "INSERT INTO reminders (chat_id, title, datetime_utc, datetime_ts, timezone, priority, category, "
+            "repeat, status) VALUES (?, ?, ?, ?, 'UTC', 'normal', NULL, 'none', ?)",
+            (
+                (1000 + i % 500, f"r{i}", *db.normalize_datetime(f"2030-01-{1 + i % 28:02d}T{i % 24:02d}:00:00"),
+                 "pending" if i % 10 == 0 else "done")
+                for i in range(n)
+            ),
+        )
+        conn.execute("ANALYZE")
+
+
+def main() -> int:
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "plan.db")
+        db.init_db()
+        _fill()
+        with db.reader() as conn:
+            print(f"schema version: {db.schema_version(conn)}")
+            for name, (sql, params) in QUERIES.items():
+                plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+                uses_index = any("USING" in step and "INDEX" in step for step in plan)
+                scans = any(step.startswith("SCAN reminders") for step in plan)
+                ok = uses_index and not scans
+                failures += not ok
+                print(f"{'OK  ' if ok else 'FAIL'} {name}")
+                for step in plan:
+                    print(f"       {step}")
+        db.close_all()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
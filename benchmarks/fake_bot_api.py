@@ -0,0 +1,249 @@
+"""
+Minimal in-process stand-in for the Telegram Bot API, for benchmarks.
+
+Serves http://127.0.0.1:<port>/bot<token>/<method> and implements just what
+bot/bot.py calls: getMe, setWebhook, deleteWebhook, getUpdates (long poll),
+sendMessage, sendDocument, editMessageText, answerCallbackQuery and getFile
+(serving bytes put in `files`, keyed by file_id). Point the bot at it
+with BOT_API_URL=http://127.0.0.1:<port>/bot. Every message the bot sends or
+edits is kept in `sent`, stamped with the wall-clock time it arrived ("at").
+With latency set, sendMessage answers only after that many seconds, like a
+round trip to api.telegram.org; the message is kept as soon as it arrives.
+"""
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+
+class _Server(ThreadingHTTPServer):
+    # the default listen backlog of 5 resets connections under benchmark concurrency
+    request_queue_size = 256
+
+
+class FakeBotAPI:
+    def __init__(self, port: int = 0, latency: float = 0.0) -> None:
+        self._server = _Server(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+        # clients killed mid-request (benchmarks do that on purpose) are not errors here
+        self._server.handle_error = lambda request, client_address: None
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._cond = threading.Condition()
+        self._updates: List[dict] = []
+        self._next_update_id = 1
+        self._next_message_id = 1
+        self.calls: Dict[str, int] = {}
+        self.sent: List[dict] = []
+        self.files: Dict[str, bytes] = {}
+        self.latency = latency
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/bot"
+
+    def start(self) -> "FakeBotAPI":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    # ---------- workload side ----------
+
+    def make_update(self, payload: dict) -> dict:
+        """Wrap a payload (e.g. {"message": {...}}) in an update with a fresh update_id."""
+        with self._cond:
+            update = {"update_id": self._next_update_id, **payload}
+            self._next_update_id += 1
+        return update
+
+    def push_updates(self, updates: List[dict]) -> None:
+        """Queue updates for getUpdates (polling mode)."""
+        with self._cond:
+            self._updates.extend(updates)
+            self._cond.notify_all()
+
+    def wait_for_calls(self, method: str, count: int, timeout: float = 60) -> bool:
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.calls.get(method, 0) < count:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return False
+                self._cond.wait(left)
+        return True
+
+    # ---------- Bot API side ----------
+
+    def _call(self, method: str, params: dict):
+        with self._cond:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            self._cond.notify_all()
+
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot",
+                    "can_join_groups": True, "can_read_all_group_messages": False,
+                    "supports_inline_queries": False}
+        if method in ("setWebhook", "deleteWebhook", "answerCallbackQuery", "setMyCommands"):
+            return True
+        if method == "getWebhookInfo":
+            return {"url": "", "has_custom_certificate": False, "pending_update_count": 0}
+        if method == "getFile":
+            file_id = params.get("file_id", "")
+            return {"file_id": file_id, "file_unique_id": file_id, "file_size": len(self.files.get(file_id, b"")),
+                    "file_path": f"documents/{file_id}"}
+        if method == "getUpdates":
+            return self._get_updates(params)
+        if method in ("sendMessage", "editMessageText", "sendDocument"):
+            with self._cond:
+                message_id = self._next_message_id
+                self._next_message_id += 1
+                self.sent.append({"method": method, "at": time.time(), **params})
+            if method == "sendMessage" and self.latency:
+                time.sleep(self.latency)
+            chat_id = int(params.get("chat_id") or 0)
+            return {"message_id": message_id, "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private"}, "text": params.get("text", "")}
+        return True
+
+    def _get_updates(self, params: dict) -> List[dict]:
+        offset = int(params.get("offset") or 0)
+        timeout = float(params.get("timeout") or 0)
+        limit = int(params.get("limit") or 100)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._updates = [u for u in self._updates if u["update_id"] >= offset]
+            while not self._updates:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return []
+                self._cond.wait(min(left, 0.5))
+                self._updates = [u for u in self._updates if u["update_id"] >= offset]
+            return self._updates[:limit]
+
+    def _handler_class(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # headers and body go out as two writes; with Nagle on, a kept-alive
+            # connection stalls ~40 ms on each response waiting for a delayed ACK
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.startswith("/file/"):
+                    data = api.files.get(self.path.rsplit("/", 1)[-1])
+                    if data is None:
+                        self.send_error(404)
+                        return
+                    self.send_response(200)
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                    return
+                self.do_POST()
+
+            def do_POST(self):
+                method = self.path.rsplit("/", 1)[-1]
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                params = _parse_params(self.headers.get("Content-Type", ""), body)
+                result = api._call(method, params)
+                out = json.dumps({"ok": True, "result": result}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+        return Handler
+
+
+def _parse_params(content_type: str, body: bytes) -> dict:
+    if not body:
+        return {}
+    if content_type.startswith("application/json"):
+        return json.loads(body)
+    if content_type.startswith("application/x-www-form-urlencoded"):
+        return {k: v[0] for k, v in urllib.parse.parse_qs(body.decode()).items()}
+    if content_type.startswith("multipart/form-data"):
+        # plain fields as text; an uploaded file is kept as bytes under its field name
+        boundary = content_type.split("boundary=", 1)[1].strip('"').encode()
+        params = {}
+        for part in body.split(b"--" + boundary):
+            head, _, value = part.partition(b"\r\n\r\n")
+            if b'name="' not in head:
+                continue
+            name = head.split(b'name="', 1)[1].split(b'"', 1)[0].decode()
+            value = value[:-2] if value.endswith(b"\r\n") else value
+            params[name] = value if b"filename=" in head else value.decode(errors="replace")
+        return params
+    return {}
+
+
+def message_update(api: FakeBotAPI, chat_id: int, text: str) -> dict:
+    """A private-chat text message update; commands get the bot_command entity Telegram adds."""
+    message = {
+        "message_id": 1,
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private"},
+        "from": {"id": chat_id, "is_bot": False, "first_name": "User"},
+        "text": text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return api.make_update({"message": message})
+
+
+def web_app_update(api: FakeBotAPI, chat_id: int, payload: dict) -> dict:
+    """What Telegram sends when the Mini App calls sendData(JSON.stringify(payload))."""
+    message = {
+        "message_id": 1,
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private"},
+        "from": {"id": chat_id, "is_bot": False, "first_name": "User"},
+        "web_app_data": {"data": json.dumps(payload), "button_text": "Open reminders"},
+    }
+    return api.make_update({"message": message})
+
+
+def callback_update(api: FakeBotAPI, chat_id: int, data: str) -> dict:
+    """An inline-button press on a message the bot sent to chat_id."""
+    query = {
+        "id": str(api._next_update_id),
+        "chat_instance": str(chat_id),
+        "from": {"id": chat_id, "is_bot": False, "first_name": "User"},
+        "message": {
+            "message_id": 1,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": 1, "is_bot": True, "first_name": "Bench"},
+            "text": "Reminder",
+        },
+        "data": data,
+    }
+    return api.make_update({"callback_query": query})
+
+
+def document_update(api: FakeBotAPI, chat_id: int, file_id: str, file_name: str, caption: str) -> dict:
+    """A file sent to the bot; its bytes are whatever is in api.files[file_id]."""
+    message = {
+        "message_id": 1,
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private"},
+        "from": {"id": chat_id, "is_bot": False, "first_name": "User"},
+        "document": {"file_id": file_id, "file_unique_id": file_id, "file_name": file_name,
+                     "file_size": len(api.files.get(file_id, b""))},
+        "caption": caption,
+    }
+    return api.make_update({"message": message})
@@ -0,0 +1,373 @@
+"""
+End-to-end load suite: bot/bot.py against FakeBotAPI, results as JSON.
+
+Each workload starts a fresh bot process (polling mode) on its own
+temporary database, so no network and no real token are needed:
+
+- webapp_burst:     N Mini App submissions from N chats at once; latency is
+                    push -> "Reminder saved" reply.
+- callback_storm:   N snooze/done button presses on stored reminders;
+                    latency is push -> edited message.
+- chat_flood:       N button presses from one chat, pushed together with
+                    /reminders from 50 other chats; latency of the other
+                    chats' replies (one chat's backlog must not hold them up)
+                    and the time to work through the flood.
+- stored_reminders: a database holding --stored pending reminders (1M by
+                    default); startup time and RSS, then /reminders latency.
+- mass_due:         N reminders falling due in the same second across 2000
+                    chats; send rate, lateness (due time -> sendMessage at
+                    the fake API) and messages, which digests make fewer.
+
+Every workload reports startup_seconds (process start -> first getUpdates)
+and the bot's peak RSS. Save the JSON per commit and compare two runs:
+
+    python benchmarks/run_suite.py [--quick] [--only webapp_burst,mass_due] [--output HEAD.json]
+    python benchmarks/run_suite.py --compare base.json HEAD.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import re
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BOT_DIR = os.path.join(HERE, "..", "bot")
+sys.path.insert(0, HERE)
+sys.path.insert(0, BOT_DIR)
+
+from bench_ingest import _free_port, start_bot  # noqa: E402
+from fake_bot_api import FakeBotAPI, callback_update, message_update, web_app_update  # noqa: E402
+
+SIZES = {
+    "full": {"webapp_burst": 2000, "callback_storm": 2000, "chat_flood": 2000, "stored_reminders": 1_000_000,
+             "mass_due": 5000},
+    "quick": {"webapp_burst": 200, "callback_storm": 200, "chat_flood": 500, "stored_reminders": 20_000,
+              "mass_due": 500},
+}
+REMINDER_ID = re.compile(r"#(\d+)")
+YEAR_SECONDS = 365 * 24 * 3600
+# replies bypass the delivery queue, but mass_due would otherwise measure Telegram's limits
+FAST_DELIVERY = {
+    "DELIVERY_GLOBAL_RATE": "100000",
+    "DELIVERY_CHAT_RATE": "1000",
+    "DELIVERY_CHAT_BURST": "1000",
+    "DELIVERY_WORKERS": "32",
+}
+
+
+# ---------- helpers ----------
+
+def _percentiles(values) -> dict:
+    if not values:
+        return {"p50_ms": None, "p99_ms": None, "max_ms": None}
+    values = sorted(values)
+    p99 = values[min(len(values) - 1, int(len(values) * 0.99))]
+    return {
+        "p50_ms": round(statistics.median(values) * 1000, 2),
+        "p99_ms": round(p99 * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2),
+    }
+
+
+def _rss_mb(pid: int) -> dict:
+    """Current and peak resident set size of pid (Linux only)."""
+    out = {"rss_mb": None, "peak_rss_mb": None}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    out["rss_mb"] = round(int(line.split()[1]) / 1024, 1)
+                elif line.startswith("VmHWM:"):
+                    out["peak_rss_mb"] = round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return out
+
+
+def _seed(db_path: str, rows) -> None:
+    """Create the schema and bulk-insert (chat_id, title, datetime_ts) pending reminders."""
+    import db
+
+    db.DB_PATH = db_path
+    db.close_all()
+    db.init_db()
+    with db.writer() as conn:
+        conn.executemany(
+            "INSERT INTO reminders (chat_id, title, datetime_utc, datetime_ts, timezone, priority, category, repeat) "
+            "VALUES (?, ?, ?, ?, 'UTC', 'normal', NULL, 'none')",
+            (
+                (chat_id, title, datetime.datetime.fromtimestamp(ts, datetime.timezone.utc).isoformat(), ts)
+                for chat_id, title, ts in rows
+            ),
+        )
+    db.close_all()
+
+
+class _Bot:
+    """A bot/bot.py process on a fresh FakeBotAPI, with startup time and RSS."""
+
+    def __init__(self, db_path: str, extra_env=None) -> None:
+        self.api = FakeBotAPI().start()
+        t0 = time.perf_counter()
+        self.proc = start_bot(self.api, "polling", db_path, 64, _free_port(), extra_env)
+        self.startup_seconds = time.perf_counter() - t0
+
+    def stats(self) -> dict:
+        return {"startup_seconds": round(self.startup_seconds, 3), **_rss_mb(self.proc.pid)}
+
+    def close(self) -> None:
+        self.proc.terminate()
+        try:
+            self.proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+        self.api.stop()
+
+
+def _replies(api: FakeBotAPI, method: str, pushed: dict) -> list:
+    """Latency per chat: first `method` call to a chat after its update was pushed."""
+    latencies = {}
+    for call in list(api.sent):
+        if call["method"] != method:
+            continue
+        chat_id = int(call.get("chat_id") or 0)
+        if chat_id in pushed and chat_id not in latencies and call["at"] >= pushed[chat_id]:
+            latencies[chat_id] = call["at"] - pushed[chat_id]
+    return list(latencies.values())
+
+
+def _wait_for_reminders(api: FakeBotAPI, n: int, timeout: float) -> bool:
+    """Wait until n reminder ids have gone out, however they were grouped into messages."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        sent = sum(len(REMINDER_ID.findall(c.get("text", ""))) for c in list(api.sent) if c["method"] == "sendMessage")
+        if sent >= n:
+            return True
+        time.sleep(0.2)
+    return False
+
+
+def _request_reply(bot: _Bot, updates: list, chats: list, method: str, n: int) -> dict:
+    """Push updates at once and time each chat's reply."""
+    baseline = bot.api.calls.get(method, 0)
+    pushed_at = time.time()
+    t0 = time.perf_counter()
+    bot.api.push_updates(updates)
+    ok = bot.api.wait_for_calls(method, baseline + n, timeout=300)
+    elapsed = time.perf_counter() - t0
+    latencies = _replies(bot.api, method, {chat: pushed_at for chat in chats})
+    return {
+        "completed": ok,
+        "seconds": round(elapsed, 3),
+        "per_sec": round(n / elapsed, 1),
+        **_percentiles(latencies),
+    }
+
+
+# ---------- workloads ----------
+
+def webapp_burst(tmp: str, n: int) -> dict:
+    bot = _Bot(os.path.join(tmp, "webapp.db"))
+    try:
+        due = (datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=1)).isoformat()
+        chats = [20_000 + i for i in range(n)]
+        updates = [
+            web_app_update(bot.api, chat, {
+                "title": f"Burst {i}", "datetime": due, "repeat": "once", "timezone": "Europe/Berlin",
+                "priority": "normal", "category": "work", "remind_before_minutes": 0,
+            })
+            for i, chat in enumerate(chats)
+        ]
+        return {"updates": n, **_request_reply(bot, updates, chats, "sendMessage", n), **bot.stats()}
+    finally:
+        bot.close()
+
+
+def callback_storm(tmp: str, n: int) -> dict:
+    db_path = os.path.join(tmp, "callbacks.db")
+    tomorrow = int(time.time()) + 86_400
+    chats = [30_000 + i for i in range(n)]
+    _seed(db_path, ((chat, f"stored {chat}", tomorrow) for chat in chats))
+    bot = _Bot(db_path)
+    try:
+        actions = ("snooze10", "snooze60", "cancel")
+        # reminder ids follow insertion order, one per chat
+        updates = [callback_update(bot.api, chat, f"{actions[i % 3]}:{i + 1}") for i, chat in enumerate(chats)]
+        return {"updates": n, **_request_reply(bot, updates, chats, "editMessageText", n), **bot.stats()}
+    finally:
+        bot.close()
+
+
+def chat_flood(tmp: str, n: int, others: int = 50) -> dict:
+    db_path = os.path.join(tmp, "flood.db")
+    tomorrow = int(time.time()) + 86_400
+    flood_chat = 60_000
+    chats = [flood_chat + 1 + i for i in range(others)]
+    _seed(db_path, ((flood_chat, f"flooded {i}", tomorrow) for i in range(n)))
+    bot = _Bot(db_path)
+    try:
+        # reminder ids follow insertion order; presses alternate between the two snoozes
+        flood = [callback_update(bot.api, flood_chat, f"snooze{(10, 60)[i % 2]}:{i + 1}") for i in range(n)]
+        asks = [message_update(bot.api, chat, "/reminders") for chat in chats]
+        edits = bot.api.calls.get("editMessageText", 0)
+        pushed_at = time.time()
+        t0 = time.perf_counter()
+        bot.api.push_updates(flood + asks)
+        ok = bot.api.wait_for_calls("sendMessage", others, timeout=300)
+        latencies = _replies(bot.api, "sendMessage", {chat: pushed_at for chat in chats})
+        ok = bot.api.wait_for_calls("editMessageText", edits + n, timeout=300) and ok
+        return {
+            "presses": n,
+            "other_chats": others,
+            "completed": ok,
+            "flood_seconds": round(time.perf_counter() - t0, 3),
+            **_percentiles(latencies),
+            **bot.stats(),
+        }
+    finally:
+        bot.close()
+
+
+def stored_reminders(tmp: str, n: int, queries: int = 500, chats: int = 5000) -> dict:
+    db_path = os.path.join(tmp, "stored.db")
+    t0 = time.perf_counter()
+    start = int(time.time()) + 3600
+    step = YEAR_SECONDS / n
+    _seed(db_path, ((i % chats, f"stored {i}", start + int(i * step)) for i in range(n)))
+    build_seconds = time.perf_counter() - t0
+    bot = _Bot(db_path)
+    try:
+        idle = bot.stats()
+        asked = list(range(min(queries, chats)))
+        updates = [message_update(bot.api, chat, "/reminders") for chat in asked]
+        res = _request_reply(bot, updates, asked, "sendMessage", len(asked))
+        return {
+            "stored": n,
+            "build_seconds": round(build_seconds, 2),
+            "db_mb": round(os.path.getsize(db_path) / 2**20, 1),
+            "idle_rss_mb": idle["rss_mb"],
+            "queries": len(asked),
+            **res,
+            **bot.stats(),
+        }
+    finally:
+        bot.close()
+
+
+def mass_due(tmp: str, n: int, chats: int = 2000, lead: float = 15.0) -> dict:
+    db_path = os.path.join(tmp, "due.db")
+    # due a little after the bot will have started, so the dispatcher loads them in its window
+    due_ts = int(time.time() + lead)
+    _seed(db_path, ((40_000 + i % chats, f"due {i}", due_ts) for i in range(n)))
+    bot = _Bot(db_path, FAST_DELIVERY)
+    try:
+        ok = _wait_for_reminders(bot.api, n, timeout=lead + 300)
+        # a digest message carries every reminder of its chat that fell due with it
+        messages = [c for c in list(bot.api.sent) if c["method"] == "sendMessage" and REMINDER_ID.search(c.get("text", ""))]
+        sends = [c["at"] for c in messages for _ in REMINDER_ID.findall(c["text"])]
+        last = max(sends) if sends else due_ts
+        return {
+            "reminders": n,
+            "completed": ok,
+            "sent": len(sends),
+            "messages": len(messages),
+            "seconds": round(last - due_ts, 3),
+            "per_sec": round(len(sends) / max(last - due_ts, 1e-9), 1),
+            **{k.replace("_ms", "_lateness_ms"): v for k, v in _percentiles([max(0.0, t - due_ts) for t in sends]).items()},
+            **bot.stats(),
+        }
+    finally:
+        bot.close()
+
+
+WORKLOADS = {
+    "webapp_burst": webapp_burst,
+    "callback_storm": callback_storm,
+    "chat_flood": chat_flood,
+    "stored_reminders": stored_reminders,
+    "mass_due": mass_due,
+}
+
+
+# ---------- reporting ----------
+
+def _meta() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(base_path: str, head_path: str) -> None:
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(head_path) as f:
+        head = json.load(f)
+    print(f"{base['meta'].get('commit')} -> {head['meta'].get('commit')}")
+    for name, new in head["workloads"].items():
+        old = base["workloads"].get(name, {})
+        print(name)
+        for key, value in new.items():
+            before = old.get(key)
+            if not isinstance(value, (int, float)) or isinstance(value, bool) or not isinstance(before, (int, float)):
+                continue
+            change = f"{(value - before) / before * 100:+7.1f}%" if before else "      -"
+            print(f"  {key:<22} {before:>12} -> {value:>12}  {change}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--quick", action="store_true", help="small sizes, for a smoke run")
+    parser.add_argument("--only", help="comma-separated workloads: " + ",".join(WORKLOADS))
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "HEAD"), help="diff two saved runs")
+    for name in WORKLOADS:
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, dest=name, help=f"size for {name}")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    sizes = dict(SIZES["quick" if args.quick else "full"])
+    sizes.update({name: getattr(args, name) for name in WORKLOADS if getattr(args, name)})
+    selected = args.only.split(",") if args.only else list(WORKLOADS)
+    unknown = set(selected) - set(WORKLOADS)
+    if unknown:
+        parser.error(f"unknown workload(s): {', '.join(sorted(unknown))}")
+
+    results = {"meta": _meta(), "workloads": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in selected:
+            print(f"running {name} ({sizes[name]:,})...", file=sys.stderr)
+            results["workloads"][name] = WORKLOADS[name](tmp, sizes[name])
+
+    out = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(out + "\n")
+    else:
+        print(out)
+    failed = [name for name, res in results["workloads"].items() if res.get("completed") is False]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
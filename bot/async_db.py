@@ -0,0 +1,299 @@
+"""
+Async facade over db.py for use inside handlers and jobs.
+
+sqlite3 calls block, so they run on dedicated executor threads instead of
+the event loop: one writer thread (writes are serialized by SQLite anyway)
+and a small pool of reader threads matching db's reader pool.
+
+The one-row writes of dispatch and the reminder buttons (status, snooze,
+finish, next occurrence, delivery ledger) are group-committed, see
+groupcommit.py; reading a reminder waits for its queued writes.
+get_reminder reads through a cache that those writes keep current, see
+reminder_cache.py.
+"""
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import db
+from groupcommit import GroupCommitter
+from reminder_cache import ReminderCache
+
+_write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+_read_executor = ThreadPoolExecutor(
+    max_workers=db.DB_READER_POOL_SIZE, thread_name_prefix="db-reader"
+)
+
+
+async def _run(executor: ThreadPoolExecutor, fn: Callable, *args, **kwargs) -> Any:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+
+
+reminder_cache = ReminderCache()
+writes = GroupCommitter(
+    functools.partial(_run, _write_executor, db.apply_writes), on_failure=reminder_cache.invalidate
+)
+
+
+async def add_reminder(
+    chat_id: int,
+    title: str,
+    datetime_utc_iso: str,
+    timezone: Optional[str],
+    priority: str,
+    category: Optional[str],
+    repeat: str,
+    anchor_local: Optional[str] = None,
+    note: Optional[str] = None,
+    lead_minutes: int = 0,
+) -> int:
+    return await _run(
+        _write_executor,
+        db.add_reminder,
+        chat_id=chat_id,
+        title=title,
+        datetime_utc_iso=datetime_utc_iso,
+        timezone=timezone,
+        priority=priority,
+        category=category,
+        repeat=repeat,
+        anchor_local=anchor_local,
+        note=note,
+        lead_minutes=lead_minutes,
+    )
+
+
+async def edit_reminder(
+    reminder_id: int,
+    chat_id: int,
+    title: str,
+    datetime_utc_iso: str,
+    timezone: Optional[str],
+    priority: str,
+    category: Optional[str],
+    repeat: str,
+    anchor_local: Optional[str] = None,
+    note: Optional[str] = None,
+    lead_minutes: int = 0,
+    expected_version: Optional[int] = None,
+) -> Optional[Dict[str, Any]]:
+    """See db.edit_reminder; applied after the reminder's queued writes."""
+    await writes.settle(reminder_id)
+    try:
+        return await _run(
+            _write_executor,
+            db.edit_reminder,
+            reminder_id,
+            chat_id,
+            title=title,
+            datetime_utc_iso=datetime_utc_iso,
+            timezone=timezone,
+            priority=priority,
+            category=category,
+            repeat=repeat,
+            anchor_local=anchor_local,
+            note=note,
+            lead_minutes=lead_minutes,
+            expected_version=expected_version,
+        )
+    finally:
+        reminder_cache.invalidate(reminder_id)
+
+
+async def cancel_reminder(
+    reminder_id: int, chat_id: int, expected_version: Optional[int] = None
+) -> Optional[Dict[str, Any]]:
+    """See db.cancel_reminder; applied after the reminder's queued writes."""
+    await writes.settle(reminder_id)
+    try:
+        return await _run(_write_executor, db.cancel_reminder, reminder_id, chat_id, expected_version)
+    finally:
+        reminder_cache.invalidate(reminder_id)
+
+
+async def get_reminder(reminder_id: int) -> Optional[Dict[str, Any]]:
+    """The reminder's columns the bot uses (see reminder_cache.FIELDS), or None."""
+    reminder = reminder_cache.get(reminder_id)
+    if reminder is not None:
+        return reminder
+    await writes.settle(reminder_id)
+    token = reminder_cache.begin_load(reminder_id)
+    row = None
+    try:
+        row = await _run(_read_executor, db.get_reminder, reminder_id)
+    finally:
+        reminder = reminder_cache.loaded(reminder_id, row, token)
+    return reminder
+
+
+async def update_reminder_status(reminder_id: int, status: str) -> None:
+    reminder_cache.update(reminder_id, status=status)
+    await writes.write(("status", (status, reminder_id)), reminder_id, wait=False)
+
+
+async def snooze_reminder(reminder_id: int, notify_at: int) -> bool:
+    """See db.snooze_reminder; False if the reminder was cancelled."""
+    expected = reminder_cache.update(reminder_id, unless_status="cancelled", notify_at=notify_at, status="pending")
+    snoozed = await writes.write(("snooze", (notify_at, reminder_id)), reminder_id) == 1
+    if expected is not None and expected != snoozed:
+        # the cached row was out of date (cancelled by another process)
+        reminder_cache.invalidate(reminder_id)
+    return snoozed
+
+
+async def get_reminder_page(
+    chat_id: int,
+    after: Optional[Tuple[int, int]] = None,
+    before: Optional[Tuple[int, int]] = None,
+    category: Optional[str] = None,
+    priority: Optional[str] = None,
+    limit: int = 10,
+) -> List[Dict[str, Any]]:
+    if writes.pending:
+        await writes.settle()
+    return await _run(_read_executor, db.get_reminder_page, chat_id, after, before, category, priority, limit)
+
+
+async def get_pending_batch(
+    after_ts: float, after_id: int, end_ts: float, limit: int = db.DB_BATCH_SIZE
+) -> List[db.PendingRow]:
+    return await _run(_read_executor, db.get_pending_batch, after_ts, after_id, end_ts, limit)
+
+
+async def iter_pending_batches(
+    start_ts: float, end_ts: float, batch_size: int = db.DB_BATCH_SIZE
+) -> AsyncIterator[List[db.PendingRow]]:
+    """
+    Stream pending reminders due in (start, end] in notify_at order, a batch
+    at a time. Reads keyset pages, so memory is one batch no matter how many
+    rows match and no read transaction is held open between batches.
+    """
+    after_ts, after_id = start_ts, db.MAX_ID
+    while True:
+        batch = await get_pending_batch(after_ts, after_id, end_ts, batch_size)
+        if batch:
+            yield batch
+        if len(batch) < batch_size:
+            return
+        after_ts, after_id = batch[-1].notify_at, batch[-1].id
+
+
+async def update_reminder_statuses(updates: List[Tuple[str, int]]) -> None:
+    try:
+        await _run(_write_executor, db.update_reminder_statuses, updates)
+    finally:
+        reminder_cache.invalidate_many(reminder_id for _, reminder_id in updates)
+
+
+async def advance_recurrences(updates: List[Tuple[str, int, str, int, int]]) -> None:
+    """See db.advance_recurrences."""
+    pending = []
+    for iso, occurrence, anchor_local, reminder_id, due_ts in updates:
+        datetime_utc, datetime_ts = db.normalize_datetime(iso)
+        reminder_cache.update(
+            reminder_id,
+            due_ts,
+            datetime_utc=datetime_utc,
+            datetime_ts=datetime_ts,
+            occurrence=occurrence,
+            anchor_local=anchor_local,
+        )
+        pending.append((("advance", (datetime_utc, datetime_ts, occurrence, anchor_local, reminder_id, due_ts)), reminder_id))
+    await writes.write_many(pending, wait=False)
+
+
+async def finish_reminder(reminder_id: int, due_ts: int, status: str = "done") -> bool:
+    expected = reminder_cache.update(reminder_id, due_ts, status=status)
+    finished = await writes.write(("finish", (status, reminder_id, due_ts)), reminder_id) == 1
+    if expected is not None and expected != finished:
+        # the cached row was out of date (changed by another process)
+        reminder_cache.invalidate(reminder_id)
+    return finished
+
+
+async def claim_delivery(reminder_id: int, due_ts: int) -> bool:
+    """Take the ledger row of an occurrence before sending it; False if another attempt has it."""
+    return await writes.write(("claim", (reminder_id, due_ts, int(time.time()))), reminder_id) == 1
+
+
+async def confirm_delivery(reminder_id: int, due_ts: int) -> None:
+    # nothing waits on this: the claim alone already stops a second send
+    await writes.write(("confirm", (reminder_id, due_ts)), reminder_id, wait=False)
+
+
+async def delivery_confirmed(reminder_id: int, due_ts: int) -> bool:
+    await writes.settle(reminder_id)
+    return await _run(_read_executor, db.delivery_confirmed, reminder_id, due_ts)
+
+
+async def release_delivery(reminder_id: int, due_ts: int) -> None:
+    await writes.write(("release", (reminder_id, due_ts)), reminder_id)
+
+
+async def claim_due_reminders(
+    worker_id: str,
+    now_ts: float,
+    lease_until: float,
+    limit: int,
+    shard: Optional[Tuple[int, int]] = None,
+    steal_before: float = 0,
+) -> List[db.OverdueRow]:
+    return await _run(
+        _write_executor, db.claim_due_reminders, worker_id, now_ts, lease_until, limit, shard, steal_before
+    )
+
+
+async def renew_leases(worker_id: str, reminder_ids: List[int], lease_until: float) -> None:
+    await _run(_write_executor, db.renew_leases, worker_id, reminder_ids, lease_until)
+
+
+async def get_overdue_reminders(now_ts: float) -> List[db.OverdueRow]:
+    return await _run(_read_executor, lambda: list(db.iter_overdue_reminders(now_ts)))
+
+
+async def get_closed_batch(after_id: int, before_ts: int, limit: int = db.DB_BATCH_SIZE) -> List[Dict[str, Any]]:
+    return await _run(_read_executor, db.get_closed_batch, after_id, before_ts, limit)
+
+
+async def purge_reminders(reminder_ids: List[int]) -> int:
+    try:
+        return await _run(_write_executor, db.purge_reminders, reminder_ids)
+    finally:
+        reminder_cache.invalidate_many(reminder_ids)
+
+
+async def prune_deliveries(
+    after: Tuple[int, int], before_ts: int, limit: int = db.DB_BATCH_SIZE
+) -> Tuple[Optional[Tuple[int, int]], int]:
+    return await _run(_write_executor, db.prune_deliveries, after, before_ts, limit)
+
+
+async def database_size() -> Tuple[int, int]:
+    return await _run(_read_executor, db.database_size)
+
+
+async def enable_incremental_vacuum() -> bool:
+    return await _run(_write_executor, db.enable_incremental_vacuum)
+
+
+async def incremental_vacuum(pages: int) -> int:
+    return await _run(_write_executor, db.incremental_vacuum, pages)
+
+
+async def analyze() -> None:
+    await _run(_write_executor, db.analyze)
+
+
+async def flush() -> None:
+    """Commit every queued write (before shutdown())."""
+    await writes.flush()
+
+
+def shutdown() -> None:
+    """Wait for queued DB work to finish, then close the pooled connections."""
+    _write_executor.shutdown(wait=True)
+    _read_executor.shutdown(wait=True)
+    db.close_all()
@@ -1,8 +1,12 @@
+import asyncio
+import csv
 import os
 import json
 import datetime
-from zoneinfo import ZoneInfo
 import logging
+import tempfile
+import time
+from typing import Optional
 
 from dotenv import load_dotenv
 from telegram import (
@@ -21,29 +25,51 @@ from telegram.ext import (
     ContextTypes,
     filters,
 )
+from telegram.error import BadRequest
 
-from db import (
-    init_db,
+# Load .env before importing local modules: they read their settings at import time.
+load_dotenv()
+
+from db import init_db, notify_time
+from async_db import (
     add_reminder,
     get_reminder,
     update_reminder_status,
-    update_reminder_datetime,
-    get_upcoming_reminders_for_chat,
-    get_all_pending_reminders,
+    snooze_reminder,
+    advance_recurrences,
+    finish_reminder,
+    flush as flush_db,
+    reminder_cache,
+    shutdown as shutdown_db,
+    writes as db_writes,
 )
+from scheduler import SCHEDULER_WINDOW_SECONDS, ReminderDispatcher
+from delivery import LANES, DeliveryQueue
+from digest import DigestCoalescer
+from recovery import recover_missed
+from leased import DISPATCH_MODE, DISPATCH_WORKER_INDEX, LeasedDispatcher
+from ledger import DeliveryLedger
+from recurrence import Advance, advance, normalize_repeat
+from retention import Retention
+import bulk
+import ingress
+import metrics
+import sync_api
+from logconfig import LOG_DEBUG_UPDATES, lazy, setup_logging
+from pages import CALLBACK_PATTERN as PAGE_CALLBACK_PATTERN, Page, load_page, page_cache, page_keyboard, parse_callback
+from timeutils import PRIORITY_LABELS, format_for_user, parse_client_datetime_to_utc, zone_or_utc
 
 # ---------- Logging setup ----------
 
-logging.basicConfig(
-    format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
-    level=logging.INFO,
-)
+setup_logging()
 logger = logging.getLogger(__name__)
+# per-update categories, tuned with LOG_LEVELS / LOG_SAMPLE (see logconfig.py)
+updates_log = logging.getLogger("updates")
+webapp_log = logging.getLogger("webapp")
+dispatch_log = logging.getLogger("dispatch")
 
 # ---------- Env ----------
 
-load_dotenv()
-
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 WEB_APP_URL = os.getenv("WEB_APP_URL")
 
@@ -53,84 +79,27 @@ if not WEB_APP_URL:
     raise RuntimeError("WEB_APP_URL is not set. Add it to your .env file.")
 
 
-# ---------- Time helpers ----------
+# ---------- Metrics ----------
 
-def parse_client_datetime_to_utc(datetime_str: str, timezone_name: str | None) -> datetime.datetime:
-    """
-    OLD FORMAT SUPPORT:
-    datetime_str: 'YYYY-MM-DDTHH:MM' in user's local timezone
-    timezone_name: IANA tz string like 'America/Toronto'
-    Returns an aware UTC datetime.
-    """
-    naive_local = datetime.datetime.strptime(datetime_str, "%Y-%m-%dT%H:%M")
-    if timezone_name:
-        try:
-            tz = ZoneInfo(timezone_name)
-            aware_local = naive_local.replace(tzinfo=tz)
-        except Exception:
-            logger.warning("Failed to apply timezone %s, falling back to UTC", timezone_name)
-            aware_local = naive_local.replace(tzinfo=datetime.timezone.utc)
-    else:
-        aware_local = naive_local.replace(tzinfo=datetime.timezone.utc)
-
-    utc_dt = aware_local.astimezone(datetime.timezone.utc)
-    logger.debug("Parsed old-format datetime %s (%s) -> %s UTC", datetime_str, timezone_name, utc_dt)
-    return utc_dt
-
-
-def format_for_user(reminder: dict) -> str:
-    """Format reminder time/text back into user's timezone (if we have it)."""
-    utc_dt = datetime.datetime.fromisoformat(reminder["datetime_utc"])
-    utc_dt = utc_dt.replace(tzinfo=datetime.timezone.utc)
-
-    tz_name = reminder.get("timezone")
-    if tz_name:
-        try:
-            tz = ZoneInfo(tz_name)
-            local_dt = utc_dt.astimezone(tz)
-        except Exception:
-            logger.warning("Failed to convert to user timezone %s, using UTC", tz_name)
-            local_dt = utc_dt
-    else:
-        local_dt = utc_dt
-
-    time_str = local_dt.strftime("%Y-%m-%d %H:%M")
-
-    repeat = reminder.get("repeat", "none")
-    repeat_label = {
-        "none": "one-time",
-        "daily": "every day",
-        "weekly": "every week",
-    }.get(repeat, repeat)
-
-    priority = reminder.get("priority", "normal")
-    priority_label = {
-        "low": "low",
-        "normal": "normal",
-        "urgent": "urgent",
-    }.get(priority, priority)
-
-    cat = reminder.get("category") or "No category"
-
-    return (
-        f"*{reminder['title']}*\n"
-        f"🕒 {time_str}\n"
-        f"🔁 {repeat_label}\n"
-        f"⚙️ Priority: {priority_label}\n"
-        f"🏷 Category: {cat}"
-    )
+HANDLER_SECONDS = metrics.histogram("handler_seconds", "Time spent in update handlers and reminder sends.", label="handler")
+DISPATCH_LATENESS = metrics.histogram(
+    "reminder_dispatch_lateness_seconds",
+    "How long after its due time a reminder was sent (catch-up sends excluded).",
+    buckets=metrics.LATENESS_BUCKETS,
+)
 
 
 # ---------- Command handlers ----------
 
+@metrics.timed(HANDLER_SECONDS)
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Send start message with WebApp button."""
     chat_id = update.effective_chat.id if update.effective_chat else None
-    logger.info("/start from chat_id=%s", chat_id)
+    updates_log.info("/start from chat_id=%s", chat_id)
 
     button = KeyboardButton(
         text="Open NAiss REM",
-        web_app=WebAppInfo(url=WEB_APP_URL),
+        web_app=WebAppInfo(url=sync_api.web_app_url(WEB_APP_URL)),
     )
     keyboard = ReplyKeyboardMarkup([[button]], resize_keyboard=True)
 
@@ -141,33 +110,136 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     )
 
 
-async def reminders_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """List upcoming reminders for this chat."""
-    chat_id = update.effective_chat.id
-    logger.info("/reminders requested for chat_id=%s", chat_id)
-
-    reminders = get_upcoming_reminders_for_chat(chat_id, limit=10)
-
-    if not reminders:
-        await update.message.reply_text("You have no upcoming reminders.")
-        return
+def render_page(page: Page, category: Optional[str], priority: Optional[str]) -> str:
+    if not page.rows:
+        return "You have no upcoming reminders" + (" matching this filter." if category or priority else ".")
 
     lines = []
-    for r in reminders:
+    if category or priority:
+        shown = [f"category {category}" if category else "", f"priority {priority}" if priority else ""]
+        lines.append("Filter: " + ", ".join(filter(None, shown)))
+    for r in page.rows:
         status = r["status"]
         prefix = "⏰" if status == "pending" else "✅"
         lines.append(f"{prefix} #{r['id']}:\n{format_for_user(r)}")
+    return "\n\n".join(lines)
+
+
+@metrics.timed(HANDLER_SECONDS)
+async def reminders_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    List upcoming reminders for this chat, a page at a time.
+    /reminders [low|normal|urgent] [category] filters the list.
+    """
+    chat_id = update.effective_chat.id
+    updates_log.info("/reminders requested for chat_id=%s", chat_id)
 
-    await update.message.reply_text("\n\n".join(lines), parse_mode="Markdown")
+    args = list(context.args or [])
+    priority = next((a.lower() for a in args if a.lower() in PRIORITY_LABELS), None)
+    category = " ".join(a for a in args if a.lower() != priority) or None
+    context.chat_data["reminders_filter"] = (category, priority)
 
+    page = await load_page(chat_id, category=category, priority=priority)
+    await update.message.reply_text(
+        render_page(page, category, priority),
+        parse_mode="Markdown",
+        reply_markup=page_keyboard(page),
+    )
 
-# ---------- DEBUG handler (logs ALL updates) ----------
+
+@metrics.timed(HANDLER_SECONDS)
+async def reminders_page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Prev/Next buttons under a /reminders list."""
+    query = update.callback_query
+    await query.answer()
+
+    direction, cursor = parse_callback(query.data)
+    category, priority = context.chat_data.get("reminders_filter", (None, None))
+    page = await load_page(update.effective_chat.id, direction, cursor, category, priority)
+    try:
+        await query.edit_message_text(
+            render_page(page, category, priority),
+            parse_mode="Markdown",
+            reply_markup=page_keyboard(page),
+        )
+    except BadRequest as exc:
+        # a double tap on the first page re-renders the same text
+        if "not modified" not in str(exc):
+            raise
+
+
+@metrics.timed(HANDLER_SECONDS)
+async def export_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """/export [csv|jsonl] [all]: send this chat's reminders as a file."""
+    chat_id = update.effective_chat.id
+    args = [a.lower() for a in (context.args or [])]
+    fmt = "jsonl" if "jsonl" in args else "csv"
+    updates_log.info("/export requested for chat_id=%s format=%s", chat_id, fmt)
+
+    # the export streams from the database into a temp file, off the event loop
+    stream, count = await asyncio.to_thread(bulk.export_to_tempfile, fmt, chat_id, "all" in args)
+    with stream:
+        if not count:
+            await update.message.reply_text("You have no reminders to export.")
+            return
+        await update.message.reply_document(
+            document=stream,
+            filename=f"reminders.{fmt}",
+            caption=f"{count} reminders. Send this file back with the caption /import to restore it.",
+        )
+
+
+@metrics.timed(HANDLER_SECONDS)
+async def import_document(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """A .csv/.jsonl file sent with the caption /import: add its reminders to this chat."""
+    chat_id = update.effective_chat.id
+    document = update.message.document
+    try:
+        fmt = bulk.detect_format(document.file_name or "")
+    except ValueError:
+        await update.message.reply_text("❌ Send a .csv or .jsonl file (like the ones /export makes).")
+        return
+    updates_log.info("/import of %s (%s bytes) for chat_id=%s", document.file_name, document.file_size, chat_id)
+
+    tg_file = await document.get_file()
+    with tempfile.TemporaryFile() as stream:
+        await tg_file.download_to_memory(stream)
+        stream.seek(0)
+        # rows due before the dispatcher's next refills are handed to it directly
+        hold_until = time.time() + 2 * SCHEDULER_WINDOW_SECONDS
+        stats = bulk.ImportStats()
+        try:
+            await asyncio.to_thread(bulk.import_file, stream, fmt, chat_id, hold_until, stats)
+            failure = None
+        except (UnicodeDecodeError, csv.Error) as exc:
+            failure = exc
+
+    held = dispatcher.schedule_many(stats.due_soon)
+    page_cache.invalidate(chat_id)
+    logger.info("Import for chat_id=%s: %s held=%d failure=%s", chat_id, stats.summary(), held, failure)
+
+    if failure is not None:
+        await update.message.reply_text(
+            f"❌ Could not read the rest of the file ({failure}).\n"
+            f"{stats.imported} reminders were imported before that."
+        )
+        return
+    text = f"✅ Imported {stats.imported} reminders."
+    if stats.skipped:
+        text += f"\nSkipped {stats.skipped} (already done, or one-time and in the past)."
+    if stats.invalid:
+        first, problem = stats.errors[0]
+        text += f"\n❌ {stats.invalid} invalid records, e.g. record {first}: {problem}"
+    await update.message.reply_text(text)
+
+
+# ---------- DEBUG handler (logs ALL updates, only with LOG_DEBUG_UPDATES=1) ----------
 
 async def debug_update(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Log every update so we see what Telegram is sending."""
     if update.message:
         msg = update.message
-        logger.info(
+        updates_log.info(
             "DEBUG update: chat_id=%s text=%r web_app_data=%r",
             msg.chat_id,
             msg.text,
@@ -175,17 +247,18 @@ async def debug_update(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         )
     elif update.callback_query:
         cq = update.callback_query
-        logger.info(
+        updates_log.info(
             "DEBUG callback_query: chat_id=%s data=%r",
             cq.message.chat_id if cq.message else None,
             cq.data,
         )
     else:
-        logger.info("DEBUG non-message update: %s", update)
+        updates_log.info("DEBUG non-message update: %s", lazy(update.to_json))
 
 
 # ---------- WebApp data handler ----------
 
+@metrics.timed(HANDLER_SECONDS)
 async def webapp_data_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
     Handle data coming from the WebApp.
@@ -195,7 +268,8 @@ async def webapp_data_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
       id,
       title,
       datetime,              // ISO string (toISOString())
-      repeat,                // once/weekly/monthly/yearly
+      repeat,                // once/daily/weekly/monthly/yearly or 'FREQ=WEEKLY;INTERVAL=2'
+      repeat_interval,       // optional: every N days/weeks/months/years
       category,
       note,
       remind_before_minutes,
@@ -207,7 +281,7 @@ async def webapp_data_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
 
     chat_id = update.effective_chat.id
     raw_data = update.message.web_app_data.data
-    logger.info("Received web_app_data from chat_id=%s: %s", chat_id, raw_data)
+    webapp_log.debug("Received web_app_data from chat_id=%s: %s", chat_id, raw_data)
 
     try:
         data = json.loads(raw_data)
@@ -221,23 +295,25 @@ async def webapp_data_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
     timezone_name = data.get("timezone")
     priority = data.get("priority", "normal")
     category = data.get("category") or None
+    note = (data.get("note") or "").strip() or None
 
-    # Map WebApp repeat → DB repeat
-    web_repeat = (data.get("repeat") or "once").lower()
-    repeat_map = {
-        "once": "none",    # one-time
-        "none": "none",
-        "daily": "daily",
-        "weekly": "weekly",
-        # monthly/yearly not implemented → treat as one-time for now
-        "monthly": "none",
-        "yearly": "none",
-    }
-    repeat = repeat_map.get(web_repeat, "none")
+    # Map WebApp repeat → DB repeat (see recurrence.py)
+    web_repeat = str(data.get("repeat") or "once").lower()
+    try:
+        repeat = normalize_repeat(web_repeat, int(data.get("repeat_interval", 1) or 1))
+    except (TypeError, ValueError, OverflowError):
+        logger.warning("Unsupported repeat %r from chat_id=%s", data.get("repeat"), chat_id)
+        await update.message.reply_text("❌ Unsupported repeat rule.")
+        return
 
-    remind_before_minutes = int(data.get("remind_before_minutes", 0) or 0)
+    try:
+        remind_before_minutes = max(0, int(data.get("remind_before_minutes", 0) or 0))
+        lead = datetime.timedelta(minutes=remind_before_minutes)
+    except (TypeError, ValueError, OverflowError):
+        await update.message.reply_text("❌ Invalid reminder lead time.")
+        return
 
-    logger.info(
+    webapp_log.debug(
         "Parsed payload: chat_id=%s title=%r datetime=%s tz=%s repeat_web=%s repeat_db=%s lead=%s",
         chat_id,
         title,
@@ -251,6 +327,9 @@ async def webapp_data_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
     if not datetime_str:
         await update.message.reply_text("❌ No date/time provided.")
         return
+    if not isinstance(datetime_str, str):
+        await update.message.reply_text("❌ Invalid date/time format.")
+        return
 
     # --- Parse datetime ---
     try:
@@ -264,18 +343,7 @@ async def webapp_data_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
             dt_parsed = datetime.datetime.fromisoformat(iso_candidate)
             if dt_parsed.tzinfo is None:
                 # attach user's timezone if we know it, else UTC
-                if timezone_name:
-                    try:
-                        tz = ZoneInfo(timezone_name)
-                        dt_parsed = dt_parsed.replace(tzinfo=tz)
-                    except Exception:
-                        logger.warning(
-                            "Failed to apply frontend timezone %s, using UTC",
-                            timezone_name,
-                        )
-                        dt_parsed = dt_parsed.replace(tzinfo=datetime.timezone.utc)
-                else:
-                    dt_parsed = dt_parsed.replace(tzinfo=datetime.timezone.utc)
+                dt_parsed = dt_parsed.replace(tzinfo=zone_or_utc(timezone_name))
             utc_dt = dt_parsed.astimezone(datetime.timezone.utc)
         except Exception:
             # fallback to old short format 'YYYY-MM-DDTHH:MM'
@@ -285,10 +353,14 @@ async def webapp_data_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
         now_utc = datetime.datetime.now(datetime.timezone.utc)
 
         # notification time = event - lead_minutes
-        utc_notify = utc_dt - datetime.timedelta(minutes=remind_before_minutes)
+        try:
+            utc_notify = utc_dt - lead
+        except OverflowError:
+            await update.message.reply_text("❌ Invalid reminder lead time.")
+            return
         delay_seconds = (utc_notify - now_utc).total_seconds()
 
-        logger.info(
+        webapp_log.debug(
             "Computed UTC times for chat_id=%s: event=%s notify=%s delay_seconds=%.2f",
             chat_id,
             utc_dt,
@@ -300,13 +372,18 @@ async def webapp_data_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
             await update.message.reply_text("⏰ Time must be in the future.")
             return
 
-    except ValueError:
-        logger.exception("ValueError while parsing datetime for chat_id=%s", chat_id)
+    except (ValueError, OverflowError):
+        logger.exception("Could not parse the datetime for chat_id=%s", chat_id)
         await update.message.reply_text("❌ Invalid date/time format.")
         return
 
-    # --- Save to DB (store actual event time in datetime_utc) ---
-    reminder_id = add_reminder(
+    # repeating reminders are evaluated from their first local occurrence
+    anchor_local = None
+    if repeat != "none":
+        anchor_local = utc_dt.astimezone(zone_or_utc(timezone_name)).replace(tzinfo=None).isoformat()
+
+    # --- Save to DB (event time in datetime_utc; the lead gives notify_at) ---
+    reminder_id = await add_reminder(
         chat_id=chat_id,
         title=title,
         datetime_utc_iso=utc_dt.isoformat(),
@@ -314,9 +391,13 @@ async def webapp_data_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
         priority=priority,
         category=category,
         repeat=repeat,
+        anchor_local=anchor_local,
+        note=note,
+        lead_minutes=remind_before_minutes,
     )
+    page_cache.invalidate(chat_id)
 
-    logger.info(
+    webapp_log.info(
         "Saved reminder id=%s for chat_id=%s at %s (UTC). Repeat=%s Lead=%s",
         reminder_id,
         chat_id,
@@ -325,49 +406,31 @@ async def webapp_data_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
         remind_before_minutes,
     )
 
-    # --- Schedule job ---
-    context.job_queue.run_once(
-        send_reminder_job,
-        when=delay_seconds,
-        chat_id=chat_id,
-        data={"reminder_id": reminder_id},
-        name=f"reminder-{reminder_id}",
-    )
+    # --- Schedule (only lands on the wheel if due inside the loaded window) ---
+    # the same integer notify_at the row holds
+    in_window = dispatcher.schedule(reminder_id, chat_id, notify_time(int(utc_dt.timestamp()), remind_before_minutes))
 
-    logger.info(
-        "Scheduled job for reminder id=%s (chat_id=%s) in %.2f seconds",
+    dispatch_log.debug(
+        "Scheduled reminder id=%s (chat_id=%s) in %.2f seconds (in_window=%s)",
         reminder_id,
         chat_id,
         delay_seconds,
+        in_window,
     )
 
     await update.message.reply_text(
-        f"✅ Reminder saved (#{reminder_id}):\n{format_for_user(get_reminder(reminder_id))}",
+        f"✅ Reminder saved (#{reminder_id}):\n{format_for_user(await get_reminder(reminder_id))}",
         parse_mode="Markdown",
     )
 
 
-# ---------- Job: send reminder ----------
-
-async def send_reminder_job(context: ContextTypes.DEFAULT_TYPE) -> None:
-    job = context.job
-    reminder_id = job.data["reminder_id"]
+# ---------- Dispatch: send reminders ----------
 
-    logger.info("send_reminder_job fired for reminder_id=%s chat_id=%s", reminder_id, job.chat_id)
+URGENT_NOTE = "⚠️ This reminder is *urgent*. Use the buttons below to snooze or mark done."
 
-    reminder = get_reminder(reminder_id)
-    if not reminder or reminder["status"] != "pending":
-        logger.info(
-            "Reminder id=%s not found or not pending (status=%s), skipping job",
-            reminder_id,
-            reminder["status"] if reminder else None,
-        )
-        return
 
-    text = f"{'⚠️' if reminder['priority']=='urgent' else '⏰'} *Reminder* #{reminder_id}\n"
-    text += format_for_user(reminder)
-
-    keyboard = InlineKeyboardMarkup(
+def reminder_keyboard(reminder_id: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
         [
             [
                 InlineKeyboardButton("Snooze 10 min", callback_data=f"snooze10:{reminder_id}"),
@@ -379,47 +442,178 @@ async def send_reminder_job(context: ContextTypes.DEFAULT_TYPE) -> None:
         ]
     )
 
-    await context.bot.send_message(
-        chat_id=job.chat_id,
-        text=text,
-        reply_markup=keyboard,
-        parse_mode="Markdown",
+
+def digest_keyboard(reminders: list) -> InlineKeyboardMarkup:
+    """One row per reminder; a press only removes that reminder's row (see reminder_callback)."""
+    return InlineKeyboardMarkup(
+        [
+            [
+                InlineKeyboardButton(f"✅ #{r['id']}", callback_data=f"cancel:{r['id']}"),
+                InlineKeyboardButton("+10 min", callback_data=f"snooze10:{r['id']}"),
+                InlineKeyboardButton("+1 h", callback_data=f"snooze60:{r['id']}"),
+            ]
+            for r in reminders
+        ]
     )
 
-    if reminder["priority"] == "urgent":
-        await context.bot.send_message(
-            chat_id=job.chat_id,
-            text="⚠️ This reminder is *urgent*. Use the buttons above to snooze or mark done.",
-            parse_mode="Markdown",
-        )
 
-    repeat = reminder.get("repeat", "none")
-    if repeat == "none":
-        update_reminder_status(reminder_id, "done")
-        logger.info("Reminder id=%s marked as done (no repeat)", reminder_id)
+def render_reminders(reminders: list, catchup: bool) -> str:
+    if len(reminders) == 1:
+        reminder = reminders[0]
+        urgent = reminder["priority"] == "urgent"
+        text = f"{'⚠️' if urgent else '⏰'} *Reminder* #{reminder['id']}\n"
+        text += format_for_user(reminder)
+        if urgent:
+            # used to be a second message
+            text += f"\n\n{URGENT_NOTE}"
     else:
-        utc_dt = datetime.datetime.fromisoformat(reminder["datetime_utc"]).replace(
-            tzinfo=datetime.timezone.utc
-        )
-        if repeat == "daily":
-            next_dt = utc_dt + datetime.timedelta(days=1)
-        elif repeat == "weekly":
-            next_dt = utc_dt + datetime.timedelta(weeks=1)
+        urgent = sum(r["priority"] == "urgent" for r in reminders)
+        text = f"⏰ *{len(reminders)} reminders*" + (f" (⚠️ {urgent} urgent)" if urgent else "")
+        for reminder in reminders:
+            mark = "⚠️" if reminder["priority"] == "urgent" else "⏰"
+            text += f"\n\n{mark} #{reminder['id']}\n{format_for_user(reminder)}"
+    if catchup:
+        text += "\n_Delivered late: the bot was offline when this was due._"
+    return text
+
+
+@metrics.timed(HANDLER_SECONDS)
+async def send_reminders(
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    reminder_ids: list,
+    catchup: bool = False,
+) -> int:
+    """
+    Send the reminders of one chat that fell due together (see digest.py) as
+    a single message and move each to its next occurrence. Returns how many
+    messages that saved against one per reminder.
+    """
+    dispatch_log.info("Sending reminder_ids=%s chat_id=%s catchup=%s", reminder_ids, chat_id, catchup)
+
+    reminders = []
+    for reminder_id in reminder_ids:
+        reminder = await get_reminder(reminder_id)
+        if not reminder or reminder["status"] != "pending":
+            dispatch_log.info(
+                "Reminder id=%s not found or not pending (status=%s), skipping",
+                reminder_id,
+                reminder["status"] if reminder else None,
+            )
+            continue
+        reminders.append(reminder)
+
+    saved = 0
+    if reminders:
+        # urgent first; the message goes in the lane of its most urgent reminder
+        reminders.sort(key=lambda r: r["priority"] != "urgent")
+        if catchup:
+            lane = "catchup"
         else:
-            next_dt = utc_dt
+            lane = min((r["priority"] for r in reminders), key=lambda p: LANES.get(p, LANES["normal"]))
+        fresh = []
+
+        async def claim():
+            # the ledger is taken when the message leaves the queue, see ledger.py;
+            # occurrences another attempt claimed are left out of the message
+            fresh[:] = await ledger.claim(reminders)
+            if not fresh:
+                return None
+            keyboard = reminder_keyboard(fresh[0]["id"]) if len(fresh) == 1 else digest_keyboard(fresh)
+            return render_reminders(fresh, catchup), {"reply_markup": keyboard, "parse_mode": "Markdown"}
 
-        update_reminder_datetime(reminder_id, next_dt.isoformat())
-        logger.info(
-            "Reminder id=%s is repeating (%s). Next datetime_utc=%s",
+        try:
+            message = await delivery.send(chat_id, "", priority=lane, claim=claim)
+        except Exception:
+            # give the claims back so the occurrences are sent again later
+            if fresh:
+                await ledger.release(fresh)
+            raise
+        if message is not None:
+            await ledger.confirm(fresh)
+            now = time.time()
+            if not catchup:
+                for reminder in fresh:
+                    DISPATCH_LATENESS.observe(max(0.0, now - reminder["notify_at"]))
+            saved = len(fresh) + sum(r["priority"] == "urgent" for r in fresh) - 1
+
+    # a suppressed duplicate still closes the occurrence, in case the attempt
+    # that sent it died before doing so
+    for reminder in reminders:
+        await close_occurrence(reminder)
+    return saved
+
+
+async def close_occurrence(reminder: dict) -> None:
+    """Finish a sent reminder, or move a repeating one to its next occurrence."""
+    reminder_id = reminder["id"]
+    due_ts = reminder["notify_at"]
+    repeat = reminder.get("repeat", "none")
+    now = datetime.datetime.now(datetime.timezone.utc)
+    lead = datetime.timedelta(minutes=reminder["lead_minutes"])
+    event_notify_at = notify_time(reminder["datetime_ts"], reminder["lead_minutes"])
+    try:
+        if repeat != "none" and due_ts != event_notify_at and event_notify_at > now.timestamp():
+            # a snooze of a repeating reminder: its next occurrence is still to come
+            event = datetime.datetime.fromtimestamp(reminder["datetime_ts"], datetime.timezone.utc)
+            step = Advance(reminder_id, event, reminder["occurrence"], reminder["anchor_local"])
+        else:
+            # skips any occurrences whose notification is already in the past (late or catch-up sends)
+            step = advance(
+                reminder_id,
+                repeat,
+                zone_or_utc(reminder["timezone"]),
+                reminder["anchor_local"],
+                reminder["occurrence"],
+                reminder["datetime_ts"],
+                now + lead,
+            )
+    except ValueError:
+        logger.warning("Reminder id=%s has an unreadable repeat rule %r", reminder_id, repeat)
+        step = None
+
+    page_cache.invalidate(reminder["chat_id"])
+    if step is None:
+        await finish_reminder(reminder_id, due_ts)
+        dispatch_log.info("Reminder id=%s marked as done (no repeat)", reminder_id)
+    else:
+        next_iso = step.datetime_utc.isoformat()
+        await advance_recurrences([(next_iso, step.occurrence, step.anchor_local, reminder_id, due_ts)])
+        dispatch_log.info(
+            "Reminder id=%s is repeating (%s). Next datetime_utc=%s (occurrence %s)",
             reminder_id,
             repeat,
-            next_dt.isoformat(),
+            next_iso,
+            step.occurrence,
         )
-        schedule_job_for_reminder(get_reminder(reminder_id), context.job_queue)
+        schedule_reminder(await get_reminder(reminder_id))
 
 
 # ---------- Callback: snooze / cancel ----------
 
+def without_reminder(markup: Optional[InlineKeyboardMarkup], reminder_id: int) -> Optional[InlineKeyboardMarkup]:
+    """A digest's keyboard minus the row of one reminder; None if no other reminder is left on it."""
+    if markup is None:
+        return None
+    suffix = f":{reminder_id}"
+    rows = [
+        row
+        for row in markup.inline_keyboard
+        if not any((button.callback_data or "").endswith(suffix) for button in row)
+    ]
+    return InlineKeyboardMarkup(rows) if rows else None
+
+
+async def acknowledge(query, reminder_id: int, text: str) -> None:
+    """Replace a reminder's message with text, or in a digest just drop its buttons."""
+    rest = without_reminder(query.message.reply_markup if query.message else None, reminder_id)
+    if rest is None:
+        await query.edit_message_text(text)
+    else:
+        await query.edit_message_reply_markup(rest)
+
+
+@metrics.timed(HANDLER_SECONDS)
 async def reminder_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
     await query.answer()
@@ -433,52 +627,93 @@ async def reminder_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await query.edit_message_text("❌ Invalid action.")
         return
 
-    reminder = get_reminder(reminder_id)
+    reminder = await get_reminder(reminder_id)
     if not reminder:
         logger.info("Reminder id=%s not found for callback %s", reminder_id, data)
-        await query.edit_message_text("This reminder no longer exists.")
+        await acknowledge(query, reminder_id, "This reminder no longer exists.")
         return
 
     chat_id = update.effective_chat.id if update.effective_chat else None
+    if reminder["status"] == "cancelled":
+        # a stale button: the reminder was deleted (sync API), neither snooze nor done applies
+        logger.info("Reminder id=%s is cancelled, ignoring callback %s", reminder_id, data)
+        await acknowledge(query, reminder_id, "This reminder was cancelled.")
+        return
+    page_cache.invalidate(reminder["chat_id"])
 
     if action == "cancel":
-        update_reminder_status(reminder_id, "done")
+        await update_reminder_status(reminder_id, "done")
+        dispatcher.cancel(reminder_id)
         logger.info(
             "Reminder id=%s cancelled by user (chat_id=%s)",
             reminder_id,
             chat_id,
         )
-        await query.edit_message_text("✅ Reminder marked as done.")
+        await acknowledge(query, reminder_id, "✅ Reminder marked as done.")
         return
 
-    # Snooze 10 or 60 minutes
+    # Snooze 10 or 60 minutes: only the notification moves, the event keeps its time
     minutes = 10 if action == "snooze10" else 60
-    new_dt = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=minutes)
-    update_reminder_datetime(reminder_id, new_dt.isoformat())
-    schedule_job_for_reminder(get_reminder(reminder_id), context.job_queue)
+    new_dt = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0) + datetime.timedelta(minutes=minutes)
+    if not await snooze_reminder(reminder_id, int(new_dt.timestamp())):
+        logger.info("Reminder id=%s was cancelled meanwhile, not snoozed", reminder_id)
+        await acknowledge(query, reminder_id, "This reminder was cancelled.")
+        return
+    schedule_reminder(await get_reminder(reminder_id))
 
     logger.info(
-        "Reminder id=%s snoozed by %s minutes (chat_id=%s), new_datetime_utc=%s",
+        "Reminder id=%s snoozed by %s minutes (chat_id=%s), notify_at=%s",
         reminder_id,
         minutes,
         chat_id,
         new_dt.isoformat(),
     )
 
-    await query.edit_message_text(f"⏰ Reminder snoozed for {minutes} minutes.")
+    await acknowledge(query, reminder_id, f"⏰ Reminder snoozed for {minutes} minutes.")
 
 
 # ---------- Scheduling helper ----------
 
-def schedule_job_for_reminder(reminder: dict, job_queue) -> None:
-    """Schedule a job for a reminder (used on startup & for repeats)."""
-    utc_dt = datetime.datetime.fromisoformat(reminder["datetime_utc"]).replace(
-        tzinfo=datetime.timezone.utc
-    )
-    now_utc = datetime.datetime.now(datetime.timezone.utc)
-    delay_seconds = (utc_dt - now_utc).total_seconds()
+digests = DigestCoalescer(send_reminders)
+if DISPATCH_MODE == "leased":
+    dispatcher = LeasedDispatcher(digests.fire, digests.catchup)
+else:
+    dispatcher = ReminderDispatcher(digests.fire)
+delivery = DeliveryQueue()
+ledger = DeliveryLedger()
+retention = Retention()
+
+metrics.gauge("dispatcher_reminders", "Reminders held in memory (leased mode: claimed and in flight).", fn=lambda: len(dispatcher))
+metrics.gauge("delivery_queue_depth", "Messages waiting in the outbound delivery queue.", fn=lambda: len(delivery))
+metrics.counter("delivery_sent_total", "Messages delivered to Telegram.", fn=lambda: delivery.sent)
+metrics.counter("delivery_retried_total", "Send attempts that were queued again.", fn=lambda: delivery.retried)
+metrics.counter("delivery_failed_total", "Messages given up on.", fn=lambda: delivery.failed)
+metrics.counter("delivery_duplicates_suppressed_total", "Sends skipped because the ledger had them.", fn=lambda: ledger.suppressed)
+metrics.counter("delivery_claims_released_total", "Ledger claims given back after a failed send.", fn=lambda: ledger.released)
+metrics.counter(
+    "delivery_claims_unconfirmed_total",
+    "Duplicates suppressed on a claim nobody confirmed (possibly lost with a killed worker).",
+    fn=lambda: ledger.unconfirmed,
+)
+metrics.gauge("digest_pending_reminders", "Reminders waiting in open digest batches.", fn=lambda: len(digests))
+metrics.gauge("db_group_commit_pending", "Writes queued for the next group commit.", fn=lambda: len(db_writes))
+metrics.counter("db_group_commits_total", "Group commit transactions.", fn=lambda: db_writes.commits)
+metrics.counter("db_group_commit_writes_total", "Writes applied by group commits.", fn=lambda: db_writes.writes)
+metrics.gauge("reminder_cache_size", "Reminders held in the read-through cache.", fn=lambda: len(reminder_cache))
+metrics.counter("reminder_cache_hits_total", "get_reminder calls answered from the cache.", fn=lambda: reminder_cache.hits)
+metrics.counter("reminder_cache_misses_total", "get_reminder calls that read the database.", fn=lambda: reminder_cache.misses)
+metrics.counter("reminder_cache_evictions_total", "Reminders dropped from the full cache.", fn=lambda: reminder_cache.evictions)
+metrics.counter("retention_archived_total", "Closed reminders moved out of the live table.", fn=lambda: retention.archived)
+metrics.counter("retention_deliveries_pruned_total", "Delivery ledger records pruned.", fn=lambda: retention.deliveries_pruned)
+metrics.counter("retention_reclaimed_bytes_total", "Bytes the database shrank by in retention runs.", fn=lambda: retention.reclaimed)
+
+
+def schedule_reminder(reminder: dict) -> None:
+    """Hand a reminder to the dispatcher (used for repeats & snoozes)."""
+    due_ts = reminder["notify_at"]
+    delay_seconds = due_ts - datetime.datetime.now(datetime.timezone.utc).timestamp()
     if delay_seconds <= 0:
-        logger.info(
+        dispatch_log.info(
             "Not scheduling reminder id=%s (chat_id=%s) because delay_seconds=%.2f <= 0",
             reminder["id"],
             reminder["chat_id"],
@@ -486,45 +721,94 @@ def schedule_job_for_reminder(reminder: dict, job_queue) -> None:
         )
         return
 
-    logger.info(
-        "Scheduling reminder id=%s (chat_id=%s) in %.2f seconds",
+    in_window = dispatcher.schedule(reminder["id"], reminder["chat_id"], due_ts)
+    dispatch_log.info(
+        "Scheduling reminder id=%s (chat_id=%s) in %.2f seconds (in_window=%s)",
         reminder["id"],
         reminder["chat_id"],
         delay_seconds,
+        in_window,
     )
 
-    job_queue.run_once(
-        send_reminder_job,
-        when=delay_seconds,
-        chat_id=reminder["chat_id"],
-        data={"reminder_id": reminder["id"]},
-        name=f"reminder-{reminder['id']}",
-    )
+
+def on_sync_change(reminder_id: int, chat_id: int, notify_ts: Optional[float]) -> None:
+    """A Mini App write through the sync API (runs on the event loop)."""
+    page_cache.invalidate(chat_id)
+    reminder_cache.invalidate(reminder_id)
+    if notify_ts is None:
+        dispatcher.cancel(reminder_id)
+    else:
+        # like webapp_data_handler: only lands on the wheel if due inside the loaded window
+        dispatcher.schedule(reminder_id, chat_id, notify_ts)
 
 
 async def on_startup(app: Application) -> None:
-    """On startup, schedule jobs for all pending reminders."""
-    logger.info("Scheduling pending reminders from DB on startup...")
+    """On startup, start the dispatcher and replay anything missed while we were down."""
+    metrics.gauge("job_queue_jobs", "Jobs scheduled in the PTB job queue.", fn=lambda: len(app.job_queue.jobs()))
+    # worker i of a leased group has its own samples and listens on METRICS_PORT + i
+    metrics_port = metrics.METRICS_PORT
+    if metrics_port and DISPATCH_MODE == "leased":
+        metrics_port += DISPATCH_WORKER_INDEX
+    metrics.start_http_server(metrics_port)
+    # the Mini App talks to the process that takes updates; dispatch-only workers stay off its port
+    if ingress.BOT_MODE != "none":
+        app.bot_data["sync_server"] = sync_api.start_server(BOT_TOKEN, on_sync_change, asyncio.get_running_loop())
+    logger.info("Starting reminder dispatcher...")
     logger.info("Job queue present: %s", bool(app.job_queue))
-    pending = get_all_pending_reminders()
-    logger.info("Found %d pending reminders in DB", len(pending))
-    for r in pending:
-        schedule_job_for_reminder(r, app.job_queue)
+    cutoff = datetime.datetime.now(datetime.timezone.utc)
+    await delivery.start(app.bot)
+    await dispatcher.start(app.job_queue, since_ts=cutoff.timestamp())
+    # one process is enough to maintain a shared database
+    if DISPATCH_MODE != "leased" or DISPATCH_WORKER_INDEX == 0:
+        retention.start(app.job_queue)
+    if DISPATCH_MODE == "leased":
+        # late rows are recovered by whichever worker claims them
+        return
 
+    async def recovery_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+        await recover_missed(context, digests.catchup, dispatcher, cutoff)
 
-# ---------- Main ----------
+    app.job_queue.run_once(recovery_job, when=0, name="recovery")
+    logger.info("Dispatcher holds %d reminders due in the next %ds", len(dispatcher), dispatcher.window_seconds)
 
-def main() -> None:
-    init_db()
 
-    app = Application.builder().token(BOT_TOKEN).build()
+async def on_shutdown(app: Application) -> None:
+    """Stop the sync API and delivery workers, drain outstanding DB work and release the pooled connections."""
+    sync_server = app.bot_data.get("sync_server")
+    if sync_server:
+        sync_server.shutdown()
+    await delivery.stop()
+    logger.info(
+        "Delivery totals: sent=%d retried=%d failed=%d duplicates_suppressed=%d claims_released=%d "
+        "claims_unconfirmed=%d",
+        delivery.sent,
+        delivery.retried,
+        delivery.failed,
+        ledger.suppressed,
+        ledger.released,
+        ledger.unconfirmed,
+    )
+    await flush_db()
+    shutdown_db()
+
 
-    # 1) DEBUG handler first (block=False so other handlers still run)
-    app.add_handler(MessageHandler(filters.ALL, debug_update, block=False))
+# ---------- Main ----------
+
+def build_application() -> Application:
+    app = ingress.configure(Application.builder().token(BOT_TOKEN)).build()
+
+    # 1) DEBUG handler first, in its own group: only one handler per group runs,
+    #    so in group 0 it would swallow every message (block=False keeps it off the hot path)
+    if LOG_DEBUG_UPDATES:
+        app.add_handler(MessageHandler(filters.ALL, debug_update, block=False), group=-1)
 
     # 2) commands
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("reminders", reminders_cmd))
+    app.add_handler(CommandHandler("export", export_cmd))
+    app.add_handler(
+        MessageHandler(filters.Document.ALL & filters.CaptionRegex(r"^/import(@\w+)?\b"), import_document)
+    )
 
     # 3) WebApp data – use proper WEB_APP_DATA filter now
     app.add_handler(
@@ -538,12 +822,17 @@ def main() -> None:
     app.add_handler(
         CallbackQueryHandler(reminder_callback, pattern=r"^(snooze10|snooze60|cancel):\d+$")
     )
+    app.add_handler(CallbackQueryHandler(reminders_page_callback, pattern=PAGE_CALLBACK_PATTERN))
 
     # schedule pending reminders
     app.post_init = on_startup
+    app.post_shutdown = on_shutdown
+    return app
+
 
-    logger.info("Bot is starting run_polling()...")
-    app.run_polling()
+def main() -> None:
+    init_db()
+    ingress.run(build_application())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,283 @@
+"""
+Bulk import and export of reminders as CSV or JSON Lines.
+
+Records have these fields (CSV header / JSON keys); only datetime and, for
+the CLI without --chat-id, chat_id are required:
+
+    chat_id, title, datetime, timezone, priority, category, repeat,
+    status, anchor_local, occurrence, remind_before_minutes
+
+datetime is ISO 8601; without an offset it is read in the record's
+timezone (UTC if none). Exports write it as UTC, so an export imports back
+unchanged. remind_before_minutes is the lead: the reminder is sent that
+long before datetime.
+
+- Import streams records from a generator and inserts them with
+  executemany, IMPORT_BATCH_SIZE rows per transaction. Rows that are not
+  pending, and one-time reminders whose notification time has passed, are
+  skipped. Repeating ones move on to their next occurrence instead.
+- Export reads through one cursor in batches (db.iter_reminders), so
+  memory stays flat at millions of rows.
+
+From the command line (run from bot/, uses DB_PATH from .env):
+
+    python bulk.py import reminders.csv [--chat-id 123] [--format csv|jsonl]
+    python bulk.py export backup.jsonl [--chat-id 123] [--all]
+
+A single-mode bot that is already running only picks up imported reminders
+due inside its loaded window (SCHEDULER_WINDOW_SECONDS) after a restart.
+Imports sent to the bot itself (/import caption on a file) are handed
+straight to its dispatcher.
+"""
+import argparse
+import csv
+import datetime
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from db import PendingRow, init_db, insert_reminders, iter_reminders, normalize_datetime, notify_time  # noqa: E402
+from recurrence import advance, normalize_repeat  # noqa: E402
+from timeutils import PRIORITY_LABELS, zone_or_utc  # noqa: E402
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "5000"))
+FIELDS = (
+    "chat_id", "title", "datetime", "timezone", "priority", "category",
+    "repeat", "status", "anchor_local", "occurrence", "remind_before_minutes",
+)
+FORMATS = ("csv", "jsonl")
+MAX_ERRORS_KEPT = 10
+
+
+class ImportStats:
+    def __init__(self) -> None:
+        self.imported = 0
+        self.skipped = 0
+        self.invalid = 0
+        # first few (record number, problem), for the report
+        self.errors: List[Tuple[int, str]] = []
+        # imported rows due before hold_until, for the caller's dispatcher
+        self.due_soon: List[PendingRow] = []
+
+    def summary(self) -> str:
+        text = f"imported={self.imported} skipped={self.skipped} invalid={self.invalid}"
+        for number, problem in self.errors:
+            text += f"\n  record {number}: {problem}"
+        return text
+
+
+def detect_format(filename: str) -> str:
+    name = filename.lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".jsonl", ".ndjson", ".json")):
+        return "jsonl"
+    raise ValueError(f"Unknown file type {filename!r}, expected .csv or .jsonl")
+
+
+def read_records(stream: TextIO, fmt: str) -> Iterator[Union[Dict[str, object], str]]:
+    """
+    One record at a time: a dict per CSV row, the text of each JSONL line.
+    Lines are parsed by import_records, so a bad one counts as invalid.
+    """
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield line
+
+
+def parse_record(record: Union[Dict[str, object], str]) -> Dict[str, object]:
+    if isinstance(record, str):
+        record = json.loads(record)
+    if not isinstance(record, dict):
+        raise ValueError(f"expected a JSON object, got {type(record).__name__}")
+    return record
+
+
+def to_row(record: Dict[str, object], chat_id: Optional[int], now: datetime.datetime) -> Optional[Tuple]:
+    """
+    insert_reminders() row for a record; None if it should be skipped.
+    Raises ValueError (or KeyError) if the record is malformed, OverflowError
+    if a time, lead or id is out of range.
+    """
+    status = str(record.get("status") or "pending").strip().lower()
+    if status != "pending":
+        return None
+
+    timezone = str(record.get("timezone") or "").strip() or None
+    tz = zone_or_utc(timezone)
+    when = datetime.datetime.fromisoformat(str(record["datetime"]).strip().replace("Z", "+00:00"))
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=tz)
+
+    priority = str(record.get("priority") or "normal").strip().lower()
+    if priority not in PRIORITY_LABELS:
+        raise ValueError(f"unknown priority {priority!r}")
+    repeat = normalize_repeat(str(record.get("repeat") or "once").strip())
+    anchor_local = str(record.get("anchor_local") or "").strip() or None
+    occurrence = int(record.get("occurrence") or 0)
+    if repeat != "none" and not anchor_local:
+        anchor_local, occurrence = when.astimezone(tz).replace(tzinfo=None).isoformat(), 0
+    lead_minutes = int(record.get("remind_before_minutes") or 0)
+    if lead_minutes < 0:
+        raise ValueError("remind_before_minutes must not be negative")
+
+    lead = datetime.timedelta(minutes=lead_minutes)
+    if when - lead <= now:
+        if repeat == "none":
+            return None
+        step = advance(0, repeat, tz, anchor_local, occurrence, int(when.timestamp()), now + lead)
+        when, occurrence, anchor_local = step.datetime_utc, step.occurrence, step.anchor_local
+
+    title = str(record.get("title") or "").strip() or "Reminder"
+    category = str(record.get("category") or "").strip() or None
+    owner = chat_id if chat_id is not None else int(record["chat_id"])
+    # caught here, not by executemany, which would fail the whole batch
+    for name, value in (("chat_id", owner), ("occurrence", occurrence)):
+        if not -(2**63) <= value < 2**63:
+            raise OverflowError(f"{name} {value} does not fit in a 64-bit integer")
+    datetime_utc, datetime_ts = normalize_datetime(when.isoformat())
+    return (owner, title, datetime_utc, datetime_ts, timezone, priority, category, repeat, anchor_local,
+            occurrence, lead_minutes, notify_time(datetime_ts, lead_minutes))
+
+
+def import_records(
+    records: Iterable[Union[Dict[str, object], str]],
+    chat_id: Optional[int] = None,
+    batch_size: int = IMPORT_BATCH_SIZE,
+    hold_until: Optional[float] = None,
+    stats: Optional[ImportStats] = None,
+) -> ImportStats:
+    """
+    Validate and insert records batch_size per transaction. chat_id, if
+    given, owns every record (imports sent by a user). Rows due by
+    hold_until are collected in stats.due_soon. Pass stats to keep the
+    counts of the batches already committed if reading the file fails
+    (UnicodeDecodeError, csv.Error).
+    """
+    stats = stats if stats is not None else ImportStats()
+    now = datetime.datetime.now(datetime.timezone.utc)
+    batch: List[Tuple] = []
+
+    def flush() -> None:
+        inserted = insert_reminders(batch)
+        stats.imported += len(inserted)
+        if hold_until is not None:
+            stats.due_soon.extend(r for r in inserted if r.notify_at <= hold_until)
+        batch.clear()
+
+    for number, record in enumerate(records, 1):
+        try:
+            row = to_row(parse_record(record), chat_id, now)
+        except (KeyError, TypeError, ValueError, OverflowError) as exc:
+            stats.invalid += 1
+            if len(stats.errors) < MAX_ERRORS_KEPT:
+                stats.errors.append((number, f"{type(exc).__name__}: {exc}"))
+            continue
+        if row is None:
+            stats.skipped += 1
+            continue
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return stats
+
+
+def import_file(
+    stream: BinaryIO,
+    fmt: str,
+    chat_id: Optional[int] = None,
+    hold_until: Optional[float] = None,
+    stats: Optional[ImportStats] = None,
+) -> ImportStats:
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        return import_records(read_records(text, fmt), chat_id, hold_until=hold_until, stats=stats)
+    finally:
+        text.detach()
+
+
+def export_records(
+    out: TextIO,
+    fmt: str,
+    chat_id: Optional[int] = None,
+    include_history: bool = False,
+) -> int:
+    """Write reminders (pending only unless include_history) to out; returns the count."""
+    count = 0
+    writer = csv.writer(out) if fmt == "csv" else None
+    if writer:
+        writer.writerow(FIELDS)
+    for row in iter_reminders(chat_id, include_history):
+        values = (
+            row["chat_id"], row["title"], row["datetime_utc"], row["timezone"], row["priority"],
+            row["category"], row["repeat"], row["status"], row["anchor_local"], row["occurrence"],
+            row["lead_minutes"],
+        )
+        if writer:
+            writer.writerow(values)
+        else:
+            out.write(json.dumps(dict(zip(FIELDS, values)), ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+
+def export_to_tempfile(fmt: str, chat_id: Optional[int] = None, include_history: bool = False) -> Tuple[BinaryIO, int]:
+    """Export into an anonymous temporary file, rewound for sending."""
+    raw = tempfile.TemporaryFile()
+    text = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+    count = export_records(text, fmt, chat_id, include_history)
+    text.flush()
+    text.detach()
+    raw.seek(0)
+    return raw, count
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Import or export reminders as CSV / JSON Lines.")
+    parser.add_argument("action", choices=("import", "export"))
+    parser.add_argument("path", help="file to read or write, - for stdin/stdout")
+    parser.add_argument("--format", choices=FORMATS, help="default: from the file extension")
+    parser.add_argument("--chat-id", type=int, help="import: owner of every record; export: only this chat")
+    parser.add_argument("--all", action="store_true", help="export done/missed reminders too")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    fmt = args.format or (detect_format(args.path) if args.path != "-" else "jsonl")
+    init_db()
+    started = time.perf_counter()
+
+    if args.action == "import":
+        stream = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8-sig", newline="")
+        stats = ImportStats()
+        try:
+            with stream:
+                import_records(read_records(stream, fmt), args.chat_id, args.batch_size, stats=stats)
+        except (UnicodeDecodeError, csv.Error) as exc:
+            print(f"{stats.summary()}\nstopped, unreadable file: {exc}", file=sys.stderr)
+            return 1
+        print(f"{stats.summary()}\n({time.perf_counter() - started:.2f}s)", file=sys.stderr)
+        return 1 if stats.invalid else 0
+
+    stream = sys.stdout if args.path == "-" else open(args.path, "w", encoding="utf-8", newline="")
+    with stream:
+        count = export_records(stream, fmt, args.chat_id, args.all)
+    print(f"exported={count} ({time.perf_counter() - started:.2f}s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
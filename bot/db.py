@@ -1,18 +1,346 @@
+import os
+import queue
 import sqlite3
 import datetime
-from typing import List, Optional, Dict, Any
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Dict, Any, Iterable, Iterator, NamedTuple, Tuple
 
-DB_PATH = "reminders.db"
+from metrics import histogram, timed
 
+DB_PATH = os.getenv("DB_PATH", "reminders.db")
 
-def get_conn():
-    return sqlite3.connect(DB_PATH)
+# ---------- Connection tuning ----------
 
+# NORMAL is durable across application crashes in WAL mode; only an OS crash
+# or power loss can roll back the last few commits.
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL").upper()
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "8192"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(64 * 1024 * 1024)))
+DB_READER_POOL_SIZE = int(os.getenv("DB_READER_POOL_SIZE", "4"))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_STATEMENT_CACHE = 256
+DB_BATCH_SIZE = int(os.getenv("DB_BATCH_SIZE", "1000"))
 
-def init_db():
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
+# larger than any real id, so (datetime_utc, MAX_ID) sorts after every row at that time
+MAX_ID = 2**63 - 1
+
+# wall time of each public call, connection wait included (generators are not timed)
+DB_SECONDS = histogram("db_query_seconds", "Time spent in db.py calls, by function.", label="function")
+
+_writer: Optional[sqlite3.Connection] = None
+_writer_lock = threading.RLock()
+_readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+_readers_open = 0
+# bumped by close_all(): connections borrowed before it are closed when returned
+_pool_generation = 0
+_pool_lock = threading.Lock()
+
+
+def get_conn() -> sqlite3.Connection:
+    """Open a new tuned connection. Prefer writer()/reader() which reuse them."""
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=DB_BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,
+        cached_statements=DB_STATEMENT_CACHE,
+    )
+    conn.row_factory = sqlite3.Row
+    # only takes effect on a new database; retention.py converts older ones once
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+    return conn
+
+
+@contextmanager
+def writer() -> Iterator[sqlite3.Connection]:
+    """
+    Borrow the single long-lived writer connection.
+    Everything inside the block is one transaction: committed on success,
+    rolled back on error.
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = get_conn()
+        try:
+            yield _writer
+        except BaseException:
+            _writer.rollback()
+            raise
+        else:
+            _writer.commit()
+
+
+@contextmanager
+def reader() -> Iterator[sqlite3.Connection]:
+    """Borrow a connection from the reader pool (WAL lets these run alongside the writer)."""
+    global _readers_open
+    generation = _pool_generation
+    conn = None
+    while conn is None:
+        try:
+            conn = _readers.get_nowait()
+            break
+        except queue.Empty:
+            pass
+        with _pool_lock:
+            can_open = _readers_open < DB_READER_POOL_SIZE
+            if can_open:
+                _readers_open += 1
+        if can_open:
+            conn = get_conn()
+        else:
+            # wakes on a returned connection; the timeout re-checks for room
+            # freed by close_all() closing borrowed ones instead
+            try:
+                conn = _readers.get(timeout=0.1)
+            except queue.Empty:
+                pass
+    try:
+        yield conn
+    finally:
+        # never hand back a connection with an open read transaction
+        if conn.in_transaction:
+            conn.rollback()
+        with _pool_lock:
+            stale = generation != _pool_generation
+            if stale:
+                _readers_open -= 1
+            else:
+                _readers.put(conn)
+        if stale:
+            conn.close()
+
+
+def close_all() -> None:
+    """Close pooled connections (shutdown, or before switching DB_PATH)."""
+    global _writer, _readers_open, _pool_generation
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+            _writer = None
+    with _pool_lock:
+        # only the idle ones: borrowed connections still count until they come back
+        _pool_generation += 1
+        while True:
+            try:
+                _readers.get_nowait().close()
+            except queue.Empty:
+                break
+            _readers_open -= 1
+
+
+# ---------- Statements ----------
+# Kept as constants so every call hits the per-connection statement cache.
+
+_SQL_INSERT = """
+    INSERT INTO reminders (
+        chat_id, title, datetime_utc, datetime_ts, timezone, priority, category, repeat, anchor_local, note,
+        lead_minutes, notify_at, status
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'pending')
+"""
+# bulk import (bulk.py): like _SQL_INSERT, plus the occurrence index of restored
+# repeating rows and a sync_seq from a range reserved for the whole batch
+_SQL_IMPORT = """
+    INSERT INTO reminders (
+        chat_id, title, datetime_utc, datetime_ts, timezone, priority, category, repeat, anchor_local,
+        occurrence, lead_minutes, notify_at, sync_seq, status
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'pending')
+"""
+_SQL_RESERVE_SYNC_SEQ = "UPDATE sync_clock SET seq = seq + ? WHERE id = 1 RETURNING seq"
+_SQL_EXPORT = """
+    SELECT id, chat_id, title, datetime_utc, timezone, priority, category, repeat, status, anchor_local, occurrence,
+        lead_minutes
+    FROM reminders
+    WHERE (? IS NULL OR chat_id = ?) AND (? OR status = 'pending')
+    ORDER BY id
+"""
+_SQL_GET = "SELECT * FROM reminders WHERE id = ?"
+# every write bumps version, which keys the rendered-text cache, and releases
+# any dispatch lease: the claimed occurrence has been handled.
+# notify_at (event time minus the stored lead) is computed by the writes
+# that set a time (insert, edit, advance, snooze); the dispatcher only reads it
+_SQL_SET_STATUS = """
+    UPDATE reminders SET status = ?, version = version + 1, claimed_by = NULL, lease_expires = NULL
+    WHERE id = ?
+"""
+# a snooze only moves the notification, and brings back a reminder that was
+# closed when it was sent; one cancelled from the Mini App stays cancelled
+_SQL_SNOOZE = """
+    UPDATE reminders
+    SET notify_at = ?, status = 'pending', version = version + 1, claimed_by = NULL, lease_expires = NULL
+    WHERE id = ? AND status != 'cancelled'
+"""
+# an occurrence is identified by the time it fell due (notify_at). Finishing
+# one only applies if the row still holds it (same due time, still pending):
+# a duplicate attempt can never finish it twice or undo a snooze that
+# happened in between
+_SQL_FINISH = """
+    UPDATE reminders SET status = ?, version = version + 1, claimed_by = NULL, lease_expires = NULL
+    WHERE id = ? AND notify_at = ? AND status = 'pending'
+"""
+_SQL_ADVANCE = """
+    UPDATE reminders
+    SET datetime_utc = ?1, datetime_ts = ?2, notify_at = ?2 - 60 * lead_minutes, occurrence = ?3, anchor_local = ?4,
+        version = version + 1, claimed_by = NULL, lease_expires = NULL
+    WHERE id = ?5 AND notify_at = ?6 AND status = 'pending'
+"""
+# Mini App edits (sync_api.py): only the owner's pending rows, optionally only
+# at the version the client last saw; the new anchor restarts any repeat
+_SQL_EDIT = """
+    UPDATE reminders
+    SET title = ?, datetime_utc = ?, datetime_ts = ?, timezone = ?, priority = ?, category = ?, repeat = ?,
+        anchor_local = ?, note = ?, lead_minutes = ?, notify_at = ?, occurrence = 0, version = version + 1,
+        claimed_by = NULL, lease_expires = NULL
+    WHERE id = ? AND chat_id = ? AND status = 'pending' AND (? IS NULL OR version = ?)
+    RETURNING *
+"""
+_SQL_CANCEL = """
+    UPDATE reminders SET status = 'cancelled', version = version + 1, claimed_by = NULL, lease_expires = NULL
+    WHERE id = ? AND chat_id = ? AND status = 'pending' AND (? IS NULL OR version = ?)
+    RETURNING *
+"""
+# rows of a chat changed after a sync_seq, oldest change first; a first sync
+# (include_closed false) only needs the pending ones
+_SQL_CHANGES = """
+    SELECT * FROM reminders
+    WHERE chat_id = ? AND sync_seq > ? AND (? OR status = 'pending')
+    ORDER BY sync_seq ASC
+    LIMIT ?
+"""
+# the highest sync_seq of a row removed by retention: a client that synced
+# before it may still hold such a row and has to start over
+_SQL_SYNC_FLOOR = "SELECT archived_seq FROM sync_clock WHERE id = 1"
+_SQL_RAISE_SYNC_FLOOR = "UPDATE sync_clock SET archived_seq = MAX(archived_seq, ?) WHERE id = 1"
+# retention (retention.py): closed rows whose time is before a cutoff, walked
+# by id; a closed row never reopens, so deleting one needs no other check
+_SQL_CLOSED_BATCH = """
+    SELECT * FROM reminders
+    WHERE id > ? AND status != 'pending' AND datetime_ts < ?
+    ORDER BY id ASC
+    LIMIT ?
+"""
+_SQL_PURGE = "DELETE FROM reminders WHERE id = ? AND status != 'pending' RETURNING sync_seq"
+_SQL_PURGE_DELIVERIES = "DELETE FROM deliveries WHERE reminder_id = ?"
+# ledger pruning: keyset walk over the primary key
+_SQL_DELIVERY_BATCH = """
+    SELECT reminder_id, due_ts, recorded_at FROM deliveries
+    WHERE (reminder_id, due_ts) > (?, ?)
+    ORDER BY reminder_id ASC, due_ts ASC
+    LIMIT ?
+"""
+_SQL_PRUNE_DELIVERY = "DELETE FROM deliveries WHERE reminder_id = ? AND due_ts = ?"
+# delivery ledger: one row per occurrence, taken before the send (first writer
+# wins), marked sent once Telegram accepted it, dropped again if the send failed
+_SQL_CLAIM_DELIVERY = "INSERT OR IGNORE INTO deliveries (reminder_id, due_ts, recorded_at, sent) VALUES (?, ?, ?, 0)"
+_SQL_CONFIRM_DELIVERY = "UPDATE deliveries SET sent = 1 WHERE reminder_id = ? AND due_ts = ?"
+_SQL_RELEASE_DELIVERY = "DELETE FROM deliveries WHERE reminder_id = ? AND due_ts = ? AND sent = 0"
+_SQL_DELIVERY_SENT = "SELECT sent FROM deliveries WHERE reminder_id = ? AND due_ts = ?"
+# single-row writes that async_db queues and applies together (groupcommit.py);
+# each kind takes its statement's parameters
+_SQL_WRITES = {
+    "status": _SQL_SET_STATUS,
+    "snooze": _SQL_SNOOZE,
+    "finish": _SQL_FINISH,
+    "advance": _SQL_ADVANCE,
+    "claim": _SQL_CLAIM_DELIVERY,
+    "confirm": _SQL_CONFIRM_DELIVERY,
+    "release": _SQL_RELEASE_DELIVERY,
+}
+# /reminders pages: keyset over (chat_id, status, datetime_ts, id) in either
+# direction, one index range per page; the optional filters are checked on that range
+_SQL_CHAT_PAGE_AFTER = """
+    SELECT * FROM reminders
+    WHERE chat_id = ? AND status = 'pending' AND (datetime_ts, id) > (?, ?)
+      AND (? IS NULL OR category = ? COLLATE NOCASE) AND (? IS NULL OR priority = ?)
+    ORDER BY datetime_ts ASC, id ASC
+    LIMIT ?
+"""
+_SQL_CHAT_PAGE_BEFORE = """
+    SELECT * FROM reminders
+    WHERE chat_id = ? AND status = 'pending' AND (datetime_ts, id) < (?, ?) AND datetime_ts >= ?
+      AND (? IS NULL OR category = ? COLLATE NOCASE) AND (? IS NULL OR priority = ?)
+    ORDER BY datetime_ts DESC, id DESC
+    LIMIT ?
+"""
+# the dispatcher's queries order and filter by notify_at alone, on the
+# pending-notify index. Keyset page: rows after (notify_at, id) up to an end time
+_SQL_PENDING_BATCH = """
+    SELECT id, chat_id, notify_at FROM reminders
+    WHERE status = 'pending' AND (notify_at, id) > (?, ?) AND notify_at <= ?
+    ORDER BY notify_at ASC, id ASC
+    LIMIT ?
+"""
+_SQL_OVERDUE = """
+    SELECT id, chat_id, datetime_ts, notify_at, repeat, timezone, anchor_local, occurrence, lead_minutes
+    FROM reminders
+    WHERE status = 'pending' AND notify_at <= ?
+    ORDER BY notify_at ASC
+"""
+
+# leased dispatch: atomically take due rows nobody holds a live lease on
+_SQL_CLAIM_DUE = """
+    UPDATE reminders SET claimed_by = ?, lease_expires = ?
+    WHERE id IN (
+        SELECT id FROM reminders
+        WHERE status = 'pending' AND notify_at <= ? AND (lease_expires IS NULL OR lease_expires < ?)
+        ORDER BY notify_at ASC
+        LIMIT ?
+    )
+    RETURNING id, chat_id, datetime_ts, notify_at, repeat, timezone, anchor_local, occurrence, lead_minutes
+"""
+# same, limited to this worker's chat_id shard plus rows overdue since steal_before
+_SQL_CLAIM_DUE_SHARD = """
+    UPDATE reminders SET claimed_by = ?, lease_expires = ?
+    WHERE id IN (
+        SELECT id FROM reminders
+        WHERE status = 'pending' AND notify_at <= ? AND (lease_expires IS NULL OR lease_expires < ?)
+          AND (((chat_id % ?) + ?) % ? = ? OR notify_at <= ?)
+        ORDER BY notify_at ASC
+        LIMIT ?
+    )
+    RETURNING id, chat_id, datetime_ts, notify_at, repeat, timezone, anchor_local, occurrence, lead_minutes
+"""
+_SQL_RENEW_LEASE = "UPDATE reminders SET lease_expires = ? WHERE id = ? AND claimed_by = ?"
+
+
+def normalize_datetime(datetime_utc_iso: str) -> Tuple[str, int]:
+    """
+    Canonical '+00:00' ISO text and epoch seconds for a UTC time (naive input
+    is UTC). Sub-second parts are dropped so the text and the integer agree.
+    """
+    dt = datetime.datetime.fromisoformat(datetime_utc_iso.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    dt = dt.astimezone(datetime.timezone.utc).replace(microsecond=0)
+    return dt.isoformat(), int(dt.timestamp())
+
+
+def notify_time(datetime_ts: int, lead_minutes: int) -> int:
+    """When to send a reminder of an event at datetime_ts with a lead (as the SQL computes notify_at)."""
+    return datetime_ts - 60 * lead_minutes
+
+
+def _utc(ts: int) -> datetime.datetime:
+    return datetime.datetime.fromtimestamp(ts, datetime.timezone.utc)
+
+
+# ---------- Schema migrations ----------
+# Each migration upgrades the schema by one version and PRAGMA user_version
+# records the last one applied, so an existing reminders.db is upgraded in
+# place on the next start. Append new migrations; never edit shipped ones.
+
+def _m001_create_reminders(conn: sqlite3.Connection) -> None:
+    conn.execute(
         """
         CREATE TABLE IF NOT EXISTS reminders (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -27,10 +355,182 @@ def init_db():
         )
         """
     )
-    conn.commit()
-    conn.close()
 
 
+def _m002_reminder_indexes(conn: sqlite3.Connection) -> None:
+    # /reminders: chat_id + status equality, then range/order on datetime_utc
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_reminders_chat_status_dt "
+        "ON reminders (chat_id, status, datetime_utc)"
+    )
+    # scheduler: only pending rows are ever scanned by time
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_reminders_pending_dt "
+        "ON reminders (datetime_utc) WHERE status = 'pending'"
+    )
+
+
+def _m003_reminder_version(conn: sqlite3.Connection) -> None:
+    # bumped on every write; lets caches key rendered text by (id, version)
+    conn.execute("ALTER TABLE reminders ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+
+
+def _m004_epoch_datetime(conn: sqlite3.Connection) -> None:
+    # integer epoch seconds: numeric range scans, smaller indexes, no parsing to dispatch.
+    # datetime_utc stays as the human-readable copy, rewritten in one canonical format.
+    conn.execute("ALTER TABLE reminders ADD COLUMN datetime_ts INTEGER")
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, datetime_utc FROM reminders WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, DB_BATCH_SIZE),
+        ).fetchall()
+        if not rows:
+            break
+        conn.executemany(
+            "UPDATE reminders SET datetime_utc = ?, datetime_ts = ? WHERE id = ?",
+            [(*normalize_datetime(text), rid) for rid, text in rows],
+        )
+        last_id = rows[-1][0]
+    conn.execute("DROP INDEX IF EXISTS idx_reminders_chat_status_dt")
+    conn.execute("DROP INDEX IF EXISTS idx_reminders_pending_dt")
+    conn.execute(
+        "CREATE INDEX idx_reminders_chat_status_ts ON reminders (chat_id, status, datetime_ts)"
+    )
+    conn.execute(
+        "CREATE INDEX idx_reminders_pending_ts ON reminders (datetime_ts) WHERE status = 'pending'"
+    )
+
+
+def _m005_recurrence(conn: sqlite3.Connection) -> None:
+    # first local occurrence and the index of the pending one (see recurrence.py);
+    # older repeating rows get an anchor the next time they advance
+    conn.execute("ALTER TABLE reminders ADD COLUMN anchor_local TEXT")
+    conn.execute("ALTER TABLE reminders ADD COLUMN occurrence INTEGER NOT NULL DEFAULT 0")
+
+
+def _m006_dispatch_leases(conn: sqlite3.Connection) -> None:
+    # multi-worker dispatch: which worker holds a due reminder, and until when
+    conn.execute("ALTER TABLE reminders ADD COLUMN claimed_by TEXT")
+    conn.execute("ALTER TABLE reminders ADD COLUMN lease_expires INTEGER")
+
+
+def _m007_delivery_ledger(conn: sqlite3.Connection) -> None:
+    # an occurrence is identified by the time it fell due: a snooze or the next
+    # repeat is a new one, a retry of the same send is not
+    conn.execute(
+        """
+        CREATE TABLE deliveries (
+            reminder_id INTEGER NOT NULL,
+            due_ts INTEGER NOT NULL,
+            recorded_at INTEGER NOT NULL,
+            PRIMARY KEY (reminder_id, due_ts)
+        ) WITHOUT ROWID
+        """
+    )
+
+
+def _m008_sync(conn: sqlite3.Connection) -> None:
+    # Mini App sync (sync_api.py): the WebApp's note, and sync_seq, the value of a
+    # database-wide change counter stamped on a row when it is inserted or its
+    # version bumps. Triggers keep it, so every write path (bulk import, dispatch,
+    # other worker processes) is covered; clients fetch rows with sync_seq above
+    # the last one they saw.
+    conn.execute("ALTER TABLE reminders ADD COLUMN note TEXT")
+    conn.execute("ALTER TABLE reminders ADD COLUMN sync_seq INTEGER NOT NULL DEFAULT 0")
+    conn.execute("UPDATE reminders SET sync_seq = id")
+    conn.execute("CREATE TABLE sync_clock (id INTEGER PRIMARY KEY CHECK (id = 1), seq INTEGER NOT NULL)")
+    conn.execute("INSERT INTO sync_clock (id, seq) SELECT 1, IFNULL(MAX(id), 0) FROM reminders")
+    conn.execute("CREATE INDEX idx_reminders_chat_sync ON reminders (chat_id, sync_seq)")
+    # inserts that bring their own sync_seq (bulk imports) skip the trigger
+    events = {
+        "insert": "INSERT ON reminders WHEN NEW.sync_seq = 0",
+        "update": "UPDATE OF version ON reminders",
+    }
+    for name, event in events.items():
+        conn.execute(
+            f"""
+            CREATE TRIGGER reminders_sync_{name} AFTER {event}
+            BEGIN
+                UPDATE sync_clock SET seq = seq + 1 WHERE id = 1;
+                UPDATE reminders SET sync_seq = (SELECT seq FROM sync_clock WHERE id = 1) WHERE id = NEW.id;
+            END
+            """
+        )
+
+
+def _m009_sync_floor(conn: sqlite3.Connection) -> None:
+    # retention deletes closed rows; clients that synced before the last one
+    # removed never saw it close (see get_sync_floor)
+    conn.execute("ALTER TABLE sync_clock ADD COLUMN archived_seq INTEGER NOT NULL DEFAULT 0")
+
+
+def _m010_notify_at(conn: sqlite3.Connection) -> None:
+    # the lead the Mini App asked for, and notify_at = datetime_ts - 60 * lead_minutes,
+    # the one key the dispatcher orders by; datetime_ts stays the event time users see
+    conn.execute("ALTER TABLE reminders ADD COLUMN lead_minutes INTEGER NOT NULL DEFAULT 0")
+    conn.execute("ALTER TABLE reminders ADD COLUMN notify_at INTEGER")
+    conn.execute("UPDATE reminders SET notify_at = datetime_ts")
+    conn.execute("DROP INDEX IF EXISTS idx_reminders_pending_ts")
+    conn.execute("CREATE INDEX idx_reminders_pending_notify ON reminders (notify_at) WHERE status = 'pending'")
+    # rows inserted without one (older code, hand-written SQL) get it filled in
+    conn.execute(
+        """
+        CREATE TRIGGER reminders_notify_at AFTER INSERT ON reminders WHEN NEW.notify_at IS NULL
+        BEGIN
+            UPDATE reminders SET notify_at = NEW.datetime_ts - 60 * NEW.lead_minutes WHERE id = NEW.id;
+        END
+        """
+    )
+
+
+def _m011_delivery_claims(conn: sqlite3.Connection) -> None:
+    # the ledger row is now taken before the send; sent = 0 until Telegram has
+    # accepted it, so a claim left by a killed worker can be told from a delivery
+    conn.execute("ALTER TABLE deliveries ADD COLUMN sent INTEGER NOT NULL DEFAULT 1")
+
+
+MIGRATIONS = [
+    _m001_create_reminders,
+    _m002_reminder_indexes,
+    _m003_reminder_version,
+    _m004_epoch_datetime,
+    _m005_recurrence,
+    _m006_dispatch_leases,
+    _m007_delivery_ledger,
+    _m008_sync,
+    _m009_sync_floor,
+    _m010_notify_at,
+    _m011_delivery_claims,
+]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Apply pending migrations, each in its own transaction. Returns the new version."""
+    version = schema_version(conn)
+    for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {target}")
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+        version = target
+    return version
+
+
+def init_db():
+    with writer() as conn:
+        migrate(conn)
+
+
+@timed(DB_SECONDS)
 def add_reminder(
     chat_id: int,
     title: str,
@@ -39,90 +539,400 @@ def add_reminder(
     priority: str,
     category: Optional[str],
     repeat: str,
+    anchor_local: Optional[str] = None,
+    note: Optional[str] = None,
+    lead_minutes: int = 0,
 ) -> int:
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO reminders (chat_id, title, datetime_utc, timezone, priority, category, repeat, status)
-        VALUES (?, ?, ?, ?, ?, ?, ?, 'pending')
-        """,
-        (chat_id, title, datetime_utc_iso, timezone, priority, category, repeat),
-    )
-    rid = cur.lastrowid
-    conn.commit()
-    conn.close()
-    return rid
+    """Insert a pending reminder of an event at datetime_utc_iso, sent lead_minutes before it."""
+    datetime_utc_iso, datetime_ts = normalize_datetime(datetime_utc_iso)
+    with writer() as conn:
+        cur = conn.execute(
+            _SQL_INSERT,
+            (chat_id, title, datetime_utc_iso, datetime_ts, timezone, priority, category, repeat, anchor_local, note,
+             lead_minutes, notify_time(datetime_ts, lead_minutes)),
+        )
+        return cur.lastrowid
 
 
+@timed(DB_SECONDS)
 def get_reminder(reminder_id: int) -> Optional[Dict[str, Any]]:
-    conn = get_conn()
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM reminders WHERE id = ?", (reminder_id,))
-    row = cur.fetchone()
-    conn.close()
+    with reader() as conn:
+        row = conn.execute(_SQL_GET, (reminder_id,)).fetchone()
     if not row:
         return None
     return dict(row)
 
 
+@timed(DB_SECONDS)
 def update_reminder_status(reminder_id: int, status: str) -> None:
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "UPDATE reminders SET status = ? WHERE id = ?",
-        (status, reminder_id),
-    )
-    conn.commit()
-    conn.close()
+    with writer() as conn:
+        conn.execute(_SQL_SET_STATUS, (status, reminder_id))
 
 
-def update_reminder_datetime(reminder_id: int, datetime_utc_iso: str) -> None:
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "UPDATE reminders SET datetime_utc = ? WHERE id = ?",
-        (datetime_utc_iso, reminder_id),
-    )
-    conn.commit()
-    conn.close()
+@timed(DB_SECONDS)
+def snooze_reminder(reminder_id: int, notify_at: int) -> bool:
+    """Send the reminder again at notify_at, keeping its event time; False if it was cancelled."""
+    with writer() as conn:
+        return conn.execute(_SQL_SNOOZE, (notify_at, reminder_id)).rowcount == 1
 
 
-def get_upcoming_reminders_for_chat(
+@timed(DB_SECONDS)
+def edit_reminder(
+    reminder_id: int,
     chat_id: int,
+    title: str,
+    datetime_utc_iso: str,
+    timezone: Optional[str],
+    priority: str,
+    category: Optional[str],
+    repeat: str,
+    anchor_local: Optional[str] = None,
+    note: Optional[str] = None,
+    lead_minutes: int = 0,
+    expected_version: Optional[int] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Replace the fields of chat_id's pending reminder and return the new row.
+    None if there is no such row, or (with expected_version) it has changed since.
+    """
+    datetime_utc_iso, datetime_ts = normalize_datetime(datetime_utc_iso)
+    with writer() as conn:
+        row = conn.execute(
+            _SQL_EDIT,
+            (title, datetime_utc_iso, datetime_ts, timezone, priority, category, repeat, anchor_local, note,
+             lead_minutes, notify_time(datetime_ts, lead_minutes), reminder_id, chat_id, expected_version,
+             expected_version),
+        ).fetchone()
+    return dict(row) if row else None
+
+
+@timed(DB_SECONDS)
+def cancel_reminder(
+    reminder_id: int, chat_id: int, expected_version: Optional[int] = None
+) -> Optional[Dict[str, Any]]:
+    """Cancel chat_id's pending reminder; None as for edit_reminder()."""
+    with writer() as conn:
+        row = conn.execute(_SQL_CANCEL, (reminder_id, chat_id, expected_version, expected_version)).fetchone()
+    return dict(row) if row else None
+
+
+@timed(DB_SECONDS)
+def get_reminder_changes(
+    chat_id: int, since: int, limit: int, include_closed: Optional[bool] = None
+) -> List[Dict[str, Any]]:
+    """
+    Reminders of a chat changed after sync_seq `since`, oldest change first.
+    A first sync (since=0, and the pages after it) lists pending rows only;
+    later syncs also return rows that were closed, so the client can drop them.
+    """
+    if include_closed is None:
+        include_closed = since > 0
+    with reader() as conn:
+        rows = conn.execute(_SQL_CHANGES, (chat_id, since, include_closed, limit)).fetchall()
+    return [dict(r) for r in rows]
+
+
+@timed(DB_SECONDS)
+def get_sync_floor() -> int:
+    """
+    The highest sync_seq among rows retention has removed. A delta sync from
+    below it could miss a row closing, so it has to be a full one instead.
+    """
+    with reader() as conn:
+        return conn.execute(_SQL_SYNC_FLOOR).fetchone()[0]
+
+
+@timed(DB_SECONDS)
+def get_reminder_page(
+    chat_id: int,
+    after: Optional[Tuple[int, int]] = None,
+    before: Optional[Tuple[int, int]] = None,
+    category: Optional[str] = None,
+    priority: Optional[str] = None,
     limit: int = 10,
 ) -> List[Dict[str, Any]]:
-    conn = get_conn()
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-    now_utc = datetime.datetime.utcnow().isoformat()
-    cur.execute(
-        """
-        SELECT * FROM reminders
-        WHERE chat_id = ? AND status = 'pending' AND datetime_utc >= ?
-        ORDER BY datetime_utc ASC
-        LIMIT ?
-        """,
-        (chat_id, now_utc, limit),
-    )
-    rows = cur.fetchall()
-    conn.close()
+    """
+    Up to `limit` upcoming reminders of a chat, soonest first: the first page,
+    the page after the (datetime_ts, id) key `after`, or the one before `before`.
+    """
+    now_ts = int(time.time())
+    filters = (category, category, priority, priority)
+    with reader() as conn:
+        if before is not None:
+            rows = conn.execute(_SQL_CHAT_PAGE_BEFORE, (chat_id, *before, now_ts, *filters, limit)).fetchall()
+            rows.reverse()
+        else:
+            # (now - 1, MAX_ID) sorts just before everything due from now on
+            start = after if after is not None else (now_ts - 1, MAX_ID)
+            rows = conn.execute(_SQL_CHAT_PAGE_AFTER, (chat_id, *start, *filters, limit)).fetchall()
     return [dict(r) for r in rows]
 
 
-def get_all_pending_reminders() -> List[Dict[str, Any]]:
-    conn = get_conn()
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-    now_utc = datetime.datetime.utcnow().isoformat()
-    cur.execute(
-        """
-        SELECT * FROM reminders
-        WHERE status = 'pending' AND datetime_utc >= ?
-        """,
-        (now_utc,),
-    )
-    rows = cur.fetchall()
-    conn.close()
+@timed(DB_SECONDS)
+def update_reminder_statuses(updates: Iterable[Tuple[str, int]]) -> None:
+    """Apply many (status, id) updates in one transaction."""
+    with writer() as conn:
+        conn.executemany(_SQL_SET_STATUS, updates)
+
+
+@timed(DB_SECONDS)
+def advance_recurrences(updates: Iterable[Tuple[str, int, str, int, int]]) -> None:
+    """
+    Move repeating reminders to their next occurrence:
+    (datetime_utc_iso, occurrence, anchor_local, id, current notify_at).
+    Rows no longer due at that notify_at were already moved and are left alone.
+    """
+    with writer() as conn:
+        conn.executemany(
+            _SQL_ADVANCE,
+            (
+                (*normalize_datetime(iso), occurrence, anchor_local, reminder_id, due_ts)
+                for iso, occurrence, anchor_local, reminder_id, due_ts in updates
+            ),
+        )
+
+
+@timed(DB_SECONDS)
+def finish_reminder(reminder_id: int, due_ts: int, status: str = "done") -> bool:
+    """Close the occurrence due (notify_at) at due_ts; False if the row has moved on since."""
+    with writer() as conn:
+        return conn.execute(_SQL_FINISH, (status, reminder_id, due_ts)).rowcount == 1
+
+
+@timed(DB_SECONDS)
+def delivery_confirmed(reminder_id: int, due_ts: int) -> bool:
+    """Whether the claimed occurrence due at due_ts is known to have reached Telegram."""
+    with reader() as conn:
+        row = conn.execute(_SQL_DELIVERY_SENT, (reminder_id, due_ts)).fetchone()
+    return bool(row and row[0])
+
+
+@timed(DB_SECONDS)
+def apply_writes(writes: List[Tuple[str, tuple]]) -> List[int]:
+    """Apply (kind, parameters) writes in order in one transaction; the row count of each."""
+    with writer() as conn:
+        return [conn.execute(_SQL_WRITES[kind], params).rowcount for kind, params in writes]
+
+
+class PendingRow(NamedTuple):
+    """Just what the dispatcher needs; a plain tuple, far smaller than a dict per row."""
+
+    id: int
+    chat_id: int
+    notify_at: int
+
+    @property
+    def notify_utc(self) -> datetime.datetime:
+        """Aware datetime, built only when someone asks for it."""
+        return _utc(self.notify_at)
+
+
+@timed(DB_SECONDS)
+def get_pending_batch(
+    after_ts: float,
+    after_id: int,
+    end_ts: float,
+    limit: int = DB_BATCH_SIZE,
+) -> List[PendingRow]:
+    """Next page of pending reminders after (notify_at, id) = (after_ts, after_id) and due by end_ts, soonest first."""
+    with reader() as conn:
+        rows = conn.execute(_SQL_PENDING_BATCH, (after_ts, after_id, end_ts, limit)).fetchall()
+    return [PendingRow(*r) for r in rows]
+
+
+
+class OverdueRow(NamedTuple):
+    id: int
+    chat_id: int
+    datetime_ts: int
+    notify_at: int
+    repeat: str
+    timezone: Optional[str]
+    anchor_local: Optional[str]
+    occurrence: int
+    lead_minutes: int
+
+    @property
+    def datetime_utc(self) -> datetime.datetime:
+        return _utc(self.datetime_ts)
+
+    @property
+    def notify_utc(self) -> datetime.datetime:
+        return _utc(self.notify_at)
+
+
+@timed(DB_SECONDS)
+def insert_reminders(rows: List[Tuple]) -> List[PendingRow]:
+    """
+    Insert a batch of pending reminders in one transaction:
+    (chat_id, title, datetime_utc_iso, datetime_ts, timezone, priority, category,
+    repeat, anchor_local, occurrence, lead_minutes, notify_at), datetime already
+    normalized.
+    Returns the new rows. Nobody else can insert while the transaction holds
+    the write lock, so the ids are the last len(rows) handed out. The batch
+    takes one range of sync_seq values instead of a trigger run per row.
+    """
+    if not rows:
+        return []
+    with writer() as conn:
+        last_seq = conn.execute(_SQL_RESERVE_SYNC_SEQ, (len(rows),)).fetchone()[0]
+        first_seq = last_seq - len(rows) + 1
+        conn.executemany(_SQL_IMPORT, ((*row, first_seq + i) for i, row in enumerate(rows)))
+        last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+    first_id = last_id - len(rows) + 1
+    return [PendingRow(first_id + i, row[0], row[11]) for i, row in enumerate(rows)]
+
+
+def iter_reminders(
+    chat_id: Optional[int] = None,
+    include_history: bool = False,
+    batch_size: int = DB_BATCH_SIZE,
+) -> Iterator[sqlite3.Row]:
+    """
+    Every reminder (of one chat, if given) in id order, for export. Pending
+    only unless include_history. Rows are fetched batch_size at a time from
+    one cursor, so memory stays flat however many there are.
+    """
+    with reader() as conn:
+        cur = conn.execute(_SQL_EXPORT, (chat_id, chat_id, include_history))
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+
+
+def iter_overdue_reminders(now_ts: float, batch_size: int = DB_BATCH_SIZE) -> Iterator[OverdueRow]:
+    """Pending reminders due (notify_at) at or before now_ts, oldest first, from a single index range scan."""
+    with reader() as conn:
+        cur = conn.execute(_SQL_OVERDUE, (now_ts,))
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                return
+            for r in rows:
+                yield OverdueRow(*r)
+
+
+@timed(DB_SECONDS)
+def claim_due_reminders(
+    worker_id: str,
+    now_ts: float,
+    lease_until: float,
+    limit: int,
+    shard: Optional[Tuple[int, int]] = None,
+    steal_before: float = 0,
+) -> List[OverdueRow]:
+    """
+    Lease up to `limit` pending reminders due by now_ts to worker_id, oldest
+    first. Rows already leased to a live worker are skipped; a lapsed lease
+    is up for grabs. With shard=(index, count) only chats with
+    chat_id mod count == index are taken, plus anything due before
+    steal_before (a shard whose worker is gone). One statement, so two
+    workers can never claim the same row.
+    """
+    with writer() as conn:
+        if shard is None:
+            rows = conn.execute(_SQL_CLAIM_DUE, (worker_id, lease_until, now_ts, now_ts, limit)).fetchall()
+        else:
+            index, count = shard
+            rows = conn.execute(
+                _SQL_CLAIM_DUE_SHARD,
+                (worker_id, lease_until, now_ts, now_ts, count, count, count, index, steal_before, limit),
+            ).fetchall()
+    return sorted((OverdueRow(*r) for r in rows), key=lambda r: r.notify_at)
+
+
+@timed(DB_SECONDS)
+def renew_leases(worker_id: str, reminder_ids: Iterable[int], lease_until: float) -> None:
+    """Extend worker_id's leases on reminders it is still working on."""
+    with writer() as conn:
+        conn.executemany(_SQL_RENEW_LEASE, ((lease_until, rid, worker_id) for rid in reminder_ids))
+
+
+# ---------- Retention ----------
+
+@timed(DB_SECONDS)
+def get_closed_batch(after_id: int, before_ts: int, limit: int = DB_BATCH_SIZE) -> List[Dict[str, Any]]:
+    """Next closed (done/cancelled/missed) reminders after after_id whose time is before before_ts."""
+    with reader() as conn:
+        rows = conn.execute(_SQL_CLOSED_BATCH, (after_id, before_ts, limit)).fetchall()
     return [dict(r) for r in rows]
+
+
+@timed(DB_SECONDS)
+def purge_reminders(reminder_ids: Iterable[int]) -> int:
+    """
+    Delete closed reminders and their delivery records in one transaction,
+    raising the sync floor past them. Returns how many rows were deleted.
+    """
+    deleted, floor = 0, 0
+    with writer() as conn:
+        for reminder_id in reminder_ids:
+            row = conn.execute(_SQL_PURGE, (reminder_id,)).fetchone()
+            if row is None:
+                continue
+            deleted += 1
+            floor = max(floor, row[0])
+            conn.execute(_SQL_PURGE_DELIVERIES, (reminder_id,))
+        if floor:
+            conn.execute(_SQL_RAISE_SYNC_FLOOR, (floor,))
+    return deleted
+
+
+@timed(DB_SECONDS)
+def prune_deliveries(
+    after: Tuple[int, int], before_ts: int, limit: int = DB_BATCH_SIZE
+) -> Tuple[Optional[Tuple[int, int]], int]:
+    """
+    Delete ledger records older than before_ts among the next `limit` after
+    the (reminder_id, due_ts) key `after`. Returns the key to continue from
+    (None at the end) and how many were deleted.
+    """
+    with writer() as conn:
+        rows = conn.execute(_SQL_DELIVERY_BATCH, (*after, limit)).fetchall()
+        stale = [(r[0], r[1]) for r in rows if r[2] < before_ts]
+        conn.executemany(_SQL_PRUNE_DELIVERY, stale)
+    next_key = (rows[-1][0], rows[-1][1]) if len(rows) == limit else None
+    return next_key, len(stale)
+
+
+@timed(DB_SECONDS)
+def database_size() -> Tuple[int, int]:
+    """(bytes in the main database, bytes of it on the free list)."""
+    with reader() as conn:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        pages = conn.execute("PRAGMA page_count").fetchone()[0]
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return pages * page_size, free * page_size
+
+
+@timed(DB_SECONDS)
+def enable_incremental_vacuum() -> bool:
+    """
+    Switch a database created without auto_vacuum to incremental mode. That
+    takes one full VACUUM, which rewrites the file and holds the write lock
+    while it runs. Returns False if it already was.
+    """
+    with writer() as conn:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return False
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+    return True
+
+
+@timed(DB_SECONDS)
+def incremental_vacuum(pages: int) -> int:
+    """Return up to `pages` free pages to the file system; the number still free after."""
+    with writer() as conn:
+        conn.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+        return conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+@timed(DB_SECONDS)
+def analyze() -> None:
+    """Refresh the planner statistics and fold the WAL back into the main file."""
+    with writer() as conn:
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
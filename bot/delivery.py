@@ -0,0 +1,236 @@
+"""
+Rate-limited outbound message queue.
+
+All reminder sends go through one DeliveryQueue so that bursts (e.g. the
+09:00 rush) stay under Telegram's flood limits instead of collecting 429s:
+
+- a global token bucket (~30 msg/s per bot),
+- a token bucket per chat (~1 msg/s sustained, small burst),
+- priority lanes so urgent reminders leave before normal/low ones,
+- RetryAfter handling that pauses the whole queue for the requested time,
+- a pool of worker tasks doing the actual sends.
+
+A message can carry a claim callback, awaited by the worker right before
+the first attempt (after its rate-limit wait). It returns the text and
+send_message arguments to use, or None to drop the message; bot.py takes
+the delivery ledger there, so a message still queued in a process that
+dies has not been claimed and is sent by whoever takes the reminder over.
+"""
+import asyncio
+import itertools
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+
+from metrics import counter, histogram
+
+logger = logging.getLogger(__name__)
+
+DELIVERY_WORKERS = int(os.getenv("DELIVERY_WORKERS", "8"))
+DELIVERY_GLOBAL_RATE = float(os.getenv("DELIVERY_GLOBAL_RATE", "30"))
+DELIVERY_CHAT_RATE = float(os.getenv("DELIVERY_CHAT_RATE", "1"))
+DELIVERY_CHAT_BURST = float(os.getenv("DELIVERY_CHAT_BURST", "3"))
+DELIVERY_MAX_ATTEMPTS = int(os.getenv("DELIVERY_MAX_ATTEMPTS", "5"))
+
+SEND_SECONDS = histogram("telegram_send_seconds", "Duration of sendMessage calls, whatever their outcome.")
+FLOOD_WAITS = counter("telegram_flood_waits_total", "sendMessage calls rejected with 429 (RetryAfter).")
+
+# () -> (text, send_message kwargs) to send, or None to drop the message
+Claim = Callable[[], Awaitable[Optional[Tuple[str, Dict[str, Any]]]]]
+
+# lower value = sent first; "catchup" carries overdue reminders replayed after downtime
+LANES = {"urgent": 0, "normal": 1, "low": 2, "catchup": 3}
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, now: float) -> float:
+        """Take a token if one is available. Returns 0, or seconds until one will be."""
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def reserve(self, now: float) -> float:
+        """Take a token unconditionally (may go into debt). Returns seconds to wait before using it."""
+        self._refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def pause(self, seconds: float, now: float) -> None:
+        """Drain the bucket so nothing is granted for `seconds` (used for RetryAfter)."""
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class _Outbound:
+    __slots__ = ("chat_id", "text", "kwargs", "future", "claim", "attempts")
+
+    def __init__(
+        self, chat_id: int, text: str, kwargs: Dict[str, Any], future: asyncio.Future, claim: Optional[Claim]
+    ) -> None:
+        self.chat_id = chat_id
+        self.text = text
+        self.kwargs = kwargs
+        self.future = future
+        self.claim = claim
+        self.attempts = 0
+
+
+class DeliveryQueue:
+    def __init__(
+        self,
+        bot=None,
+        workers: int = DELIVERY_WORKERS,
+        global_rate: float = DELIVERY_GLOBAL_RATE,
+        chat_rate: float = DELIVERY_CHAT_RATE,
+        chat_burst: float = DELIVERY_CHAT_BURST,
+        max_attempts: int = DELIVERY_MAX_ATTEMPTS,
+    ) -> None:
+        self.bot = bot
+        self.workers = workers
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_attempts = max_attempts
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats: Dict[int, TokenBucket] = {}
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._seq = itertools.count()
+        self._tasks: list = []
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    def __len__(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def start(self, bot=None) -> None:
+        if bot is not None:
+            self.bot = bot
+        self._queue = asyncio.PriorityQueue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def send(
+        self, chat_id: int, text: str, priority: str = "normal", claim: Optional[Claim] = None, **kwargs
+    ) -> asyncio.Future:
+        """
+        Queue a send_message call. The returned future resolves to the sent
+        Message, to None if the claim dropped it, or raises if delivery
+        finally failed (or the claim raised).
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._put(LANES.get(priority, LANES["normal"]), _Outbound(chat_id, text, kwargs, future, claim))
+        return future
+
+    def _put(self, lane: int, item: _Outbound) -> None:
+        self._queue.put_nowait((lane, next(self._seq), item))
+
+    def _chat_bucket(self, chat_id: int, now: float) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) > 50000:
+                # forget chats that have been quiet long enough to be full again
+                self._chats = {k: b for k, b in self._chats.items() if not b.is_full(now)}
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            lane, _, item = await self._queue.get()
+            now = time.monotonic()
+
+            chat_wait = self._chat_bucket(item.chat_id, now).try_take(now)
+            if chat_wait:
+                # this chat is over its rate: park the message, keep the worker busy with others
+                loop.call_later(chat_wait, self._put, lane, item)
+                continue
+
+            global_wait = self._global.reserve(now)
+            if global_wait:
+                await asyncio.sleep(global_wait)
+
+            if item.claim is not None and not await self._claim(item):
+                continue
+            await self._deliver(lane, item, loop)
+
+    async def _claim(self, item: _Outbound) -> bool:
+        """Run the message's claim once; False if it was dropped or failed."""
+        claim, item.claim = item.claim, None
+        try:
+            claimed = await claim()
+        except Exception as exc:
+            logger.exception("Claim for chat_id=%s failed, not sending", item.chat_id)
+            if not item.future.done():
+                item.future.set_exception(exc)
+            return False
+        if claimed is None:
+            if not item.future.done():
+                item.future.set_result(None)
+            return False
+        item.text, item.kwargs = claimed
+        return True
+
+    async def _deliver(self, lane: int, item: _Outbound, loop: asyncio.AbstractEventLoop) -> None:
+        item.attempts += 1
+        started = time.perf_counter()
+        try:
+            message = await self.bot.send_message(chat_id=item.chat_id, text=item.text, **item.kwargs)
+        except RetryAfter as exc:
+            FLOOD_WAITS.inc()
+            retry_after = float(exc.retry_after)
+            logger.warning("Flood limit hit for chat_id=%s, pausing sends for %.1fs", item.chat_id, retry_after)
+            self._global.pause(retry_after, time.monotonic())
+            self.retried += 1
+            self._put(lane, item)
+        except (Forbidden, BadRequest) as exc:
+            # user blocked the bot / chat gone / bad markup: retrying won't help
+            self.failed += 1
+            logger.warning("Dropping message for chat_id=%s: %s", item.chat_id, exc)
+            if not item.future.done():
+                item.future.set_exception(exc)
+        except NetworkError as exc:
+            if item.attempts >= self.max_attempts:
+                self.failed += 1
+                logger.error("Giving up on chat_id=%s after %d attempts: %s", item.chat_id, item.attempts, exc)
+                if not item.future.done():
+                    item.future.set_exception(exc)
+            else:
+                self.retried += 1
+                loop.call_later(min(2 ** item.attempts, 30), self._put, lane, item)
+        except Exception as exc:
+            self.failed += 1
+            logger.exception("Unexpected error sending to chat_id=%s", item.chat_id)
+            if not item.future.done():
+                item.future.set_exception(exc)
+        else:
+            self.sent += 1
+            if not item.future.done():
+                item.future.set_result(message)
+        finally:
+            SEND_SECONDS.observe(time.perf_counter() - started)
@@ -0,0 +1,124 @@
+"""
+Per-chat coalescing of reminders that fall due together.
+
+The dispatchers fire every due reminder on its own, so a chat with a dozen
+reminders at 09:00 used to get a dozen messages (two each for urgent ones),
+spending the per-chat rate limit and buzzing the phone a dozen times.
+DigestCoalescer sits between a dispatcher and the send: a reminder that
+fires for a chat opens a batch for DIGEST_WINDOW_SECONDS, everything else
+firing for that chat meanwhile joins it, and the batch goes out through one
+callback, which sends a single digest message. A batch is sent early once
+it holds DIGEST_MAX_ITEMS reminders (Telegram caps text length and buttons).
+
+fire() is a drop-in FireCallback: it resolves when its batch has been
+handled, and raises what the batch raised, so the leased dispatcher's
+in-flight tracking and lease renewal work as before. Catch-up sends are
+batched separately from live ones.
+
+With the default DIGEST_WINDOW_SECONDS=0 a batch holds what the dispatcher
+popped for the chat in one tick: reminders set for the same minute, which
+is how they are entered, are merged without delaying any of them. A window
+of a few seconds also merges near misses, at the cost of making every
+reminder up to that much later.
+"""
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from telegram.ext import ContextTypes
+
+from metrics import counter, histogram
+
+logger = logging.getLogger(__name__)
+
+DIGEST_WINDOW_SECONDS = float(os.getenv("DIGEST_WINDOW_SECONDS", "0"))
+DIGEST_MAX_ITEMS = int(os.getenv("DIGEST_MAX_ITEMS", "10"))
+
+# (context, chat_id, reminder_ids, catchup) -> messages saved by sending them together
+DigestCallback = Callable[[ContextTypes.DEFAULT_TYPE, int, List[int], bool], Awaitable[int]]
+
+DIGEST_SIZE = histogram(
+    "digest_reminders", "Reminders per coalesced batch.", buckets=(1, 2, 3, 5, 10, 20, 50)
+)
+MESSAGES_SAVED = histogram(
+    "digest_messages_saved",
+    "Messages a batch saved against one message per reminder (two for urgent ones).",
+    buckets=(0, 1, 2, 5, 10, 20, 50),
+)
+MESSAGES_SAVED_TOTAL = counter("digest_messages_saved_total", "Messages saved by coalescing.")
+
+
+class _Batch:
+    __slots__ = ("reminder_ids", "done")
+
+    def __init__(self, done: asyncio.Future) -> None:
+        self.reminder_ids: List[int] = []
+        self.done = done
+
+
+class DigestCoalescer:
+    def __init__(
+        self,
+        send: DigestCallback,
+        window_seconds: float = DIGEST_WINDOW_SECONDS,
+        max_items: int = DIGEST_MAX_ITEMS,
+    ) -> None:
+        self._send = send
+        self.window_seconds = window_seconds
+        self.max_items = max(1, max_items)
+        self._open: Dict[Tuple[int, bool], _Batch] = {}
+        self.batches = 0
+        self.reminders = 0
+        self.saved = 0
+
+    def __len__(self) -> int:
+        """Reminders waiting in open batches."""
+        return sum(len(batch.reminder_ids) for batch in self._open.values())
+
+    async def fire(self, context: ContextTypes.DEFAULT_TYPE, reminder_id: int, chat_id: int) -> None:
+        await self._add(context, reminder_id, chat_id, False)
+
+    async def catchup(self, context: ContextTypes.DEFAULT_TYPE, reminder_id: int, chat_id: int) -> None:
+        await self._add(context, reminder_id, chat_id, True)
+
+    async def _add(self, context: ContextTypes.DEFAULT_TYPE, reminder_id: int, chat_id: int, catchup: bool) -> None:
+        key = (chat_id, catchup)
+        batch = self._open.get(key)
+        if batch is None:
+            loop = asyncio.get_running_loop()
+            batch = self._open[key] = _Batch(loop.create_future())
+            loop.call_later(self.window_seconds, self._close, context, key, batch)
+        batch.reminder_ids.append(reminder_id)
+        if len(batch.reminder_ids) >= self.max_items:
+            self._close(context, key, batch)
+        # shielded: one cancelled waiter must not cancel the batch for the others
+        await asyncio.shield(batch.done)
+
+    def _close(self, context: ContextTypes.DEFAULT_TYPE, key: Tuple[int, bool], batch: _Batch) -> None:
+        if self._open.get(key) is not batch:
+            return  # already closed because it filled up
+        del self._open[key]
+        asyncio.get_running_loop().create_task(self._run(context, key, batch))
+
+    async def _run(self, context: ContextTypes.DEFAULT_TYPE, key: Tuple[int, bool], batch: _Batch) -> None:
+        chat_id, catchup = key
+        try:
+            saved = await self._send(context, chat_id, batch.reminder_ids, catchup)
+        except Exception as exc:
+            batch.done.set_exception(exc)
+            # marked retrieved: the waiters re-raise it, there is nothing else to report
+            batch.done.exception()
+            return
+        except BaseException:
+            batch.done.cancel()
+            raise
+        self.batches += 1
+        self.reminders += len(batch.reminder_ids)
+        self.saved += saved
+        DIGEST_SIZE.observe(len(batch.reminder_ids))
+        MESSAGES_SAVED.observe(saved)
+        MESSAGES_SAVED_TOTAL.inc(saved)
+        if len(batch.reminder_ids) > 1:
+            logger.debug("Chat %s: %d reminders in one message", chat_id, len(batch.reminder_ids))
+        batch.done.set_result(None)
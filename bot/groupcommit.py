@@ -0,0 +1,205 @@
+"""
+Group commit for the small writes every fired reminder and button press makes.
+
+Closing an occurrence, moving a repeat on, snoozing, cancelling and
+claiming a delivery are each a one-row UPDATE/INSERT, and each used to be
+its own transaction and WAL commit. In a burst minute that is thousands of
+commits queued on the single writer thread. GroupCommitter queues these
+writes instead and applies everything queued in one transaction (see
+db.apply_writes) once DB_GROUP_COMMIT_MS has passed since the first one or
+DB_GROUP_COMMIT_MAX are waiting. Writes to the same row keep their order,
+and each still gets its own row count back.
+
+DB_WRITE_DURABILITY picks when a caller resumes:
+
+- group (default): once the transaction holding its write has committed,
+  so everything read afterwards sees it, as before, and a crash loses
+  nothing that was acknowledged. Callers wait up to DB_GROUP_COMMIT_MS more.
+- async: writes whose result nobody needs return as soon as they are
+  queued. Reads of a reminder with a queued write flush first
+  (read-your-writes), and shutdown flushes the rest; a crash can lose the
+  last DB_GROUP_COMMIT_MS of them. Those writes are all conditional or
+  idempotent, so the worst case is a reminder sent again after restart.
+- sync: no queue, one transaction per write.
+"""
+import asyncio
+import logging
+import os
+from collections import Counter
+from typing import Awaitable, Callable, Collection, List, Optional, Set, Tuple
+
+from metrics import histogram
+
+logger = logging.getLogger(__name__)
+
+DB_WRITE_DURABILITY = os.getenv("DB_WRITE_DURABILITY", "group").lower()  # group / async / sync
+DB_GROUP_COMMIT_MS = float(os.getenv("DB_GROUP_COMMIT_MS", "5"))
+DB_GROUP_COMMIT_MAX = int(os.getenv("DB_GROUP_COMMIT_MAX", "500"))
+
+if DB_WRITE_DURABILITY not in ("group", "async", "sync"):
+    raise RuntimeError(f"Unknown DB_WRITE_DURABILITY {DB_WRITE_DURABILITY!r}, expected group, async or sync.")
+
+GROUP_SIZE = histogram(
+    "db_group_commit_writes", "Writes applied per group commit.", buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+
+# (kind, SQL parameters), see db.apply_writes
+Write = Tuple[str, tuple]
+ApplyCallback = Callable[[List[Write]], Awaitable[List[int]]]
+# reminder id of a write that failed or may not have been applied
+FailureCallback = Callable[[int], None]
+
+
+def _resolve(future: asyncio.Future, count: int) -> None:
+    # a caller that gave up (cancelled) has already completed its future
+    if not future.done():
+        future.set_result(count)
+
+
+class _Pending:
+    __slots__ = ("write", "reminder_id", "future")
+
+    def __init__(self, write: Write, reminder_id: int, future: asyncio.Future) -> None:
+        self.write = write
+        self.reminder_id = reminder_id
+        self.future = future
+
+
+class GroupCommitter:
+    def __init__(
+        self,
+        apply: ApplyCallback,
+        durability: str = DB_WRITE_DURABILITY,
+        delay_ms: float = DB_GROUP_COMMIT_MS,
+        max_writes: int = DB_GROUP_COMMIT_MAX,
+        on_failure: Optional[FailureCallback] = None,
+    ) -> None:
+        self._apply = apply
+        self._on_failure = on_failure
+        self.durability = durability
+        self.delay = delay_ms / 1000
+        self.max_writes = max(1, max_writes)
+        self._queue: List[_Pending] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # reminder id -> writes queued or being applied
+        self._dirty: "Counter[int]" = Counter()
+        self._inflight: Set[asyncio.Task] = set()
+        self.commits = 0
+        self.writes = 0
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    async def write(self, write: Write, reminder_id: int, wait: bool = True) -> int:
+        """
+        Queue one write and return its row count once committed. With
+        durability=async and wait=False, return -1 as soon as it is queued.
+        """
+        if self.durability == "sync":
+            try:
+                return (await self._apply([write]))[0]
+            except BaseException:
+                self._failed(reminder_id)
+                raise
+        future = self.enqueue(write, reminder_id)
+        if self.durability == "async" and not wait:
+            return -1
+        return await future
+
+    async def write_many(self, writes: Collection[Tuple[Write, int]], wait: bool = True) -> None:
+        """Queue (write, reminder_id) pairs, e.g. a batch of recurrences."""
+        if not writes:
+            return
+        if self.durability == "sync":
+            try:
+                await self._apply([w for w, _ in writes])
+            except BaseException:
+                for _, reminder_id in writes:
+                    self._failed(reminder_id)
+                raise
+            return
+        futures = [self.enqueue(w, reminder_id) for w, reminder_id in writes]
+        if self.durability == "async" and not wait:
+            return
+        await asyncio.gather(*futures)
+
+    def enqueue(self, write: Write, reminder_id: int) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.append(_Pending(write, reminder_id, future))
+        self._dirty[reminder_id] += 1
+        if len(self._queue) >= self.max_writes:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.delay, self._start_flush)
+        return future
+
+    def is_dirty(self, reminder_id: int) -> bool:
+        return reminder_id in self._dirty
+
+    @property
+    def pending(self) -> bool:
+        return bool(self._dirty)
+
+    async def settle(self, reminder_id: Optional[int] = None) -> None:
+        """Wait until queued writes (only needed if reminder_id has one) are committed."""
+        if reminder_id is not None and reminder_id not in self._dirty:
+            return
+        if self._queue:
+            self._start_flush()
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+    async def flush(self) -> None:
+        """Commit everything queued (shutdown)."""
+        while self._queue or self._inflight:
+            await self.settle()
+
+    def _start_flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._queue:
+            return
+        batch, self._queue = self._queue, []
+        task = asyncio.get_running_loop().create_task(self._commit(batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _commit(self, batch: List[_Pending]) -> None:
+        try:
+            try:
+                counts = await self._apply([p.write for p in batch])
+            except Exception:
+                # one bad write must not fail the rest: apply them one by one
+                logger.exception("Group commit of %d writes failed, retrying them one at a time", len(batch))
+                for pending in batch:
+                    try:
+                        count = (await self._apply([pending.write]))[0]
+                    except Exception as exc:
+                        logger.exception("Write %s failed", pending.write[0])
+                        self._failed(pending.reminder_id)
+                        if not pending.future.done():
+                            pending.future.set_exception(exc)
+                            pending.future.exception()  # waiters re-raise it; nobody else needs to
+                    else:
+                        _resolve(pending.future, count)
+                return
+            self.commits += 1
+            self.writes += len(batch)
+            GROUP_SIZE.observe(len(batch))
+            for pending, count in zip(batch, counts):
+                _resolve(pending.future, count)
+        finally:
+            for pending in batch:
+                if not pending.future.done():
+                    # interrupted: the write may or may not have been applied
+                    pending.future.cancel()
+                    self._failed(pending.reminder_id)
+                self._dirty[pending.reminder_id] -= 1
+                if not self._dirty[pending.reminder_id]:
+                    del self._dirty[pending.reminder_id]
+
+    def _failed(self, reminder_id: int) -> None:
+        if self._on_failure is not None:
+            self._on_failure(reminder_id)
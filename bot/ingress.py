@@ -0,0 +1,149 @@
+"""
+How updates get into the Application: long polling or an embedded webhook
+server, both feeding a per-chat ordered update processor.
+
+Webhook mode uses python-telegram-bot's own webhook server (tornado, from
+the [webhooks] extra), which accepts many updates concurrently; the
+processor then runs updates from different chats in parallel while keeping
+each chat's updates in order, so e.g. a snooze and a "mark as done" on the
+same reminder are never applied out of order.
+"""
+import asyncio
+import logging
+import os
+import signal
+from collections import deque
+from typing import Any, Awaitable, Deque, Dict, Optional, Set, Tuple
+
+from telegram import Update
+from telegram.ext import Application, BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()  # polling / webhook / none
+# optional Bot API endpoint (local Bot API server, or a fake one in benchmarks)
+BOT_API_URL = os.getenv("BOT_API_URL")
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "64"))
+
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # public base URL Telegram posts to
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "100"))
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """
+    Up to max_concurrent_updates at once, but strictly sequential within a chat.
+
+    Each chat's updates wait in a FIFO queue drained by one task per chat,
+    which takes one of the global slots only for the update it is running.
+    A chat with a backlog (a button storm) therefore holds at most one slot
+    and never stalls the other chats.
+    """
+
+    def __init__(self, max_concurrent_updates: int) -> None:
+        super().__init__(max_concurrent_updates)
+        # chat_id -> updates waiting for their turn; present while the chat's drain task runs
+        self._queues: Dict[int, Deque[Tuple[object, Awaitable[Any], "asyncio.Future[None]"]]] = {}
+        self._drains: Set["asyncio.Task[None]"] = set()
+
+    async def process_update(self, update: object, coroutine: Awaitable[Any]) -> None:  # type: ignore[misc]
+        # replaces the base class's, which takes the slot before a chat's turn has come
+        chat = update.effective_chat if isinstance(update, Update) else None
+        if chat is None:
+            async with self._semaphore:
+                await self.do_process_update(update, coroutine)
+            return
+
+        done: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        queue = self._queues.get(chat.id)
+        if queue is None:
+            queue = self._queues[chat.id] = deque()
+            task = asyncio.create_task(self._drain(chat.id, queue))
+            self._drains.add(task)
+            task.add_done_callback(self._drains.discard)
+        queue.append((update, coroutine, done))
+        # the Application counts the update as handled when this returns
+        await done
+
+    async def _drain(self, chat_id: int, queue: Deque) -> None:
+        while queue:
+            update, coroutine, done = queue.popleft()
+            try:
+                async with self._semaphore:
+                    await self.do_process_update(update, coroutine)
+            except Exception as exc:
+                if not done.done():
+                    done.set_exception(exc)
+            else:
+                if not done.done():
+                    done.set_result(None)
+        del self._queues[chat_id]
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        await coroutine
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+
+def configure(builder) -> Any:
+    """Apply ingestion settings to an ApplicationBuilder."""
+    if BOT_API_URL:
+        # a local Bot API server serves files from /file/bot<token>/ next to /bot<token>/
+        builder = builder.base_url(BOT_API_URL).base_file_url(BOT_API_URL.rsplit("/bot", 1)[0] + "/file/bot")
+    if CONCURRENT_UPDATES > 1:
+        builder = builder.concurrent_updates(PerChatUpdateProcessor(CONCURRENT_UPDATES))
+    return builder
+
+
+def run(app: Application, mode: Optional[str] = None) -> None:
+    """Start receiving updates in the configured mode (blocks until stopped)."""
+    mode = (mode or BOT_MODE).lower()
+    if mode == "webhook":
+        if not WEBHOOK_URL:
+            raise RuntimeError("WEBHOOK_URL is not set. Add it to your .env file to use BOT_MODE=webhook.")
+        url = f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}"
+        logger.info("Bot is starting run_webhook() on %s:%s, public url %s", WEBHOOK_LISTEN, WEBHOOK_PORT, url)
+        app.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=url,
+            secret_token=WEBHOOK_SECRET,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+        )
+    elif mode == "polling":
+        logger.info("Bot is starting run_polling()...")
+        app.run_polling()
+    elif mode == "none":
+        # extra dispatch workers (DISPATCH_MODE=leased): only one process may take updates
+        logger.info("Bot is starting without update ingestion (dispatch only)...")
+        asyncio.run(_run_without_updates(app))
+    else:
+        raise RuntimeError(f"Unknown BOT_MODE {mode!r}, expected 'polling', 'webhook' or 'none'.")
+
+
+async def _run_without_updates(app: Application) -> None:
+    """Application lifecycle as run_polling() drives it, minus the updater."""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    await app.start()
+    try:
+        await stop.wait()
+    finally:
+        await app.stop()
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
@@ -0,0 +1,160 @@
+"""
+Leased dispatch, for running several bot worker processes on one database.
+
+With DISPATCH_MODE=leased the database, not process memory, decides who
+sends what. Every tick a worker claims due reminders with one atomic UPDATE
+that stamps them with its id (claimed_by) and a lease deadline
+(lease_expires); a row held by a live lease is invisible to everyone else.
+Handling the reminder (done / next occurrence / snooze) clears the claim.
+
+- Leases on reminders still being sent are renewed every tick, so a slow
+  send queue does not let another worker take them over.
+- A worker that dies stops renewing; its leases lapse after
+  DISPATCH_LEASE_SECONDS and the rows are claimed again elsewhere. A send
+  that failed is retried the same way.
+- DISPATCH_STRATEGY=steal (default): any worker takes any due row.
+  DISPATCH_STRATEGY=shard: worker DISPATCH_WORKER_INDEX of DISPATCH_WORKERS
+  only takes chats with chat_id mod DISPATCH_WORKERS == its index, which
+  keeps a chat's reminders on one worker, and steals from other shards
+  only once a row is DISPATCH_STEAL_AFTER seconds late.
+- Rows claimed more than DISPATCH_LATE_SECONDS after they fell due (every
+  worker was down) go through recovery: catch-up lane, roll forward or
+  missed. There is no separate startup scan.
+
+A reminder is sent at most once even when two workers end up holding it
+(a lapsed lease, a killed worker): the send is gated by the delivery
+ledger row, claimed right before the message goes out (ledger.py), and a
+takeover finds it. Claims still queued in a dead worker were never taken,
+so they are sent by the survivors.
+
+Only the worker that takes updates (BOT_MODE other than none) serves the
+sync API. Each worker has its own metrics, served on METRICS_PORT plus its
+DISPATCH_WORKER_INDEX.
+"""
+import datetime
+import logging
+import os
+import socket
+import time
+from typing import List, Optional, Set, Tuple
+
+from telegram.ext import ContextTypes
+
+from async_db import claim_due_reminders, renew_leases
+from db import OverdueRow
+from recovery import CatchupCallback, recover_missed
+from scheduler import SCHEDULER_TICK_SECONDS, FireCallback
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_MODE = os.getenv("DISPATCH_MODE", "single").lower()  # single / leased
+DISPATCH_STRATEGY = os.getenv("DISPATCH_STRATEGY", "steal").lower()  # steal / shard
+DISPATCH_WORKERS = int(os.getenv("DISPATCH_WORKERS", "1"))
+DISPATCH_WORKER_INDEX = int(os.getenv("DISPATCH_WORKER_INDEX", "0"))
+DISPATCH_WORKER_ID = os.getenv("DISPATCH_WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}"
+DISPATCH_LEASE_SECONDS = int(os.getenv("DISPATCH_LEASE_SECONDS", "60"))
+DISPATCH_CLAIM_BATCH = int(os.getenv("DISPATCH_CLAIM_BATCH", "200"))
+# stop claiming while this many claimed reminders are still being sent
+DISPATCH_MAX_INFLIGHT = int(os.getenv("DISPATCH_MAX_INFLIGHT", "1000"))
+DISPATCH_STEAL_AFTER = int(os.getenv("DISPATCH_STEAL_AFTER", "30"))
+DISPATCH_LATE_SECONDS = int(os.getenv("DISPATCH_LATE_SECONDS", "60"))
+
+
+class LeasedDispatcher:
+    """Drop-in for ReminderDispatcher when several workers share the database."""
+
+    def __init__(
+        self,
+        fire: FireCallback,
+        catchup: CatchupCallback,
+        worker_id: str = DISPATCH_WORKER_ID,
+        strategy: str = DISPATCH_STRATEGY,
+        shard: Optional[Tuple[int, int]] = None,
+        tick_seconds: float = SCHEDULER_TICK_SECONDS,
+        lease_seconds: int = DISPATCH_LEASE_SECONDS,
+    ) -> None:
+        if strategy not in ("steal", "shard"):
+            raise RuntimeError(f"Unknown DISPATCH_STRATEGY {strategy!r}, expected 'steal' or 'shard'.")
+        if strategy == "shard" and shard is None:
+            shard = (DISPATCH_WORKER_INDEX, DISPATCH_WORKERS)
+        self._fire = fire
+        self._catchup = catchup
+        self.worker_id = worker_id
+        self.shard = shard if strategy == "shard" else None
+        self.tick_seconds = tick_seconds
+        self.lease_seconds = lease_seconds
+        self._inflight: Set[int] = set()
+        self.claimed = 0
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    # the database is the schedule: new, snoozed and repeating reminders are
+    # picked up by the next claim, and a finished one is simply not pending
+    def schedule(self, reminder_id: int, chat_id: int, due_ts: float) -> bool:
+        return True
+
+    def schedule_many(self, rows) -> int:
+        return 0
+
+    def cancel(self, reminder_id: int) -> None:
+        pass
+
+    async def _run(self, fn, context: ContextTypes.DEFAULT_TYPE, reminder_id: int, chat_id: int) -> None:
+        try:
+            await fn(context, reminder_id, chat_id)
+        finally:
+            # handled (claim cleared by the write) or failed (lease left to lapse, then retried)
+            self._inflight.discard(reminder_id)
+
+    async def _fire_tracked(self, context, reminder_id: int, chat_id: int) -> None:
+        await self._run(self._fire, context, reminder_id, chat_id)
+
+    async def _catchup_tracked(self, context, reminder_id: int, chat_id: int) -> None:
+        await self._run(self._catchup, context, reminder_id, chat_id)
+
+    async def _tick_job(self, context: ContextTypes.DEFAULT_TYPE) -> None:
+        now = time.time()
+        lease_until = int(now) + self.lease_seconds
+        if self._inflight:
+            await renew_leases(self.worker_id, list(self._inflight), lease_until)
+
+        late = []
+        while len(self._inflight) < DISPATCH_MAX_INFLIGHT:
+            limit = min(DISPATCH_CLAIM_BATCH, DISPATCH_MAX_INFLIGHT - len(self._inflight))
+            rows = await claim_due_reminders(
+                self.worker_id, now, lease_until, limit, self.shard, now - DISPATCH_STEAL_AFTER
+            )
+            self.claimed += len(rows)
+            for row in rows:
+                self._inflight.add(row.id)
+                if row.notify_at < now - DISPATCH_LATE_SECONDS:
+                    late.append(row)
+                else:
+                    context.application.create_task(self._fire_tracked(context, row.id, row.chat_id))
+            if len(rows) < limit:
+                break
+
+        if late:
+            context.application.create_task(self._recover(context, late, now))
+
+    async def _recover(self, context: ContextTypes.DEFAULT_TYPE, late: List[OverdueRow], now: float) -> None:
+        cutoff = datetime.datetime.fromtimestamp(now, datetime.timezone.utc)
+        try:
+            await recover_missed(context, self._catchup_tracked, self, cutoff, overdue=late)
+        finally:
+            # rolled forward / marked missed rows were released by those writes
+            self._inflight.difference_update(row.id for row in late)
+
+    async def start(self, job_queue, since_ts: Optional[float] = None, lazy: bool = True) -> None:
+        """Start claiming. since_ts/lazy are accepted for parity with ReminderDispatcher."""
+        logger.info(
+            "Leased dispatch as worker %s (strategy=%s shard=%s lease=%ss)",
+            self.worker_id,
+            "shard" if self.shard else "steal",
+            self.shard,
+            self.lease_seconds,
+        )
+        job_queue.run_repeating(
+            self._tick_job, interval=self.tick_seconds, first=0, name="dispatcher-claim"
+        )
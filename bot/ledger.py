@@ -0,0 +1,72 @@
+"""
+Delivery ledger: at most one send per reminder occurrence.
+
+Every occurrence is identified by (reminder_id, due_ts), and its row in the
+deliveries table is taken with INSERT OR IGNORE right before the message
+goes to Telegram (see DeliveryQueue's claim). Only the attempt that
+inserted the row sends. A retry after a crash, a second worker whose lease
+on the same row lapsed, or a recovery pass racing the tick finds the row
+taken and is counted as a suppressed duplicate, instead of costing another
+message and Telegram quota.
+
+The row is marked sent once Telegram accepted the message, and deleted
+again if the send finally failed, so that attempt is retried later. A
+message still queued in a process that dies was never claimed and is sent
+by whoever takes the reminder over. What is left is the instant between
+the claim and Telegram's answer: a worker killed then leaves a claim with
+sent = 0, which is not sent again, so that message is delivered once or,
+if the request never reached Telegram, not at all. The attempt that finds
+such a claim logs a warning and counts it in `unconfirmed`.
+"""
+import asyncio
+import logging
+from typing import Dict, List
+
+from async_db import claim_delivery, confirm_delivery, delivery_confirmed, release_delivery
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryLedger:
+    def __init__(self) -> None:
+        self.recorded = 0
+        # attempts skipped because another attempt had claimed the occurrence
+        self.suppressed = 0
+        # claims given back because the send failed
+        self.released = 0
+        # suppressed occurrences whose claim was never confirmed (sending elsewhere, or lost with its worker)
+        self.unconfirmed = 0
+
+    async def claim(self, reminders: List[Dict]) -> List[Dict]:
+        """Claim the occurrences of `reminders` due at notify_at; the ones this attempt may send."""
+        # one group commit for all of them
+        won = await asyncio.gather(*(claim_delivery(r["id"], r["notify_at"]) for r in reminders))
+        claimed = []
+        for reminder, ok in zip(reminders, won):
+            if ok:
+                claimed.append(reminder)
+                continue
+            self.suppressed += 1
+            logger.info(
+                "Reminder id=%s occurrence due at %s was already claimed, suppressing duplicate (total %d)",
+                reminder["id"],
+                reminder["notify_at"],
+                self.suppressed,
+            )
+            if not await delivery_confirmed(reminder["id"], reminder["notify_at"]):
+                self.unconfirmed += 1
+                logger.warning(
+                    "Reminder id=%s occurrence due at %s is claimed but not confirmed: another attempt is "
+                    "still sending it, or died before Telegram answered and it may not have been delivered",
+                    reminder["id"],
+                    reminder["notify_at"],
+                )
+        return claimed
+
+    async def confirm(self, reminders: List[Dict]) -> None:
+        await asyncio.gather(*(confirm_delivery(r["id"], r["notify_at"]) for r in reminders))
+        self.recorded += len(reminders)
+
+    async def release(self, reminders: List[Dict]) -> None:
+        await asyncio.gather(*(release_delivery(r["id"], r["notify_at"]) for r in reminders))
+        self.released += len(reminders)
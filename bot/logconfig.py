@@ -0,0 +1,146 @@
+"""
+Logging setup: records go through an in-process queue to a listener thread.
+
+Handlers only enqueue the LogRecord; formatting (including % arguments and
+lazy() payloads) and the write to stderr or LOG_FILE happen on the
+listener thread, off the event loop. Levels are per logger name
+("category"): the module loggers plus the per-update categories used by
+bot.py:
+
+- updates:  one line per command/update (and the LOG_DEBUG_UPDATES dump),
+- webapp:   Mini App submissions; the raw payload is DEBUG only,
+- dispatch: reminder fires, repeats and (re)scheduling.
+
+    LOG_LEVEL=INFO                               root level
+    LOG_LEVELS=dispatch=WARNING,scheduler=DEBUG  per-category overrides
+    LOG_SAMPLE=updates=0.01                      keep 1 in 100 records below WARNING
+    LOG_FORMAT=text|json                         json: one object per line, extra= fields included
+    LOG_FILE=                                    default stderr
+"""
+import atexit
+import datetime
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Callable, Dict, Optional, TextIO
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_SAMPLE = os.getenv("LOG_SAMPLE", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_FILE = os.getenv("LOG_FILE") or None
+# register the catch-all handler that logs every incoming update
+LOG_DEBUG_UPDATES = os.getenv("LOG_DEBUG_UPDATES", "0") == "1"
+
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+# httpx logs every Bot API request at INFO, i.e. at least one line per update
+DEFAULT_LEVELS = {"httpx": "WARNING", "apscheduler": "WARNING"}
+
+# attributes every LogRecord has; anything else came from extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class lazy:
+    """A log argument built only if the record is actually formatted: lazy(update.to_json)."""
+
+    __slots__ = ("fn", "args")
+
+    def __init__(self, fn: Callable[..., Any], *args: Any) -> None:
+        self.fn = fn
+        self.args = args
+
+    def __str__(self) -> str:
+        return str(self.fn(*self.args))
+
+    __repr__ = __str__
+
+
+class SampleFilter(logging.Filter):
+    """Pass one in every round(1/rate) records below WARNING; warnings and errors always pass."""
+
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self._seen = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        if not self.every:
+            return False
+        with self._lock:
+            self._seen += 1
+            return (self._seen - 1) % self.every == 0
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        out: Dict[str, Any] = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                out[key] = value
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, default=str, ensure_ascii=False)
+
+
+class _LocalQueueHandler(QueueHandler):
+    # The queue never leaves the process, so skip QueueHandler.prepare(), which
+    # formats the message on the caller's thread to make the record picklable.
+    # Arguments are formatted later on the listener thread; pass immutable
+    # values (or lazy()) rather than objects that change right after the call.
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def _pairs(spec: str) -> Dict[str, str]:
+    """'a=1,b=2' -> {'a': '1', 'b': '2'}."""
+    pairs = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, sep, value = item.partition("=")
+        if not sep:
+            raise RuntimeError(f"Bad logging setting {item!r}, expected name=value.")
+        pairs[name.strip()] = value.strip()
+    return pairs
+
+
+def setup_logging(
+    level: str = LOG_LEVEL,
+    levels: str = LOG_LEVELS,
+    sample: str = LOG_SAMPLE,
+    fmt: str = LOG_FORMAT,
+    stream: Optional[TextIO] = None,
+) -> QueueListener:
+    """Route all logging through a queue listener; call once at startup."""
+    if LOG_FILE and stream is None:
+        handler: logging.Handler = logging.FileHandler(LOG_FILE, encoding="utf-8")
+    else:
+        handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+
+    records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+    root.addHandler(_LocalQueueHandler(records))
+    root.setLevel(level.upper())
+
+    for name, value in {**DEFAULT_LEVELS, **_pairs(levels)}.items():
+        logging.getLogger(name).setLevel(value.upper())
+    for name, rate in _pairs(sample).items():
+        logging.getLogger(name).addFilter(SampleFilter(float(rate)))
+
+    listener = QueueListener(records, handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)  # flush what is still queued on exit
+    return listener
@@ -0,0 +1,216 @@
+"""
+In-process counters, gauges and histograms with a Prometheus text endpoint.
+
+Recording a sample is a lock plus a few integer/float updates (histogram
+buckets are found with bisect), well under a microsecond, so it can sit on
+hot paths: every db.py call and every handler is timed through the timed()
+decorator. Gauges and counters can also be backed by a callback that is
+only evaluated when the endpoint is scraped (queue depths, totals kept by
+other objects).
+
+Set METRICS_PORT to serve GET /metrics on METRICS_HOST (default 127.0.0.1);
+with METRICS_PORT unset nothing listens, and samples are still collected.
+"""
+import asyncio
+import bisect
+import functools
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0 = no endpoint
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+# seconds; DB calls and handlers mostly land in the first few buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# seconds a reminder went out after it was due
+LATENESS_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+Sample = Tuple[str, str, float]  # (name suffix, rendered labels, value)
+
+
+class Counter:
+    __slots__ = ("value", "_fn", "_lock")
+
+    def __init__(self, fn: Optional[Callable[[], float]] = None) -> None:
+        self.value = 0
+        self._fn = fn
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def samples(self, labels: str) -> Iterator[Sample]:
+        yield "", labels, self._fn() if self._fn else self.value
+
+
+class Gauge:
+    __slots__ = ("value", "_fn")
+
+    def __init__(self, fn: Optional[Callable[[], float]] = None) -> None:
+        self.value = 0.0
+        self._fn = fn
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def samples(self, labels: str) -> Iterator[Sample]:
+        yield "", labels, self._fn() if self._fn else self.value
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def samples(self, labels: str) -> Iterator[Sample]:
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        sep = labels[:-1] + "," if labels else "{"
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            cumulative += n
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            yield "_bucket", f'{sep}le="{le}"}}', cumulative
+        yield "_sum", labels, total
+        yield "_count", labels, cumulative
+
+
+class Family:
+    """A named metric, optionally split by one label (e.g. function="get_reminder")."""
+
+    def __init__(self, kind: str, name: str, help: str, label: Optional[str], factory: Callable) -> None:
+        self.kind = kind
+        self.name = name
+        self.help = help
+        self.label = label
+        self._factory = factory
+        self._children: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, value: str):
+        child = self._children.get(value)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(value, self._factory())
+        return child
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for value, child in sorted(self._children.items()):
+            labels = f'{{{self.label}="{value}"}}' if self.label else ""
+            for suffix, sample_labels, sample in child.samples(labels):
+                lines.append(f"{self.name}{suffix}{sample_labels} {_number(sample)}")
+        return lines
+
+
+_registry: Dict[str, Family] = {}
+
+
+def _register(kind: str, name: str, help: str, label: Optional[str], factory: Callable):
+    family = _registry.get(name)
+    if family is None:
+        family = _registry[name] = Family(kind, name, help, label, factory)
+    # unlabeled metrics are used directly; labeled ones through .labels()
+    return family if label else family.labels("")
+
+
+def counter(name: str, help: str, label: Optional[str] = None, fn: Optional[Callable[[], float]] = None):
+    return _register("counter", name, help, label, lambda: Counter(fn))
+
+
+def gauge(name: str, help: str, fn: Optional[Callable[[], float]] = None):
+    return _register("gauge", name, help, None, lambda: Gauge(fn))
+
+
+def histogram(name: str, help: str, label: Optional[str] = None, buckets: Sequence[float] = LATENCY_BUCKETS):
+    return _register("histogram", name, help, label, lambda: Histogram(buckets))
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render() -> str:
+    """Everything registered, in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for family in list(_registry.values()):
+        try:
+            lines.extend(family.render())
+        except Exception:
+            logger.exception("Failed to render metric %s", family.name)
+    return "\n".join(lines) + "\n"
+
+
+def timed(family: Family, name: Optional[str] = None) -> Callable:
+    """Decorator: observe each call's duration in family, labelled with the function name."""
+
+    def decorator(fn: Callable) -> Callable:
+        observe = family.labels(name or fn.__name__).observe
+        clock = time.perf_counter
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                start = clock()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    observe(clock() - start)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(clock() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def start_http_server(port: int = METRICS_PORT, host: str = METRICS_HOST) -> Optional[ThreadingHTTPServer]:
+    """Serve GET /metrics from a daemon thread; does nothing if port is 0."""
+    if not port:
+        return None
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info("Metrics endpoint listening on http://%s:%s/metrics", host, server.server_address[1])
+    return server
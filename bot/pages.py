@@ -0,0 +1,120 @@
+"""
+/reminders paging: keyset cursors, Prev/Next buttons and a per-chat page cache.
+
+A page is addressed by the (datetime_ts, id) key of the row next to it, so
+every page, however deep, is one index range read (db.get_reminder_page)
+instead of an OFFSET that rereads all earlier rows. The button data is just
+the direction and that key ("rpage:n:<ts>:<id>"), well within Telegram's
+64 bytes; the chat's category/priority filter lives in chat_data.
+
+Pages are cached per chat (LRU over chats, PAGE_CACHE_TTL seconds). Writes
+that change a chat's pending reminders call invalidate(chat_id); the TTL
+covers writes made elsewhere (other worker processes) and reminders that
+have simply fallen due since the page was read.
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from async_db import get_reminder_page
+
+PAGE_SIZE = int(os.getenv("REMINDERS_PAGE_SIZE", "10"))
+PAGE_CACHE_CHATS = int(os.getenv("REMINDERS_PAGE_CACHE_CHATS", "1000"))
+PAGE_CACHE_TTL = float(os.getenv("REMINDERS_PAGE_CACHE_TTL", "60"))
+
+CALLBACK_PATTERN = r"^rpage:[np]:\d+:\d+$"
+
+Key = Tuple[int, int]  # (datetime_ts, id)
+PageKey = Tuple[str, Optional[Key], Optional[str], Optional[str]]  # direction, cursor, category, priority
+
+
+class Page(NamedTuple):
+    rows: List[dict]
+    has_prev: bool
+    has_next: bool
+
+
+class PageCache:
+    def __init__(self, max_chats: int = PAGE_CACHE_CHATS, ttl: float = PAGE_CACHE_TTL) -> None:
+        self.max_chats = max_chats
+        self.ttl = ttl
+        self._chats: "OrderedDict[int, Dict[PageKey, Tuple[float, Page]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, chat_id: int, key: PageKey) -> Optional[Page]:
+        pages = self._chats.get(chat_id)
+        entry = pages.get(key) if pages else None
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            self.misses += 1
+            return None
+        self._chats.move_to_end(chat_id)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, chat_id: int, key: PageKey, page: Page) -> None:
+        pages = self._chats.get(chat_id)
+        if pages is None:
+            pages = self._chats[chat_id] = {}
+            if len(self._chats) > self.max_chats:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(chat_id)
+        pages[key] = (time.monotonic(), page)
+
+    def invalidate(self, chat_id: int) -> None:
+        self._chats.pop(chat_id, None)
+
+    def clear(self) -> None:
+        self._chats.clear()
+
+
+page_cache = PageCache()
+
+
+async def load_page(
+    chat_id: int,
+    direction: str = "first",
+    cursor: Optional[Key] = None,
+    category: Optional[str] = None,
+    priority: Optional[str] = None,
+) -> Page:
+    """The first page, or the page after ("n") / before ("p") cursor."""
+    key = (direction, cursor, category, priority)
+    page = page_cache.get(chat_id, key)
+    if page is not None:
+        return page
+
+    # one extra row tells whether there is anything beyond this page
+    if direction == "p":
+        rows = await get_reminder_page(chat_id, before=cursor, category=category, priority=priority, limit=PAGE_SIZE + 1)
+        if not rows:
+            # everything before it has fallen due or gone: back to the start
+            return await load_page(chat_id, "first", None, category, priority)
+        page = Page(rows[-PAGE_SIZE:], len(rows) > PAGE_SIZE, True)
+    else:
+        after = cursor if direction == "n" else None
+        rows = await get_reminder_page(chat_id, after=after, category=category, priority=priority, limit=PAGE_SIZE + 1)
+        page = Page(rows[:PAGE_SIZE], after is not None, len(rows) > PAGE_SIZE)
+
+    page_cache.put(chat_id, key, page)
+    return page
+
+
+def parse_callback(data: str) -> Tuple[str, Key]:
+    _, direction, ts, reminder_id = data.split(":")
+    return direction, (int(ts), int(reminder_id))
+
+
+def page_keyboard(page: Page) -> Optional[InlineKeyboardMarkup]:
+    buttons = []
+    if page.has_prev and page.rows:
+        first = page.rows[0]
+        buttons.append(InlineKeyboardButton("◀ Prev", callback_data=f"rpage:p:{first['datetime_ts']}:{first['id']}"))
+    if page.has_next and page.rows:
+        last = page.rows[-1]
+        buttons.append(InlineKeyboardButton("Next ▶", callback_data=f"rpage:n:{last['datetime_ts']}:{last['id']}"))
+    return InlineKeyboardMarkup([buttons]) if buttons else None
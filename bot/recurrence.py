@@ -0,0 +1,213 @@
+"""
+Recurrence rules for repeating reminders.
+
+A rule is a frequency plus an interval, stored in the repeat column either as
+one of the plain words ('daily', 'weekly', 'monthly', 'yearly') or, for
+custom intervals, RRULE-style: 'FREQ=WEEKLY;INTERVAL=2'.
+
+Occurrences are evaluated in the reminder's own timezone from its first
+local occurrence (anchor_local), by index rather than by stepping from the
+previous one:
+
+- a 09:00 daily reminder stays at 09:00 local across DST changes (a wall
+  time that falls in a spring-forward gap moves forward by the gap);
+- a monthly reminder on the 31st fires on the last day of shorter months and
+  is back on the 31st afterwards, instead of drifting to the 28th for good;
+- a snoozed occurrence does not shift the ones after it.
+
+The pending occurrence is precomputed into datetime_utc / datetime_ts (plus
+its index in occurrence), so the dispatcher only compares integers; rules
+are evaluated when a reminder fires or is recovered, never on the tick path.
+"""
+import calendar
+import datetime
+import functools
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+# plain repeat words the WebApp and older rows use
+WORDS = {"daily": "DAILY", "weekly": "WEEKLY", "monthly": "MONTHLY", "yearly": "YEARLY"}
+MAX_INTERVAL = 1000
+
+_UNITS = {"DAILY": "day", "WEEKLY": "week", "MONTHLY": "month", "YEARLY": "year"}
+_EVERY = {"DAILY": "every day", "WEEKLY": "every week", "MONTHLY": "every month", "YEARLY": "every year"}
+
+
+class Rule(NamedTuple):
+    freq: str  # DAILY / WEEKLY / MONTHLY / YEARLY
+    interval: int
+
+
+@functools.lru_cache(maxsize=256)
+def parse_rule(repeat: Optional[str]) -> Optional[Rule]:
+    """Rule for a repeat value, None for one-time ('none' / empty). Raises ValueError if malformed."""
+    if not repeat or repeat.lower() in ("none", "once"):
+        return None
+    word = WORDS.get(repeat.lower())
+    if word:
+        return Rule(word, 1)
+
+    parts = {}
+    for item in repeat.upper().removeprefix("RRULE:").split(";"):
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"Malformed repeat rule {repeat!r}")
+        parts[key.strip()] = value.strip()
+    freq = parts.pop("FREQ", None)
+    if freq not in FREQUENCIES:
+        raise ValueError(f"Unsupported repeat frequency in {repeat!r}")
+    try:
+        interval = int(parts.pop("INTERVAL", "1"))
+    except ValueError:
+        raise ValueError(f"Malformed repeat interval in {repeat!r}") from None
+    if not 1 <= interval <= MAX_INTERVAL:
+        raise ValueError(f"Repeat interval out of range in {repeat!r}")
+    if parts:
+        raise ValueError(f"Unsupported repeat rule parts {sorted(parts)} in {repeat!r}")
+    return Rule(freq, interval)
+
+
+def format_rule(rule: Optional[Rule]) -> str:
+    """Canonical stored form: the plain word when the interval is 1."""
+    if rule is None:
+        return "none"
+    if rule.interval == 1:
+        return rule.freq.lower()
+    return f"FREQ={rule.freq};INTERVAL={rule.interval}"
+
+
+def normalize_repeat(repeat: Optional[str], interval: int = 1) -> str:
+    """Canonical repeat value for user input, optionally overriding the interval."""
+    rule = parse_rule(repeat)
+    if rule is not None and interval != 1:
+        rule = parse_rule(f"FREQ={rule.freq};INTERVAL={interval}")
+    return format_rule(rule)
+
+
+@functools.lru_cache(maxsize=256)
+def describe(repeat: Optional[str]) -> str:
+    """Human label: 'one-time', 'every week', 'every 2 months'..."""
+    try:
+        rule = parse_rule(repeat)
+    except ValueError:
+        return repeat or "one-time"
+    if rule is None:
+        return "one-time"
+    if rule.interval == 1:
+        return _EVERY[rule.freq]
+    return f"every {rule.interval} {_UNITS[rule.freq]}s"
+
+
+# ---------- Occurrences ----------
+
+def local_occurrence(anchor_local: datetime.datetime, rule: Rule, index: int) -> datetime.datetime:
+    """Naive local wall time of occurrence number `index` (0 is the anchor itself)."""
+    n = index * rule.interval
+    if rule.freq == "DAILY":
+        return anchor_local + datetime.timedelta(days=n)
+    if rule.freq == "WEEKLY":
+        return anchor_local + datetime.timedelta(weeks=n)
+    if rule.freq == "MONTHLY":
+        months = anchor_local.month - 1 + n
+        year, month = anchor_local.year + months // 12, months % 12 + 1
+    else:
+        year, month = anchor_local.year + n, anchor_local.month
+    day = min(anchor_local.day, calendar.monthrange(year, month)[1])
+    return anchor_local.replace(year=year, month=month, day=day)
+
+
+def occurrence_utc(
+    anchor_local: datetime.datetime,
+    rule: Rule,
+    index: int,
+    tz: datetime.tzinfo,
+) -> datetime.datetime:
+    # fold=0: ambiguous times take the first instance, gap times land after the gap
+    return local_occurrence(anchor_local, rule, index).replace(tzinfo=tz).astimezone(datetime.timezone.utc)
+
+
+def _index_estimate(anchor_local: datetime.datetime, rule: Rule, local: datetime.datetime) -> int:
+    """Index of roughly the last occurrence at or before `local`; may be one too high or low."""
+    if rule.freq == "DAILY":
+        units = (local - anchor_local).days
+    elif rule.freq == "WEEKLY":
+        units = (local - anchor_local).days // 7
+    elif rule.freq == "MONTHLY":
+        units = (local.year - anchor_local.year) * 12 + local.month - anchor_local.month
+    else:
+        units = local.year - anchor_local.year
+    return units // rule.interval
+
+
+def next_after(
+    anchor_local: datetime.datetime,
+    rule: Rule,
+    tz: datetime.tzinfo,
+    after: datetime.datetime,
+    min_index: int = 0,
+) -> Tuple[int, datetime.datetime]:
+    """
+    (index, aware UTC time) of the first occurrence strictly after `after`
+    with index >= min_index. Calendar arithmetic lands within a step or two
+    of the answer, so this is O(1) however far `after` is from the anchor.
+    """
+    local = after.astimezone(tz).replace(tzinfo=None)
+    index = max(min_index, _index_estimate(anchor_local, rule, local) - 1)
+    while True:
+        when = occurrence_utc(anchor_local, rule, index, tz)
+        if when > after:
+            return index, when
+        index += 1
+
+
+class Advance(NamedTuple):
+    reminder_id: int
+    datetime_utc: datetime.datetime
+    occurrence: int
+    anchor_local: str
+
+
+def advance(
+    reminder_id: int,
+    repeat: Optional[str],
+    tz: datetime.tzinfo,
+    anchor_local: Optional[str],
+    occurrence: int,
+    due_ts: int,
+    after: datetime.datetime,
+) -> Optional[Advance]:
+    """
+    Next pending occurrence of a repeating reminder once occurrence number
+    `occurrence` (due at due_ts) has fired or been skipped; None if the
+    reminder does not repeat. Rows from before anchors were stored are
+    anchored on their current due time.
+    """
+    rule = parse_rule(repeat)
+    if rule is None:
+        return None
+    if anchor_local:
+        anchor = datetime.datetime.fromisoformat(anchor_local)
+    else:
+        anchor = datetime.datetime.fromtimestamp(due_ts, tz).replace(tzinfo=None)
+        anchor_local, occurrence = anchor.isoformat(), 0
+    index, when = next_after(anchor, rule, tz, after, min_index=occurrence + 1)
+    return Advance(reminder_id, when, index, anchor_local)
+
+
+def advance_many(
+    rows: Iterable[Tuple[int, Optional[str], datetime.tzinfo, Optional[str], int, int, int]],
+    after: datetime.datetime,
+) -> List[Advance]:
+    """
+    Bulk form of advance() for (id, repeat, tz, anchor_local, occurrence,
+    due_ts, lead_minutes) rows, as startup recovery rolls them forward: each
+    moves to the first occurrence whose notification (lead_minutes before
+    it) is after `after`. One pass, ready for a single executemany; one-time
+    rows are dropped.
+    """
+    out = []
+    for *row, lead_minutes in rows:
+        step = advance(*row, after + datetime.timedelta(minutes=lead_minutes))
+        if step is not None:
+            out.append(step)
+    return out
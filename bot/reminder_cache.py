@@ -0,0 +1,156 @@
+"""
+Read-through cache of single reminders for the dispatch and button paths.
+
+Sending a reminder and every press on its buttons start with
+get_reminder(id), and the same few rows are read again and again: the send
+reads the row, the snooze/done press reads it again, a snooze reads it once
+more to reschedule. async_db.get_reminder now answers from this cache and
+only reads the database on a miss.
+
+Entries are _Record objects with __slots__ holding just the columns the bot
+uses (no dispatch lease or sync bookkeeping), kept in LRU order up to
+REMINDER_CACHE_SIZE and for REMINDER_CACHE_TTL seconds. Writes made through
+async_db are applied to the cached record as they are queued (write-through,
+with the same conditions as the SQL, bumping version like the UPDATE does),
+so the reads that follow a write are hits too. A write that fails, the sync
+API's writes and bulk status changes invalidate the entry instead; the TTL
+covers writes made by other worker processes. REMINDER_CACHE_SIZE=0 turns
+the cache off.
+"""
+import os
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+REMINDER_CACHE_SIZE = int(os.getenv("REMINDER_CACHE_SIZE", "10000"))
+REMINDER_CACHE_TTL = float(os.getenv("REMINDER_CACHE_TTL", "60"))
+
+FIELDS = (
+    "id",
+    "chat_id",
+    "title",
+    "datetime_utc",
+    "datetime_ts",
+    "timezone",
+    "priority",
+    "category",
+    "repeat",
+    "status",
+    "anchor_local",
+    "occurrence",
+    "note",
+    "lead_minutes",
+    "notify_at",
+    "version",
+)
+
+
+class _Record:
+    __slots__ = FIELDS + ("expires",)
+
+    def __init__(self, row: Dict[str, Any], expires: float) -> None:
+        for field in FIELDS:
+            setattr(self, field, row.get(field))
+        self.expires = expires
+
+    def as_dict(self) -> Dict[str, Any]:
+        """A fresh dict, so callers can never change the cached record."""
+        return {field: getattr(self, field) for field in FIELDS}
+
+
+class ReminderCache:
+    def __init__(self, max_size: int = REMINDER_CACHE_SIZE, ttl: float = REMINDER_CACHE_TTL) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self._records: "OrderedDict[int, _Record]" = OrderedDict()
+        # reads in flight per id, and the clock of the last change to such an
+        # id: a read that a write overtook must not be cached
+        self._loads: "Counter[int]" = Counter()
+        self._changed: Dict[int, int] = {}
+        self._clock = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl > 0
+
+    def get(self, reminder_id: int) -> Optional[Dict[str, Any]]:
+        record = self._records.get(reminder_id)
+        if record is None or record.expires < time.monotonic():
+            self.misses += 1
+            return None
+        self._records.move_to_end(reminder_id)
+        self.hits += 1
+        return record.as_dict()
+
+    def begin_load(self, reminder_id: int) -> int:
+        """Note a database read of reminder_id; pass the token to loaded()."""
+        self._loads[reminder_id] += 1
+        return self._clock
+
+    def loaded(self, reminder_id: int, row: Optional[Dict[str, Any]], token: int) -> Optional[Dict[str, Any]]:
+        """Cache the row read since begin_load() unless a write came in meanwhile; the row as get() returns it."""
+        stale = self._changed.get(reminder_id, -1) > token
+        self._loads[reminder_id] -= 1
+        if not self._loads[reminder_id]:
+            del self._loads[reminder_id]
+            self._changed.pop(reminder_id, None)
+        if row is None:
+            return None
+        record = _Record(row, time.monotonic() + self.ttl)
+        if self.enabled and not stale:
+            self._records[reminder_id] = record
+            self._records.move_to_end(reminder_id)
+            if len(self._records) > self.max_size:
+                self._records.popitem(last=False)
+                self.evictions += 1
+        return record.as_dict()
+
+    def update(
+        self, reminder_id: int, due_ts: Optional[int] = None, unless_status: Optional[str] = None, **fields: Any
+    ) -> Optional[bool]:
+        """
+        Apply a queued write to the cached record, like the UPDATE would:
+        with due_ts only if the record still holds that pending occurrence,
+        with unless_status only if it is not in that status, and a new
+        datetime_ts moves notify_at along. Whether it applied; None if the
+        reminder is not cached.
+        """
+        self._touch(reminder_id)
+        record = self._records.get(reminder_id)
+        if record is None:
+            return None
+        if due_ts is not None and (record.notify_at != due_ts or record.status != "pending"):
+            return False
+        if unless_status is not None and record.status == unless_status:
+            return False
+        for field, value in fields.items():
+            setattr(record, field, value)
+        if "datetime_ts" in fields:
+            record.notify_at = record.datetime_ts - 60 * record.lead_minutes
+        record.version += 1
+        return True
+
+    def invalidate(self, reminder_id: int) -> None:
+        self._touch(reminder_id)
+        self._records.pop(reminder_id, None)
+
+    def invalidate_many(self, reminder_ids: Iterable[int]) -> None:
+        for reminder_id in reminder_ids:
+            self.invalidate(reminder_id)
+
+    def clear(self) -> None:
+        self._clock += 1
+        for reminder_id in self._loads:
+            self._changed[reminder_id] = self._clock
+        self._records.clear()
+
+    def _touch(self, reminder_id: int) -> None:
+        self._clock += 1
+        if reminder_id in self._loads:
+            self._changed[reminder_id] = self._clock
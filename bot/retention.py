@@ -0,0 +1,234 @@
+"""
+Retention: keep the live reminders table proportional to pending reminders.
+
+Done, cancelled and missed rows are never read again by the bot, yet they
+stayed in reminders.db for good, growing every index the hot queries use.
+A periodic job (every RETENTION_INTERVAL_HOURS) now:
+
+- moves closed reminders whose time is more than RETENTION_DAYS in the past
+  to an archive database (RETENTION_ARCHIVE_PATH, by default next to
+  DB_PATH as <name>-archive.db; "none" deletes them instead), a batch per
+  transaction so dispatch writes are never held up for long. Each batch is
+  committed to the archive before it is deleted from the live table, so a
+  crash in between only means the next run copies it again;
+- drops their delivery records, and ledger records of other reminders
+  older than the same cutoff (duplicate sends can only race within minutes);
+- hands the freed pages back to the file system with incremental vacuum
+  (a database created before this converts once, with a full VACUUM),
+  refreshes the planner statistics and truncates the WAL;
+- logs and counts what it moved and the bytes reclaimed.
+
+Removed rows raise a sync floor: Mini App clients that synced before them
+get a full listing on their next sync (see sync_api.py).
+
+RETENTION_DAYS=0 turns the job off.
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from telegram.ext import ContextTypes
+
+import db
+from async_db import (
+    analyze,
+    database_size,
+    enable_incremental_vacuum,
+    get_closed_batch,
+    incremental_vacuum,
+    prune_deliveries,
+    purge_reminders,
+)
+
+logger = logging.getLogger(__name__)
+
+RETENTION_DAYS = float(os.getenv("RETENTION_DAYS", "30"))  # 0 = keep everything
+RETENTION_INTERVAL_HOURS = float(os.getenv("RETENTION_INTERVAL_HOURS", "24"))
+RETENTION_ARCHIVE_PATH = os.getenv("RETENTION_ARCHIVE_PATH", "")  # "" = next to DB_PATH, "none" = no archive
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", str(db.DB_BATCH_SIZE)))
+# pages per incremental vacuum step (4 MiB at the default page size)
+RETENTION_VACUUM_PAGES = int(os.getenv("RETENTION_VACUUM_PAGES", "1024"))
+# first run a few minutes after startup, clear of catch-up delivery
+RETENTION_FIRST_RUN_SECONDS = 300
+
+_ARCHIVE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS reminders (
+        id INTEGER PRIMARY KEY,
+        chat_id INTEGER NOT NULL,
+        title TEXT NOT NULL,
+        datetime_utc TEXT NOT NULL,
+        datetime_ts INTEGER,
+        timezone TEXT,
+        priority TEXT NOT NULL,
+        category TEXT,
+        repeat TEXT NOT NULL,
+        status TEXT NOT NULL,
+        anchor_local TEXT,
+        occurrence INTEGER NOT NULL,
+        note TEXT,
+        version INTEGER NOT NULL,
+        archived_at INTEGER NOT NULL,
+        lead_minutes INTEGER NOT NULL DEFAULT 0
+    )
+"""
+_ARCHIVE_INDEX = "CREATE INDEX IF NOT EXISTS idx_reminders_chat_ts ON reminders (chat_id, datetime_ts)"
+# a batch copied again after a crash replaces its earlier copy
+_SQL_ARCHIVE = """
+    INSERT OR REPLACE INTO reminders (
+        id, chat_id, title, datetime_utc, datetime_ts, timezone, priority, category, repeat, status,
+        anchor_local, occurrence, note, version, archived_at, lead_minutes
+    )
+    VALUES (
+        :id, :chat_id, :title, :datetime_utc, :datetime_ts, :timezone, :priority, :category, :repeat, :status,
+        :anchor_local, :occurrence, :note, :version, :archived_at, :lead_minutes
+    )
+"""
+
+
+def archive_path(db_path: str, setting: str = RETENTION_ARCHIVE_PATH) -> Optional[str]:
+    """Where archived rows go for a live database at db_path; None to delete them."""
+    if setting.lower() == "none":
+        return None
+    if setting:
+        return setting
+    stem, ext = os.path.splitext(db_path)
+    return f"{stem}-archive{ext or '.db'}"
+
+
+def open_archive(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute(_ARCHIVE_SCHEMA)
+    conn.execute(_ARCHIVE_INDEX)
+    conn.commit()
+    return conn
+
+
+def _archive(conn: sqlite3.Connection, rows: List[Dict[str, Any]], archived_at: int) -> None:
+    with conn:
+        conn.executemany(_SQL_ARCHIVE, ({**row, "archived_at": archived_at} for row in rows))
+
+
+class RetentionReport(NamedTuple):
+    archived: int
+    deliveries_pruned: int
+    size_before: int
+    size_after: int
+    seconds: float
+
+    @property
+    def reclaimed(self) -> int:
+        return max(0, self.size_before - self.size_after)
+
+
+class Retention:
+    def __init__(
+        self,
+        days: float = RETENTION_DAYS,
+        batch_size: int = RETENTION_BATCH_SIZE,
+        vacuum_pages: int = RETENTION_VACUUM_PAGES,
+    ) -> None:
+        self.days = days
+        self.batch_size = batch_size
+        self.vacuum_pages = vacuum_pages
+        # totals over every run, for metrics
+        self.archived = 0
+        self.deliveries_pruned = 0
+        self.reclaimed = 0
+        self._running = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.days > 0
+
+    def start(self, job_queue) -> None:
+        if not self.enabled:
+            logger.info("Retention is off (RETENTION_DAYS=0)")
+            return
+        job_queue.run_repeating(
+            self._job,
+            interval=RETENTION_INTERVAL_HOURS * 3600,
+            first=RETENTION_FIRST_RUN_SECONDS,
+            name="retention",
+        )
+
+    async def _job(self, context: ContextTypes.DEFAULT_TYPE) -> None:
+        if self._running:
+            logger.warning("Retention: the previous run is still going, skipping this one")
+            return
+        try:
+            await self.run()
+        except Exception:
+            logger.exception("Retention run failed")
+
+    async def run(self, now: Optional[float] = None) -> RetentionReport:
+        """Archive, prune and compact once; safe to interrupt and run again."""
+        self._running = True
+        try:
+            return await self._run(time.time() if now is None else now)
+        finally:
+            self._running = False
+
+    async def _run(self, now: float) -> RetentionReport:
+        t0 = time.perf_counter()
+        cutoff = int(now - self.days * 86400)
+        size_before, _ = await database_size()
+
+        archived = await self._archive_closed(cutoff, int(now))
+        pruned = await self._prune_ledger(cutoff)
+
+        if await enable_incremental_vacuum():
+            logger.info("Retention: converted %s to incremental vacuum", db.DB_PATH)
+        free = None
+        while True:
+            left = await incremental_vacuum(self.vacuum_pages)
+            if left == 0 or left == free:
+                break
+            free = left
+        await analyze()
+
+        size_after, _ = await database_size()
+        report = RetentionReport(archived, pruned, size_before, size_after, time.perf_counter() - t0)
+        self.archived += report.archived
+        self.deliveries_pruned += report.deliveries_pruned
+        self.reclaimed += report.reclaimed
+        logger.info(
+            "Retention: archived %d reminders, pruned %d delivery records, database %.1f -> %.1f MiB "
+            "(%.1f MiB reclaimed) in %.1fs",
+            report.archived,
+            report.deliveries_pruned,
+            report.size_before / 2**20,
+            report.size_after / 2**20,
+            report.reclaimed / 2**20,
+            report.seconds,
+        )
+        return report
+
+    async def _archive_closed(self, cutoff: int, now: int) -> int:
+        path = archive_path(db.DB_PATH)
+        archive = await asyncio.to_thread(open_archive, path) if path else None
+        archived, after_id = 0, 0
+        try:
+            while True:
+                rows = await get_closed_batch(after_id, cutoff, self.batch_size)
+                if not rows:
+                    break
+                if archive is not None:
+                    await asyncio.to_thread(_archive, archive, rows, now)
+                archived += await purge_reminders([row["id"] for row in rows])
+                if len(rows) < self.batch_size:
+                    break
+                after_id = rows[-1]["id"]
+        finally:
+            if archive is not None:
+                archive.close()
+        return archived
+
+    async def _prune_ledger(self, cutoff: int) -> int:
+        pruned, key = 0, (0, 0)
+        while key is not None:
+            key, deleted = await prune_deliveries(key, cutoff, self.batch_size)
+            pruned += deleted
+        return pruned
@@ -0,0 +1,175 @@
+"""
+Window-based reminder dispatcher.
+
+Instead of one job_queue job per reminder, only reminders due within the
+next SCHEDULER_WINDOW_SECONDS are held in memory, in a min-heap keyed by due
+time. A refill job pulls the next slice of the window from the pending-time
+index, and a tick job pops whatever is due. Memory stays proportional to the
+number of reminders in the window, however far ahead users schedule.
+"""
+import asyncio
+import datetime
+import heapq
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Tuple
+
+from telegram.ext import ContextTypes
+
+from async_db import iter_pending_batches
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_WINDOW_SECONDS = int(os.getenv("SCHEDULER_WINDOW_SECONDS", "600"))
+SCHEDULER_TICK_SECONDS = float(os.getenv("SCHEDULER_TICK_SECONDS", "1"))
+# load the first window in the background so polling starts immediately
+SCHEDULER_LAZY_START = os.getenv("SCHEDULER_LAZY_START", "1") == "1"
+
+FireCallback = Callable[[ContextTypes.DEFAULT_TYPE, int, int], Awaitable[None]]
+
+
+def _iso(ts: float) -> str:
+    return datetime.datetime.fromtimestamp(ts, datetime.timezone.utc).isoformat()
+
+
+class ReminderDispatcher:
+    def __init__(
+        self,
+        fire: FireCallback,
+        window_seconds: int = SCHEDULER_WINDOW_SECONDS,
+        tick_seconds: float = SCHEDULER_TICK_SECONDS,
+    ) -> None:
+        self._fire = fire
+        self.window_seconds = window_seconds
+        self.tick_seconds = tick_seconds
+        # (due_ts, reminder_id, chat_id); entries not matching _due are stale
+        self._heap: List[Tuple[float, int, int]] = []
+        self._due: Dict[int, float] = {}
+        # every pending reminder due at or before this timestamp is loaded
+        self._horizon = 0.0
+        # end of the window a running refill is loading; schedules up to it are
+        # kept even if their batch was read before the row was written
+        self._loading_until = 0.0
+        self._refill_lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    @property
+    def horizon(self) -> float:
+        return self._horizon
+
+    def schedule(self, reminder_id: int, chat_id: int, due_ts: float) -> bool:
+        """
+        Put a reminder on the wheel if it falls inside the loaded window.
+        Anything later is left to a future refill. Re-scheduling an id
+        replaces its previous entry.
+        """
+        if due_ts > max(self._horizon, self._loading_until):
+            self._due.pop(reminder_id, None)
+            return False
+        self._push(reminder_id, chat_id, due_ts)
+        return True
+
+    def schedule_many(self, rows: Iterable[Tuple[int, int, float]]) -> int:
+        """schedule() for a batch of (reminder_id, chat_id, due_ts), e.g. a bulk import; returns how many were held."""
+        limit = max(self._horizon, self._loading_until)
+        held = 0
+        for reminder_id, chat_id, due_ts in rows:
+            if due_ts <= limit:
+                self._due[reminder_id] = due_ts
+                self._heap.append((due_ts, reminder_id, chat_id))
+                held += 1
+        if held:
+            heapq.heapify(self._heap)
+        return held
+
+    def _push(self, reminder_id: int, chat_id: int, due_ts: float) -> None:
+        self._due[reminder_id] = due_ts
+        heapq.heappush(self._heap, (due_ts, reminder_id, chat_id))
+
+    def cancel(self, reminder_id: int) -> None:
+        self._due.pop(reminder_id, None)
+
+    def pop_due(self, now_ts: float) -> List[Tuple[int, int]]:
+        """Remove and return (reminder_id, chat_id) for everything due by now_ts."""
+        due = []
+        heap = self._heap
+        while heap and heap[0][0] <= now_ts:
+            due_ts, reminder_id, chat_id = heapq.heappop(heap)
+            if self._due.get(reminder_id) != due_ts:
+                continue  # cancelled or rescheduled since it was pushed
+            del self._due[reminder_id]
+            due.append((reminder_id, chat_id))
+        # drop stale entries once they dominate the heap
+        if len(heap) > 2 * len(self._due) + 64:
+            self._heap = [e for e in heap if self._due.get(e[1]) == e[0]]
+            heapq.heapify(self._heap)
+        return due
+
+    async def refill(self, now_ts: float | None = None) -> int:
+        """
+        Extend the window to now + window_seconds from the pending-time index.
+        Rows stream in time order, batch by batch, and the horizon follows the
+        last row read, so reminders become dispatchable as soon as their batch
+        is in, soonest first.
+        """
+        async with self._refill_lock:
+            now_ts = time.time() if now_ts is None else now_ts
+            start = self._horizon if self._horizon else now_ts
+            end = now_ts + self.window_seconds
+            if end <= start:
+                return 0
+            loaded = 0
+            self._loading_until = end
+            try:
+                async for batch in iter_pending_batches(start, end):
+                    for reminder_id, chat_id, due_ts in batch:
+                        if reminder_id not in self._due:
+                            self._push(reminder_id, chat_id, due_ts)
+                            loaded += 1
+                    # rows sharing the last second may still be unread, so stay just below it
+                    self._horizon = max(self._horizon, batch[-1].notify_at - 1e-6)
+                self._horizon = end
+            finally:
+                self._loading_until = 0.0
+        logger.info(
+            "Dispatcher window extended to %s: loaded=%d held=%d",
+            _iso(end),
+            loaded,
+            len(self._due),
+        )
+        return loaded
+
+    async def _refill_job(self, context: ContextTypes.DEFAULT_TYPE) -> None:
+        await self.refill()
+
+    async def _tick_job(self, context: ContextTypes.DEFAULT_TYPE) -> None:
+        for reminder_id, chat_id in self.pop_due(time.time()):
+            context.application.create_task(self._fire(context, reminder_id, chat_id))
+
+    async def start(
+        self,
+        job_queue,
+        since_ts: float | None = None,
+        lazy: bool = SCHEDULER_LAZY_START,
+    ) -> None:
+        """
+        Load the first window (now, or in the background if lazy) and start
+        the tick/refill jobs. The window starts at since_ts (default now);
+        anything due before it is left to recovery.
+        """
+        self._horizon = time.time() if since_ts is None else since_ts
+        if lazy:
+            job_queue.run_once(self._refill_job, when=0, name="dispatcher-initial-refill")
+        else:
+            await self.refill()
+        job_queue.run_repeating(
+            self._tick_job, interval=self.tick_seconds, first=0, name="dispatcher-tick"
+        )
+        job_queue.run_repeating(
+            self._refill_job,
+            interval=max(1, self.window_seconds // 2),
+            name="dispatcher-refill",
+        )
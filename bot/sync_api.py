@@ -0,0 +1,422 @@
+"""
+HTTP sync API for the Mini App.
+
+The WebApp used to keep its reminders only in localStorage and could reach
+the bot only through sendData, which closes the app, so its edits and
+deletes never reached the database. This serves a chat's reminders over
+HTTP instead:
+
+    GET    /api/reminders?since=<version>   rows changed after version
+    POST   /api/reminders                   create (same fields as sendData)
+    PUT    /api/reminders/<id>              edit
+    DELETE /api/reminders/<id>              cancel
+
+Every request carries the Mini App's initData ("Authorization: tma <initData>"),
+checked against the bot token's HMAC as Telegram specifies. Its user id is the
+chat the reminders belong to: the app is opened from the bot's private chat.
+
+Delta sync: every insert, and every write that bumps a row's version, stamps
+the row with the next value of a database-wide counter (sync_seq, kept by
+triggers, see db._m008_sync). A client sends the highest value it has seen
+and gets only the rows changed after it, SYNC_PAGE_SIZE at a time ("more"
+means ask again). The version doubles as the ETag, so polling an unchanged
+chat is two index probes and a 304. Rows that were closed come back with
+their status so the client can drop them. Edits and deletes may send the
+row's version in If-Match and get 412 with the current row if it changed
+in the meantime (the reminder fired, or was snoozed from the chat).
+
+A first sync (since=0) lists pending rows only, and its later pages say so
+with full=1. Closed rows are eventually removed by retention.py, after which
+a client can no longer learn that they closed: a delta sync from before the
+last removed row gets a full listing instead, marked "reset", and the client
+replaces what it holds.
+
+Responses of SYNC_GZIP_MIN_BYTES or more are gzipped for clients that accept it.
+
+Set SYNC_PORT to listen on SYNC_HOST (default 127.0.0.1, behind the HTTPS
+proxy the Mini App can reach) and SYNC_PUBLIC_URL to the address the Mini
+App should call; the bot passes it to the app as ?api=... on WEB_APP_URL.
+"""
+import asyncio
+import datetime
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+from urllib.parse import parse_qsl, quote, urlsplit
+
+import async_db
+import db
+import metrics
+from recurrence import normalize_repeat, parse_rule
+from timeutils import PRIORITY_LABELS, zone_or_utc
+
+logger = logging.getLogger(__name__)
+
+SYNC_PORT = int(os.getenv("SYNC_PORT", "0"))  # 0 = no API
+SYNC_HOST = os.getenv("SYNC_HOST", "127.0.0.1")
+SYNC_PUBLIC_URL = os.getenv("SYNC_PUBLIC_URL", "")
+SYNC_ALLOWED_ORIGIN = os.getenv("SYNC_ALLOWED_ORIGIN", "*")
+# how long an opened Mini App may keep using its initData
+SYNC_INIT_DATA_TTL = int(os.getenv("SYNC_INIT_DATA_TTL", "86400"))
+SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", "500"))
+SYNC_GZIP_MIN_BYTES = 1024
+MAX_BODY_BYTES = 16 * 1024
+
+SYNC_SECONDS = metrics.histogram("sync_request_seconds", "Time spent serving Mini App sync requests.", label="route")
+
+# (reminder_id, chat_id, notify_ts or None once cancelled), called on the event loop right after the write
+ChangeCallback = Callable[[int, int, Optional[float]], None]
+
+T = TypeVar("T")
+
+_ROW_PATH = re.compile(r"^/api/reminders/(\d+)$")
+
+
+class AuthError(Exception):
+    pass
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+def web_app_url(url: str, api_url: str = SYNC_PUBLIC_URL) -> str:
+    """WEB_APP_URL with the sync API's address added as ?api=..., if there is one."""
+    if not api_url:
+        return url
+    return f"{url}{'&' if '?' in url else '?'}api={quote(api_url, safe='')}"
+
+
+def validate_init_data(
+    init_data: str, bot_token: str, max_age: float = SYNC_INIT_DATA_TTL, now: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Fields of a Mini App initData string (user decoded from JSON) once its hash
+    checks out, see https://core.telegram.org/bots/webapps#validating-data-received-via-the-mini-app.
+    Raises AuthError if it is forged, malformed or older than max_age seconds.
+    """
+    fields = dict(parse_qsl(init_data, keep_blank_values=True))
+    received = fields.pop("hash", "")
+    check = "\n".join(f"{key}={value}" for key, value in sorted(fields.items()))
+    secret = hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+    expected = hmac.new(secret, check.encode(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected, received):
+        raise AuthError("initData signature mismatch")
+    try:
+        age = (time.time() if now is None else now) - int(fields["auth_date"])
+        fields["user"] = json.loads(fields["user"])
+        int(fields["user"]["id"])
+    except (KeyError, TypeError, ValueError):
+        raise AuthError("initData without auth_date or user") from None
+    if max_age and age > max_age:
+        raise AuthError("initData expired, reopen the app")
+    return fields
+
+
+def to_client(row: Dict[str, Any]) -> Dict[str, Any]:
+    """A reminder row in the shape app.js keeps in its list."""
+    try:
+        rule = parse_rule(row["repeat"])
+    except ValueError:
+        rule = None
+    return {
+        "id": str(row["id"]),
+        "title": row["title"],
+        "datetime": row["datetime_utc"],
+        "timezone": row["timezone"],
+        "repeat": rule.freq.lower() if rule else "once",
+        "repeat_interval": rule.interval if rule else 1,
+        "category": row["category"] or "",
+        "priority": row["priority"],
+        "note": row["note"] or "",
+        "remind_before_minutes": row["lead_minutes"],
+        "status": row["status"],
+        "version": row["version"],
+    }
+
+
+def from_client(data: Dict[str, Any], now: datetime.datetime) -> Tuple[Dict[str, Any], float]:
+    """
+    Column values for a reminder the Mini App sent, and the time to notify
+    (event minus remind_before_minutes). Raises ValueError if it is invalid.
+    """
+    timezone_name = str(data.get("timezone") or "").strip() or None
+    tz = zone_or_utc(timezone_name)
+    when = datetime.datetime.fromisoformat(str(data.get("datetime") or "").replace("Z", "+00:00"))
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=tz)
+    when = when.astimezone(datetime.timezone.utc)
+    lead = int(data.get("remind_before_minutes") or 0)
+    if lead < 0:
+        raise ValueError("remind_before_minutes must not be negative")
+    notify = when - datetime.timedelta(minutes=lead)
+    if notify <= now:
+        raise ValueError("Time must be in the future.")
+
+    priority = str(data.get("priority") or "normal").strip().lower()
+    if priority not in PRIORITY_LABELS:
+        raise ValueError(f"Unknown priority {priority!r}")
+    repeat = normalize_repeat(str(data.get("repeat") or "once"), int(data.get("repeat_interval") or 1))
+    anchor_local = when.astimezone(tz).replace(tzinfo=None).isoformat() if repeat != "none" else None
+    fields = {
+        "title": str(data.get("title") or "").strip() or "Reminder",
+        "datetime_utc_iso": when.isoformat(),
+        "timezone": timezone_name,
+        "priority": priority,
+        "category": str(data.get("category") or "").strip() or None,
+        "repeat": repeat,
+        "anchor_local": anchor_local,
+        "note": str(data.get("note") or "").strip() or None,
+        "lead_minutes": lead,
+    }
+    return fields, notify.timestamp()
+
+
+def _version(header: Optional[str]) -> Optional[int]:
+    """The number in an ETag-style header value ('"12"', 'W/"12"'), None if absent."""
+    if not header:
+        return None
+    value = header.strip().removeprefix("W/").strip('"')
+    return int(value) if value.isdigit() else None
+
+
+class SyncServer(ThreadingHTTPServer):
+    """
+    Serves requests on its own threads. Reads go straight to db.py's reader
+    pool; writes run through async_db on the bot's event loop, so they queue
+    behind the reminder's group-committed writes, and on_change runs there
+    right after each one, before anything else on the loop can act on it.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self, address: Tuple[str, int], bot_token: str, on_change: ChangeCallback, loop: asyncio.AbstractEventLoop
+    ) -> None:
+        super().__init__(address, _Handler)
+        self.bot_token = bot_token
+        self.on_change = on_change
+        self.loop = loop
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # keep-alive: the Mini App makes its requests over one connection
+    protocol_version = "HTTP/1.1"
+    # headers and body go out in separate writes; don't let Nagle hold the body back
+    disable_nagle_algorithm = True
+    server: SyncServer
+
+    def do_OPTIONS(self) -> None:
+        # CORS preflight: the Mini App is served from another origin
+        self.send_response(204)
+        self._cors()
+        self.send_header("Access-Control-Max-Age", "86400")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+    def do_PUT(self) -> None:
+        self._dispatch("PUT")
+
+    def do_DELETE(self) -> None:
+        self._dispatch("DELETE")
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _dispatch(self, method: str) -> None:
+        started = time.perf_counter()
+        route = "other"
+        try:
+            # read the body first, so the connection stays usable whatever we answer
+            body = self._read_body()
+            url = urlsplit(self.path)
+            chat_id = self._chat_id()
+            row_match = _ROW_PATH.match(url.path)
+            if url.path == "/api/reminders" and method == "GET":
+                route = "changes"
+                self._changes(chat_id, dict(parse_qsl(url.query)))
+            elif url.path == "/api/reminders" and method == "POST":
+                route = "create"
+                self._create(chat_id, body)
+            elif row_match and method == "PUT":
+                route = "edit"
+                self._edit(chat_id, int(row_match.group(1)), body)
+            elif row_match and method == "DELETE":
+                route = "delete"
+                self._delete(chat_id, int(row_match.group(1)))
+            else:
+                self._send_json(404, {"error": "Not found"})
+        except AuthError as exc:
+            self._send_json(401, {"error": str(exc)})
+        except BodyTooLarge as exc:
+            self._send_json(413, {"error": str(exc)})
+        except ValueError as exc:
+            self._send_json(400, {"error": str(exc)})
+        except Exception:
+            logger.exception("Sync request %s %s failed", method, self.path)
+            self._send_json(500, {"error": "Internal error"})
+        finally:
+            SYNC_SECONDS.labels(route).observe(time.perf_counter() - started)
+
+    # ---------- Routes ----------
+
+    def _changes(self, chat_id: int, query: Dict[str, str]) -> None:
+        since = int(query.get("since") or _version(self.headers.get("If-None-Match")) or 0)
+        full = since == 0 or query.get("full") == "1"
+        floor = db.get_sync_floor()
+        reset = not full and since < floor
+        if reset:
+            # retention has since removed closed rows this client may still hold
+            since, full = 0, True
+        rows = db.get_reminder_changes(chat_id, since, SYNC_PAGE_SIZE + 1, include_closed=not full)
+        more = len(rows) > SYNC_PAGE_SIZE
+        rows = rows[:SYNC_PAGE_SIZE]
+        version = rows[-1]["sync_seq"] if rows else since
+        if full and not more:
+            # the listing is complete, so nothing removed below the floor concerns it
+            version = max(version, floor)
+        if not rows and since and version == since:
+            self.send_response(304)
+            self._cors()
+            self.send_header("ETag", f'"{version}"')
+            self.end_headers()
+            return
+        payload = {"version": version, "more": more, "reset": reset, "reminders": [to_client(r) for r in rows]}
+        self._send_json(200, payload, etag=f'"{version}"')
+
+    def _create(self, chat_id: int, body: Dict[str, Any]) -> None:
+        fields, notify_ts = from_client(body, datetime.datetime.now(datetime.timezone.utc))
+
+        async def create() -> int:
+            reminder_id = await async_db.add_reminder(chat_id, **fields)
+            self.server.on_change(reminder_id, chat_id, notify_ts)
+            return reminder_id
+
+        reminder_id = self._on_loop(create())
+        logger.info("Sync: created reminder id=%s for chat_id=%s", reminder_id, chat_id)
+        self._send_json(201, to_client(db.get_reminder(reminder_id)))
+
+    def _edit(self, chat_id: int, reminder_id: int, body: Dict[str, Any]) -> None:
+        fields, notify_ts = from_client(body, datetime.datetime.now(datetime.timezone.utc))
+        expected_version = _version(self.headers.get("If-Match"))
+
+        async def edit() -> Optional[Dict[str, Any]]:
+            row = await async_db.edit_reminder(reminder_id, chat_id, **fields, expected_version=expected_version)
+            if row is not None:
+                self.server.on_change(reminder_id, chat_id, notify_ts)
+            return row
+
+        row = self._on_loop(edit())
+        if row is None:
+            self._conflict(chat_id, reminder_id)
+            return
+        logger.info("Sync: edited reminder id=%s for chat_id=%s", reminder_id, chat_id)
+        self._send_json(200, to_client(row))
+
+    def _delete(self, chat_id: int, reminder_id: int) -> None:
+        expected_version = _version(self.headers.get("If-Match"))
+
+        async def cancel() -> Optional[Dict[str, Any]]:
+            row = await async_db.cancel_reminder(reminder_id, chat_id, expected_version)
+            if row is not None:
+                self.server.on_change(reminder_id, chat_id, None)
+            return row
+
+        row = self._on_loop(cancel())
+        if row is None:
+            self._conflict(chat_id, reminder_id)
+            return
+        logger.info("Sync: cancelled reminder id=%s for chat_id=%s", reminder_id, chat_id)
+        self._send_json(200, to_client(row))
+
+    def _conflict(self, chat_id: int, reminder_id: int) -> None:
+        """The write matched nothing: not this chat's reminder, or no longer at the client's version."""
+        current = db.get_reminder(reminder_id)
+        if current is None or current["chat_id"] != chat_id:
+            self._send_json(404, {"error": "No such reminder"})
+        else:
+            self._send_json(412, {"error": "The reminder changed in the meantime", "reminder": to_client(current)})
+
+    # ---------- Plumbing ----------
+
+    def _on_loop(self, coro: Awaitable[T]) -> T:
+        """Run coro on the bot's event loop and wait for its result on this thread."""
+        return asyncio.run_coroutine_threadsafe(coro, self.server.loop).result()
+
+    def _chat_id(self) -> int:
+        scheme, _, init_data = (self.headers.get("Authorization") or "").partition(" ")
+        if scheme.lower() != "tma" or not init_data:
+            raise AuthError("Missing Mini App initData")
+        return int(validate_init_data(init_data, self.server.bot_token)["user"]["id"])
+
+    def _read_body(self) -> Dict[str, Any]:
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if not 0 <= length <= MAX_BODY_BYTES:
+            # the body was not read, so the connection cannot carry another request
+            self.close_connection = True
+            if length < 0:
+                raise ValueError("Invalid Content-Length")
+            raise BodyTooLarge(f"Request body over {MAX_BODY_BYTES} bytes")
+        if not length:
+            return {}
+        data = json.loads(self.rfile.read(length))
+        if not isinstance(data, dict):
+            raise ValueError("Expected a JSON object")
+        return data
+
+    def _cors(self) -> None:
+        self.send_header("Access-Control-Allow-Origin", SYNC_ALLOWED_ORIGIN)
+        self.send_header("Access-Control-Allow-Methods", "GET, POST, PUT, DELETE, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Authorization, Content-Type, If-Match, If-None-Match")
+        self.send_header("Access-Control-Expose-Headers", "ETag")
+        if SYNC_ALLOWED_ORIGIN != "*":
+            self.send_header("Vary", "Origin")
+
+    def _send_json(self, status: int, payload: Dict[str, Any], etag: Optional[str] = None) -> None:
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+        self.send_response(status)
+        self._cors()
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Cache-Control", "private, no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+        if etag:
+            self.send_header("ETag", etag)
+        if len(body) >= SYNC_GZIP_MIN_BYTES and "gzip" in (self.headers.get("Accept-Encoding") or ""):
+            body = gzip.compress(body, compresslevel=6)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_server(
+    bot_token: str,
+    on_change: ChangeCallback,
+    loop: asyncio.AbstractEventLoop,
+    port: int = SYNC_PORT,
+    host: str = SYNC_HOST,
+) -> Optional[SyncServer]:
+    """Serve the sync API from a daemon thread; does nothing if port is 0. Writes run on loop."""
+    if not port:
+        return None
+    server = SyncServer((host, port), bot_token, on_change, loop)
+    threading.Thread(target=server.serve_forever, name="sync-http", daemon=True).start()
+    logger.info("Mini App sync API listening on http://%s:%s/api/reminders", host, server.server_address[1])
+    return server
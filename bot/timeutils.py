@@ -0,0 +1,112 @@
+"""
+Shared time zone and reminder formatting helpers.
+
+- get_zone(): resolved ZoneInfo objects in a bounded LRU cache. Bad names are
+  cached too (as None), so they are logged once instead of on every use.
+- Label tables are built once at import.
+- format_for_user(): rendered reminder text cached by (id, version); every
+  write bumps a reminder's version, so a cached entry can never be stale.
+"""
+import datetime
+import functools
+import logging
+from collections import OrderedDict
+from typing import Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from recurrence import describe
+
+logger = logging.getLogger(__name__)
+
+ZONE_CACHE_SIZE = 512
+RENDER_CACHE_SIZE = 10000
+
+REPEAT_LABELS = {
+    "none": "one-time",
+    "daily": "every day",
+    "weekly": "every week",
+    "monthly": "every month",
+    "yearly": "every year",
+}
+
+PRIORITY_LABELS = {
+    "low": "low",
+    "normal": "normal",
+    "urgent": "urgent",
+}
+
+
+@functools.lru_cache(maxsize=ZONE_CACHE_SIZE)
+def get_zone(name: Optional[str]) -> Optional[datetime.tzinfo]:
+    """ZoneInfo for an IANA name, or None if the name is empty or unknown."""
+    if not name:
+        return None
+    try:
+        return ZoneInfo(name)
+    except Exception:
+        logger.warning("Unknown timezone %r, using UTC for it from now on", name)
+        return None
+
+
+def zone_or_utc(name: Optional[str]) -> datetime.tzinfo:
+    return get_zone(name) or datetime.timezone.utc
+
+
+def parse_client_datetime_to_utc(datetime_str: str, timezone_name: str | None) -> datetime.datetime:
+    """
+    OLD FORMAT SUPPORT:
+    datetime_str: 'YYYY-MM-DDTHH:MM' in user's local timezone
+    timezone_name: IANA tz string like 'America/Toronto'
+    Returns an aware UTC datetime.
+    """
+    naive_local = datetime.datetime.strptime(datetime_str, "%Y-%m-%dT%H:%M")
+    utc_dt = naive_local.replace(tzinfo=zone_or_utc(timezone_name)).astimezone(datetime.timezone.utc)
+    logger.debug("Parsed old-format datetime %s (%s) -> %s UTC", datetime_str, timezone_name, utc_dt)
+    return utc_dt
+
+
+# ---------- Rendered reminder cache ----------
+
+_rendered: "OrderedDict[Tuple[int, int], str]" = OrderedDict()
+
+
+def _render(reminder: dict) -> str:
+    utc_dt = datetime.datetime.fromisoformat(reminder["datetime_utc"])
+    utc_dt = utc_dt.replace(tzinfo=datetime.timezone.utc)
+
+    tz = get_zone(reminder.get("timezone"))
+    local_dt = utc_dt.astimezone(tz) if tz else utc_dt
+    time_str = local_dt.strftime("%Y-%m-%d %H:%M")
+
+    repeat = reminder.get("repeat", "none")
+    priority = reminder.get("priority", "normal")
+    cat = reminder.get("category") or "No category"
+    lead = reminder.get("lead_minutes")
+
+    return (
+        f"*{reminder['title']}*\n"
+        f"🕒 {time_str}\n"
+        + (f"🔔 {lead} min before\n" if lead else "")
+        + f"🔁 {REPEAT_LABELS.get(repeat) or describe(repeat)}\n"
+        f"⚙️ Priority: {PRIORITY_LABELS.get(priority, priority)}\n"
+        f"🏷 Category: {cat}"
+    )
+
+
+def format_for_user(reminder: dict) -> str:
+    """Format reminder time/text back into user's timezone (if we have it)."""
+    reminder_id = reminder.get("id")
+    version = reminder.get("version")
+    if reminder_id is None or version is None:
+        return _render(reminder)
+
+    key = (reminder_id, version)
+    text = _rendered.get(key)
+    if text is not None:
+        _rendered.move_to_end(key)
+        return text
+
+    text = _rendered[key] = _render(reminder)
+    if len(_rendered) > RENDER_CACHE_SIZE:
+        _rendered.popitem(last=False)
+    return text
@@ -59,8 +59,40 @@
 
   const STORAGE_REMINDERS_KEY = "reminders_webapp";
   const STORAGE_CATEGORIES_KEY = "reminders_categories";
-
-  let reminders = [];
+  const STORAGE_SYNC_VERSION_KEY = "reminders_sync_version";
+
+  // The bot adds ?api=<sync API base URL> when its sync API is enabled
+  // (bot/sync_api.py). Without it the list lives in localStorage only.
+  // ?bench is webapp/bench.html driving the app: no storage, no server.
+  const params = new URLSearchParams(window.location.search);
+  const API_BASE = params.get("api");
+  const benchMode = params.has("bench");
+  const syncEnabled = !!(API_BASE && hasTelegram && tg.initData && !benchMode);
+
+  const REPEAT_LABELS = {
+    once: "Once",
+    daily: "Every day",
+    weekly: "Every week",
+    monthly: "Every month",
+    yearly: "Every year",
+  };
+
+  const timeFormat = new Intl.DateTimeFormat(undefined, {
+    hour: "2-digit",
+    minute: "2-digit",
+  });
+
+  // Reminders by id, and the same reminders by local day (dayKey -> list in
+  // time order). Both are updated on every add/edit/delete, so the calendar
+  // and the day list never scan the whole set.
+  const remindersById = new Map();
+  const remindersByDay = new Map();
+  // parsed datetime per reminder object (edits replace the object)
+  const timeCache = new WeakMap();
+
+  // highest server change version applied to the reminders
+  let syncVersion = 0;
+  let syncInFlight = null;
 
   // timers for soft delete (undo delete)
   const pendingDeleteTimers = {};
@@ -130,6 +162,85 @@
     return `${dateStr} · ${timeStr}`;
   }
 
+  /* REMINDER INDEX */
+
+  function timeOf(rem) {
+    let t = timeCache.get(rem);
+    if (t === undefined) {
+      t = Date.parse(rem.datetime);
+      timeCache.set(rem, t);
+    }
+    return t;
+  }
+
+  // local calendar day as a number, e.g. 20300115
+  function dayKey(date) {
+    return (
+      date.getFullYear() * 10000 + (date.getMonth() + 1) * 100 + date.getDate()
+    );
+  }
+
+  function addToDay(rem) {
+    const t = timeOf(rem);
+    const key = dayKey(new Date(t));
+    let bucket = remindersByDay.get(key);
+    if (!bucket) {
+      bucket = [];
+      remindersByDay.set(key, bucket);
+    }
+    // binary search keeps the day in time order
+    let lo = 0;
+    let hi = bucket.length;
+    while (lo < hi) {
+      const mid = (lo + hi) >> 1;
+      if (timeOf(bucket[mid]) <= t) lo = mid + 1;
+      else hi = mid;
+    }
+    bucket.splice(lo, 0, rem);
+  }
+
+  function removeFromDay(rem) {
+    const key = dayKey(new Date(timeOf(rem)));
+    const bucket = remindersByDay.get(key);
+    if (!bucket) return;
+    const index = bucket.indexOf(rem);
+    if (index !== -1) bucket.splice(index, 1);
+    if (bucket.length === 0) remindersByDay.delete(key);
+  }
+
+  // add or replace (by id)
+  function putReminder(rem) {
+    const old = remindersById.get(rem.id);
+    if (old) removeFromDay(old);
+    remindersById.set(rem.id, rem);
+    addToDay(rem);
+  }
+
+  function dropReminder(id) {
+    const old = remindersById.get(id);
+    if (!old) return;
+    removeFromDay(old);
+    remindersById.delete(id);
+  }
+
+  function replaceAllReminders(list) {
+    remindersById.clear();
+    remindersByDay.clear();
+    list.forEach(putReminder);
+  }
+
+  function allReminders() {
+    return Array.from(remindersById.values());
+  }
+
+  function currentFilter() {
+    return (filterCategorySelect.value || "").toLowerCase();
+  }
+
+  function matchesFilter(rem, filter) {
+    return !filter || (rem.category || "").toLowerCase() === filter;
+  }
+
   /* CHIPS (lead) */
 
   function setupLeadChips() {
@@ -153,14 +264,7 @@
     const repeatVal = repeatHidden.value;
     const categoryVal = categoryHidden.value || "None";
 
-    const repeatMap = {
-      once: "Once",
-      weekly: "Every week",
-      monthly: "Every month",
-      yearly: "Every year",
-    };
-
-    let metaText = repeatMap[repeatVal] || "Once";
+    let metaText = REPEAT_LABELS[repeatVal] || "Once";
 
     if (dt && !isNaN(dt.getTime())) {
       metaText += " · " + formatDateTime(dt);
@@ -174,8 +278,10 @@
   /* STORAGE */
 
   function saveRemindersToStorage() {
+    if (benchMode) return;
     try {
-      localStorage.setItem(STORAGE_REMINDERS_KEY, JSON.stringify(reminders));
+      localStorage.setItem(STORAGE_REMINDERS_KEY, JSON.stringify(allReminders()));
+      localStorage.setItem(STORAGE_SYNC_VERSION_KEY, String(syncVersion));
     } catch (e) {
       console.error("Failed to save reminders", e);
     }
@@ -187,13 +293,116 @@
       if (!raw) return;
       const parsed = JSON.parse(raw);
       if (Array.isArray(parsed)) {
-        reminders = parsed;
+        replaceAllReminders(parsed);
+        syncVersion =
+          parseInt(localStorage.getItem(STORAGE_SYNC_VERSION_KEY), 10) || 0;
       }
     } catch (e) {
       console.error("Failed to load reminders", e);
     }
   }
 
+  /* SERVER SYNC */
+
+  function apiRequest(method, path, body, version) {
+    const headers = { Authorization: `tma ${tg.initData}` };
+    if (body) headers["Content-Type"] = "application/json";
+    if (version != null) headers["If-Match"] = `"${version}"`;
+    return fetch(API_BASE.replace(/\/$/, "") + path, {
+      method,
+      headers,
+      body: body ? JSON.stringify(body) : undefined,
+      cache: "no-store",
+    });
+  }
+
+  // Merge rows from the server into the list: closed ones are dropped, the
+  // rest replace the local copy (keeping fields the server does not store).
+  function applyServerRows(rows) {
+    if (!rows.length) return false;
+    rows.forEach((row) => {
+      if (row.status !== "pending") {
+        dropReminder(row.id);
+        return;
+      }
+      putReminder({
+        remind_before_minutes: 0,
+        ...remindersById.get(row.id),
+        ...row,
+      });
+    });
+    return true;
+  }
+
+  // Fetch only what changed since syncVersion (a page at a time); concurrent
+  // callers share the request in flight.
+  function syncReminders() {
+    if (!syncEnabled) return Promise.resolve(false);
+    if (!syncInFlight) {
+      syncInFlight = pullChanges()
+        .catch((e) => {
+          console.error("Sync failed", e);
+          return false;
+        })
+        .finally(() => {
+          syncInFlight = null;
+        });
+    }
+    return syncInFlight;
+  }
+
+  async function pullChanges() {
+    let firstSync = syncVersion === 0;
+    const rows = [];
+    let version = syncVersion;
+
+    for (;;) {
+      const full = firstSync && version > 0 ? "&full=1" : "";
+      const res = await apiRequest("GET", `/api/reminders?since=${version}${full}`);
+      if (res.status === 304) break;
+      if (!res.ok) throw new Error(`GET /api/reminders: ${res.status}`);
+      const page = await res.json();
+      if (page.reset) {
+        // too far behind: the server sent a full listing instead of changes
+        firstSync = true;
+        rows.length = 0;
+      }
+      rows.push(...page.reminders);
+      version = page.version;
+      if (!page.more) break;
+    }
+
+    // reminders only ever saved on this device (no server version yet)
+    const localOnly = allReminders().filter(
+      (r) => r.version == null && timeOf(r) > Date.now()
+    );
+    if (firstSync) {
+      // the server is the source of truth from now on; device-only
+      // reminders stay until they are uploaded
+      replaceAllReminders(localOnly);
+    }
+    let changed = applyServerRows(rows) || firstSync;
+
+    // one that fails to upload stays device-only and is tried again next sync
+    for (const local of localOnly) {
+      try {
+        const res = await apiRequest("POST", "/api/reminders", local);
+        if (!res.ok) throw new Error(`POST /api/reminders: ${res.status}`);
+        const row = await res.json();
+        dropReminder(local.id);
+        applyServerRows([row]);
+        changed = true;
+      } catch (e) {
+        console.error("Failed to upload a local reminder", e);
+      }
+    }
+
+    // stored only now, with the uploads settled
+    syncVersion = version;
+    if (changed) saveRemindersToStorage();
+    return changed;
+  }
+
   function saveCategoriesToStorage(categories) {
     try {
       localStorage.setItem(STORAGE_CATEGORIES_KEY, JSON.stringify(categories));
@@ -453,129 +662,162 @@
     }, 10000);
   }
 
-  function renderReminders() {
-    if (!selectedDate) return;
+  // card element on screen per reminder id, and what it was rendered from
+  const cardsById = new Map();
+
+  function cardSignature(rem) {
+    return [
+      rem.version,
+      rem.title,
+      rem.datetime,
+      rem.repeat,
+      rem.category,
+      rem.note,
+      rem.remind_before_minutes,
+    ].join("\u0001");
+  }
 
-    const filter = filterCategorySelect.value || "";
-    remindersListEl.innerHTML = "";
+  function createReminderCard(rem) {
+    const li = document.createElement("li");
+    li.className = "reminder-card";
 
-    const filtered = reminders.filter((r) => {
-      const rd = new Date(r.datetime);
-      if (!sameDay(rd, selectedDate)) return false;
-      if (
-        filter &&
-        (r.category || "").toLowerCase() !== filter.toLowerCase()
-      ) {
-        return false;
-      }
-      return true;
-    });
+    const main = document.createElement("div");
+    main.className = "reminder-card-main";
 
-    if (filtered.length === 0) {
-      remindersEmptyEl.style.display = "block";
-      return;
-    }
+    const titleRow = document.createElement("div");
+    titleRow.className = "reminder-card-title-row";
 
-    remindersEmptyEl.style.display = "none";
+    const titleEl = document.createElement("div");
+    titleEl.className = "reminder-card-title";
+    titleEl.textContent = rem.title;
 
-    filtered
-      .slice()
-      .sort((a, b) => new Date(a.datetime) - new Date(b.datetime))
-      .forEach((rem) => {
-        const li = document.createElement("li");
-        li.className = "reminder-card";
+    const badge = document.createElement("span");
+    badge.className = "reminder-card-badge";
+    badge.textContent = rem.category || "None";
 
-        const main = document.createElement("div");
-        main.className = "reminder-card-main";
+    titleRow.appendChild(titleEl);
+    titleRow.appendChild(badge);
 
-        const titleRow = document.createElement("div");
-        titleRow.className = "reminder-card-title-row";
+    const metaRow = document.createElement("div");
+    metaRow.className = "reminder-card-meta-row";
 
-        const titleEl = document.createElement("div");
-        titleEl.className = "reminder-card-title";
-        titleEl.textContent = rem.title;
+    const leadLabel =
+      !rem.remind_before_minutes
+        ? "At time"
+        : `${rem.remind_before_minutes} min before`;
 
-        const badge = document.createElement("span");
-        badge.className = "reminder-card-badge";
-        badge.textContent = rem.category || "None";
+    const metaLeft = document.createElement("span");
+    metaLeft.textContent = `${REPEAT_LABELS[rem.repeat] || "Once"} · ${leadLabel}`;
 
-        titleRow.appendChild(titleEl);
-        titleRow.appendChild(badge);
+    const metaRight = document.createElement("span");
+    metaRight.textContent = timeFormat.format(timeOf(rem));
 
-        const metaRow = document.createElement("div");
-        metaRow.className = "reminder-card-meta-row";
+    metaRow.appendChild(metaLeft);
+    metaRow.appendChild(metaRight);
 
-        const repeatMap = {
-          once: "Once",
-          weekly: "Every week",
-          monthly: "Every month",
-          yearly: "Every year",
-        };
+    main.appendChild(titleRow);
+    main.appendChild(metaRow);
 
-        const leadLabel =
-          rem.remind_before_minutes === 0
-            ? "At time"
-            : `${rem.remind_before_minutes} min before`;
+    if (rem.note) {
+      const noteEl = document.createElement("div");
+      noteEl.className = "reminder-card-note";
+      noteEl.textContent = rem.note;
+      main.appendChild(noteEl);
+    }
 
-        const metaLeft = document.createElement("span");
-        metaLeft.textContent = `${repeatMap[rem.repeat] || "Once"} · ${leadLabel}`;
+    // actions column
+    const actions = document.createElement("div");
+    actions.className = "reminder-card-actions";
+
+    const editBtn = document.createElement("button");
+    editBtn.className = "reminder-card-edit";
+    editBtn.innerHTML = "✎";
+    editBtn.title = "Edit";
+    editBtn.onclick = (e) => {
+      e.stopPropagation();
+      startEditReminder(rem.id);
+    };
 
-        const timeLabel = new Date(rem.datetime).toLocaleTimeString(undefined, {
-          hour: "2-digit",
-          minute: "2-digit",
-        });
+    const delBtn = document.createElement("button");
+    delBtn.className = "reminder-card-delete";
+    delBtn.textContent = "×";
+    delBtn.title = "Delete";
+    delBtn.onclick = (e) => {
+      e.stopPropagation();
+      handleDeleteClick(rem.id, li, delBtn);
+    };
 
-        const metaRight = document.createElement("span");
-        metaRight.textContent = timeLabel;
+    actions.appendChild(editBtn);
+    actions.appendChild(delBtn);
 
-        metaRow.appendChild(metaLeft);
-        metaRow.appendChild(metaRight);
+    li.appendChild(main);
+    li.appendChild(actions);
 
-        main.appendChild(titleRow);
-        main.appendChild(metaRow);
+    // edit ONLY via edit icon now (no card-wide click)
+    return li;
+  }
 
-        if (rem.note) {
-          const noteEl = document.createElement("div");
-          noteEl.className = "reminder-card-note";
-          noteEl.textContent = rem.note;
-          main.appendChild(noteEl);
-        }
+  // Keyed update of the day's list: cards of unchanged reminders stay in the
+  // DOM untouched (pending-delete state included), changed ones are rebuilt,
+  // and nodes only move when they are out of place.
+  function renderReminders() {
+    if (!selectedDate) return;
 
-        // actions column
-        const actions = document.createElement("div");
-        actions.className = "reminder-card-actions";
-
-        const editBtn = document.createElement("button");
-        editBtn.className = "reminder-card-edit";
-        editBtn.innerHTML = "✎";
-        editBtn.title = "Edit";
-        editBtn.onclick = (e) => {
-          e.stopPropagation();
-          startEditReminder(rem.id);
-        };
-
-        const delBtn = document.createElement("button");
-        delBtn.className = "reminder-card-delete";
-        delBtn.textContent = "×";
-        delBtn.title = "Delete";
-        delBtn.onclick = (e) => {
-          e.stopPropagation();
-          handleDeleteClick(rem.id, li, delBtn);
-        };
-
-        actions.appendChild(editBtn);
-        actions.appendChild(delBtn);
-
-        li.appendChild(main);
-        li.appendChild(actions);
-
-        // edit ONLY via edit icon now (no card-wide click)
-        remindersListEl.appendChild(li);
-      });
+    const dayReminders = getRemindersForDay(selectedDate);
+    remindersEmptyEl.style.display = dayReminders.length === 0 ? "block" : "none";
+
+    const shown = new Set();
+    let next = remindersListEl.firstChild;
+
+    dayReminders.forEach((rem) => {
+      shown.add(rem.id);
+      const signature = cardSignature(rem);
+      let entry = cardsById.get(rem.id);
+
+      if (entry && entry.signature !== signature) {
+        if (entry.li === next) next = next.nextSibling;
+        entry.li.remove();
+        entry = null;
+      }
+      if (!entry) {
+        entry = { li: createReminderCard(rem), signature };
+        cardsById.set(rem.id, entry);
+      }
+
+      if (entry.li === next) {
+        next = next.nextSibling;
+      } else {
+        remindersListEl.insertBefore(entry.li, next);
+      }
+    });
+
+    cardsById.forEach((entry, id) => {
+      if (!shown.has(id)) {
+        entry.li.remove();
+        cardsById.delete(id);
+      }
+    });
   }
 
-  function deleteReminder(id) {
-    reminders = reminders.filter((r) => r.id !== id);
+  async function deleteReminder(id) {
+    const rem = remindersById.get(id);
+    if (syncEnabled && rem && rem.version != null) {
+      try {
+        const res = await apiRequest("DELETE", `/api/reminders/${id}`, null, rem.version);
+        if (res.status === 412) {
+          // changed in the chat meanwhile: show the current state instead
+          applyServerRows([(await res.json()).reminder]);
+        } else if (!res.ok && res.status !== 404) {
+          throw new Error(`DELETE /api/reminders/${id}: ${res.status}`);
+        } else {
+          dropReminder(id);
+        }
+      } catch (e) {
+        console.error("Failed to delete reminder", e);
+      }
+    } else {
+      dropReminder(id);
+    }
     saveRemindersToStorage();
     renderCalendar();
     renderReminders();
@@ -583,32 +825,43 @@
 
   /* CALENDAR */
 
-  function sameDay(a, b) {
-    return (
-      a.getFullYear() === b.getFullYear() &&
-      a.getMonth() === b.getMonth() &&
-      a.getDate() === b.getDate()
-    );
+  function getRemindersForDay(date) {
+    const bucket = remindersByDay.get(dayKey(date)) || [];
+    const filter = currentFilter();
+    return filter ? bucket.filter((r) => matchesFilter(r, filter)) : bucket;
   }
 
-  function getRemindersForDay(date) {
-    const filter = filterCategorySelect.value || "";
-    return reminders.filter((r) => {
-      const rd = new Date(r.datetime);
-      if (!sameDay(rd, date)) return false;
-      if (
-        filter &&
-        (r.category || "").toLowerCase() !== filter.toLowerCase()
-      ) {
-        return false;
-      }
-      return true;
-    });
+  function hasRemindersOnDay(key, filter) {
+    const bucket = remindersByDay.get(key);
+    return !!bucket && bucket.some((r) => matchesFilter(r, filter));
   }
 
+  // day cells of the month on screen, by dayKey
+  const calendarCells = new Map();
+  let calendarMonthShown = null;
+
+  // Cells are only created when the month changes; otherwise their classes
+  // are updated in place from the day index.
   function renderCalendar() {
     if (currentMonth == null || currentYear == null) return;
 
+    selectedDateLabel.textContent = selectedDate
+      ? selectedDate.toLocaleDateString(undefined, {
+          weekday: "short",
+          month: "short",
+          day: "numeric",
+        })
+      : "";
+
+    const monthKey = currentYear * 100 + currentMonth;
+    if (monthKey !== calendarMonthShown) {
+      buildCalendarMonth();
+      calendarMonthShown = monthKey;
+    }
+    updateCalendarCells();
+  }
+
+  function buildCalendarMonth() {
     const monthName = new Date(currentYear, currentMonth, 1).toLocaleString(
       undefined,
       {
@@ -616,74 +869,107 @@
         year: "numeric",
       }
     );
-
     calendarMonthLabel.textContent = monthName;
-    selectedDateLabel.textContent = selectedDate
-      ? selectedDate.toLocaleDateString(undefined, {
-          weekday: "short",
-          month: "short",
-          day: "numeric",
-        })
-      : "";
 
     calendarGrid.innerHTML = "";
+    calendarCells.clear();
+    const fragment = document.createDocumentFragment();
 
     const firstDay = new Date(currentYear, currentMonth, 1);
     const firstWeekday = (firstDay.getDay() + 6) % 7; // convert Sun=0 -> Mon=0
     const daysInMonth = new Date(currentYear, currentMonth + 1, 0).getDate();
 
-    const today = new Date();
-
     // leading blanks
     for (let i = 0; i < firstWeekday; i++) {
       const cell = document.createElement("button");
       cell.className = "calendar-cell calendar-cell--empty";
       cell.disabled = true;
-      calendarGrid.appendChild(cell);
+      fragment.appendChild(cell);
     }
 
     for (let day = 1; day <= daysInMonth; day++) {
-      const cellDate = new Date(currentYear, currentMonth, day);
       const cell = document.createElement("button");
       cell.className = "calendar-cell";
       cell.textContent = day;
+      cell.dataset.day = day;
+      calendarCells.set(dayKey(new Date(currentYear, currentMonth, day)), cell);
+      fragment.appendChild(cell);
+    }
 
-      if (sameDay(cellDate, today)) {
-        cell.classList.add("calendar-cell--today");
-      }
-      if (selectedDate && sameDay(cellDate, selectedDate)) {
-        cell.classList.add("calendar-cell--selected");
-      }
+    calendarGrid.appendChild(fragment);
+  }
 
-      const dayReminders = getRemindersForDay(cellDate);
-      if (dayReminders.length > 0) {
-        cell.classList.add("calendar-cell--has-reminders");
-      }
+  function updateCalendarCells() {
+    const filter = currentFilter();
+    const todayKey = dayKey(new Date());
+    const selectedKey = selectedDate ? dayKey(selectedDate) : null;
+
+    calendarCells.forEach((cell, key) => {
+      cell.classList.toggle("calendar-cell--today", key === todayKey);
+      cell.classList.toggle("calendar-cell--selected", key === selectedKey);
+      cell.classList.toggle(
+        "calendar-cell--has-reminders",
+        hasRemindersOnDay(key, filter)
+      );
+    });
+  }
 
-      cell.addEventListener("click", () => {
-        selectedDate = cellDate;
-        renderCalendar();
-        renderReminders();
-      });
+  /* SAVE HANDLER */
 
-      calendarGrid.appendChild(cell);
+  // Create or edit on the server; returns false (with the error shown) if it did not take.
+  async function saveToServer(payload, existing) {
+    const onServer = existing && existing.version != null;
+    saveBtn.disabled = true;
+    try {
+      const res = onServer
+        ? await apiRequest("PUT", `/api/reminders/${payload.id}`, payload, existing.version)
+        : await apiRequest("POST", "/api/reminders", payload);
+      const data = await res.json();
+      if (res.status === 412) {
+        // fired, snoozed or edited from the chat since we last synced
+        applyServerRows([data.reminder]);
+        errorEl.textContent =
+          "This reminder changed in the chat meanwhile. Check it and save again.";
+        return false;
+      }
+      if (!res.ok) {
+        errorEl.textContent = data.error || "Could not save the reminder.";
+        return false;
+      }
+      if (existing && !onServer) {
+        // a device-only reminder: the server copy replaces it
+        dropReminder(existing.id);
+      }
+      applyServerRows([data]);
+      return true;
+    } catch (e) {
+      console.error("Failed to save reminder", e);
+      errorEl.textContent = "Could not reach the bot. Try again.";
+      return false;
+    } finally {
+      saveBtn.disabled = false;
     }
   }
 
-  /* SAVE HANDLER */
-
-  function handleSave() {
+  async function handleSave() {
     const payload = validateAndBuildPayload();
     if (!payload) return;
 
-    const existingIndex = reminders.findIndex((r) => r.id === payload.id);
-    const wasEditing = existingIndex !== -1;
+    const existing = remindersById.get(payload.id);
+    const wasEditing = !!existing;
 
-    if (existingIndex === -1) {
-      reminders.push(payload);
+    if (syncEnabled) {
+      const saved = await saveToServer(payload, existing || null);
+      if (!saved) {
+        renderCalendar();
+        renderReminders();
+        return;
+      }
+    } else if (!existing) {
+      putReminder(payload);
     } else {
-      reminders.splice(existingIndex, 1, {
-        ...reminders[existingIndex],
+      putReminder({
+        ...existing,
         title: payload.title,
         datetime: payload.datetime,
         repeat: payload.repeat,
@@ -710,7 +996,7 @@
   /* EDIT EXISTING REMINDER */
 
   function startEditReminder(id) {
-    const rem = reminders.find((r) => r.id === id);
+    const rem = remindersById.get(id);
     if (!rem) return;
 
     currentEditId = rem.id;
@@ -785,6 +1071,15 @@
       if (e.target === categoryModal) closeCategoryModal();
     });
 
+    // one listener for every day cell, whichever month is on screen
+    calendarGrid.addEventListener("click", (e) => {
+      const cell = e.target.closest(".calendar-cell[data-day]");
+      if (!cell) return;
+      selectedDate = new Date(currentYear, currentMonth, Number(cell.dataset.day));
+      renderCalendar();
+      renderReminders();
+    });
+
     filterCategorySelect.addEventListener("change", () => {
       renderCalendar();
       renderReminders();
@@ -807,6 +1102,11 @@
     });
 
     saveBtn.addEventListener("click", handleSave);
+
+    // pick up changes made from the chat (snoozes, fired reminders) on return
+    document.addEventListener("visibilitychange", () => {
+      if (document.visibilityState === "visible") refreshFromServer();
+    });
     cancelEditBtn.addEventListener("click", cancelEdit);
 
     calPrevBtn.addEventListener("click", () => {
@@ -830,6 +1130,51 @@
     });
   }
 
+  async function refreshFromServer() {
+    if (await syncReminders()) {
+      renderCalendar();
+      renderReminders();
+    }
+  }
+
+  /* BENCHMARK HOOKS (webapp/bench.html) */
+
+  function exposeBenchHooks() {
+    const rerender = () => {
+      renderCalendar();
+      renderReminders();
+    };
+    window.remindersBench = {
+      load(list) {
+        replaceAllReminders(list);
+        rerender();
+      },
+      put(rem) {
+        putReminder(rem);
+        rerender();
+      },
+      drop(id) {
+        dropReminder(id);
+        rerender();
+      },
+      get(id) {
+        return remindersById.get(id);
+      },
+      remindersOn(date) {
+        return getRemindersForDay(date);
+      },
+      showMonth(year, month) {
+        currentYear = year;
+        currentMonth = month;
+        rerender();
+      },
+      selectDay(date) {
+        selectedDate = date;
+        rerender();
+      },
+    };
+  }
+
   /* INIT */
 
   function init() {
@@ -843,12 +1188,17 @@
     );
 
     loadCategories();
-    loadRemindersFromStorage();
+    if (benchMode) {
+      exposeBenchHooks();
+    } else {
+      loadRemindersFromStorage();
+    }
     bindEvents();
     setSaveMode("new");
     resetFormToDefaults();
     renderCalendar();
     renderReminders();
+    refreshFromServer();
   }
 
   document.addEventListener("DOMContentLoaded", init);